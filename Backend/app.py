@@ -1,33 +1,59 @@
 # app.py
 import os
 import sys
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Request
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from auth.auth_router import router as auth_router
 from pathlib import Path
 from pydantic import ValidationError
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-import uvicorn
 import uuid
 from uuid import UUID
 import logging
 import traceback
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import select
-from database import get_db, engine, Base, verify_database_connection, init_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import select, func
+from database import (
+    get_session, dispose_engines, check_schema_version, warm_access_token, THREADPOOL_MAX_WORKERS,
+)
+from health import db_health
+import metrics
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER,
+    keyset_page, split_page, set_page_headers,
+)
+from anyio import to_thread
+from telemetry import configure_telemetry
+from uploads import UPLOAD_DIR, UploadSizeLimitMiddleware, guardar_documento
 import models
-from schemas import SolicitudCreate, SolicitudResponse, UserCreate, UserUpdate, UserResponse, PasswordChange
-from services.solicitud_service import SolicitudService
+from schemas import (
+    SolicitudCreate, SolicitudResponse, SolicitudArchivadaResponse,
+    AprobacionLote, AprobacionLoteResponse,
+    UserCreate, UserUpdate, UserResponse, PasswordChange,
+)
+from services.solicitud_service import (
+    SolicitudService, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_MAX_BATCHES_PER_REQUEST,
+)
+from services.resumen_service import obtener_resumen, registrar_transicion
+from services.export_service import consulta_exportacion, exportar_csv, exportar_ndjson
+from services.busqueda_service import buscar, indexar, SEARCH_MAX_RESULTS
+from services.aprobacion_service import aprobar_rechazar, aprobar_rechazar_lote
+from services.duplicados_service import (
+    comprobar_cif_duplicado, buscar_posibles_duplicados, indexar_bloques, exportar_informe_duplicados,
+    DUPLICATE_NAME_THRESHOLD,
+)
 from auth.auth_service import AuthService
 from auth.auth_handler import AuthHandler
-from auth.auth_dependencies import get_current_user
-from models import User, EstadoSolicitud
+from auth.auth_dependencies import get_current_user, get_current_user_completo
+from auth.password_hashing import password_hasher
+from auth.login_throttle import login_throttle
+from auth.last_access import last_access
+from models import User, EstadoSolicitud, ESTADO_PENDIENTE_POR_ROL
 from contextlib import asynccontextmanager
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-import json
 import uuid
 from pathlib import Path
 
@@ -39,24 +65,62 @@ logger = logging.getLogger(__name__)
 def get_user_role_value(user: User) -> str:
     return user.rol.value if hasattr(user.rol, "value") else str(user.rol)
 
+
+def solicitud_a_respuesta(solicitud) -> dict:
+    """Convierte una solicitud (modelo o fila) al formato de SolicitudResponse."""
+    return {
+        "id": str(solicitud.id),
+        "datos_comercial": solicitud.datos_cliente or {},
+        "estado": solicitud.estado.value,
+        "fecha_creacion": solicitud.creado_en,
+        "ultima_modificacion": solicitud.actualizado_en or solicitud.creado_en,
+        "aprobado_director": solicitud.aprobado_director,
+        "aprobado_pedidos": solicitud.aprobado_pedidos,
+        "aprobado_admin": solicitud.aprobado_admin,
+        "notas": solicitud.notas or {}
+    }
+
 # Obtén la ruta absoluta del directorio raíz del proyecto
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Asegúrate de que existe el directorio de uploads
-UPLOAD_DIR = Path("uploads/documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejador del ciclo de vida de la aplicación."""
     try:
-        await init_db()
-        if not verify_database_connection():
+        configure_telemetry()
+
+        # El thread pool de anyio ejecuta los endpoints síncronos y las
+        # llamadas descargadas; su tamaño se alinea con el pool de conexiones.
+        limiter = to_thread.current_default_thread_limiter()
+        limiter.total_tokens = THREADPOOL_MAX_WORKERS
+        metrics.register("threadpool", lambda: {
+            "total": limiter.total_tokens,
+            "borrowed": limiter.borrowed_tokens,
+            "waiting": limiter.statistics().tasks_waiting,
+        })
+
+        # Con Entra ID, el primer token se obtiene fuera del event loop: las
+        # conexiones que se abran después solo leen el token en caché
+        await warm_access_token()
+
+        # Las migraciones se ejecutan una sola vez por despliegue
+        # (python init_db.py); cada worker solo comprueba la versión.
+        await check_schema_version()
+        if not await db_health.check_now():
             raise Exception("No se pudo establecer la conexión inicial con la base de datos")
+        db_health.start()
+        last_access.start()
         logger.info("Inicialización de la aplicación completada")
         yield
     finally:
-        engine.dispose()
+        await db_health.stop()
+        await last_access.stop()
+        password_hasher.shutdown()
+        await login_throttle.close()
+        await dispose_engines()
         logger.info("Recursos de la aplicación liberados correctamente")
 
 app = FastAPI(
@@ -68,6 +132,10 @@ app = FastAPI(
 
 app.include_router(auth_router)
 
+# Límite de tamaño de las subidas (413 antes de leer el cuerpo). Se añade
+# antes que CORS para que las respuestas 413 lleven sus cabeceras.
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS configuration — origins from env var (comma-separated)
 _cors_env = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173,http://127.0.0.1:3000,http://127.0.0.1:5173")
 _cors_origins = [o.strip() for o in _cors_env.split(",") if o.strip()]
@@ -77,27 +145,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # Con credenciales, el comodín no expone cabeceras: se listan las de paginación
+    expose_headers=["*", NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER]
 )
 
 # Dependencia para obtener el AuthService
-def get_auth_service(db: Session = Depends(get_db)):
+def get_auth_service(db: AsyncSession = Depends(get_session)):
     return AuthService(db)
 
 
-@app.get("/health")
-def health_check():
-    database_ok = verify_database_connection()
-    status_code = 200 if database_ok else 503
+# Sonda de liveness: solo comprueba que el proceso responde
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "ok"}
+
+
+# Sonda de readiness: lee el estado de base de datos cacheado por db_health,
+# sin abrir conexiones ni esperar por el pool
+@app.get("/health/ready")
+async def readiness_check():
     return JSONResponse(
-        status_code=status_code,
-        content={
-            "status": "ok" if database_ok else "degraded",
-            "database": "ok" if database_ok else "unreachable",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-        },
+        status_code=200 if db_health.is_ready() else 503,
+        content=db_health.snapshot(),
     )
 
+
+# Se mantiene por compatibilidad con las sondas existentes
+@app.get("/health")
+async def health_check():
+    return await readiness_check()
+
+# Endpoint de métricas internas (pools, thread pool...) para administradores
+@app.get("/admin/metrics")
+async def obtener_metricas(current_user: User = Depends(get_current_user)):
+    """Devuelve las métricas en memoria de este worker (solo para admins)"""
+    if get_user_role_value(current_user) != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para ver las métricas"
+        )
+    return metrics.snapshot()
+
 # Endpoint para la creación de solicitudes
 @app.post('/api/solicitudes/', response_model=SolicitudResponse)
 async def crear_solicitud(
@@ -118,25 +206,23 @@ async def crear_solicitud(
     esAutonomo: bool = Form(...),
     sepa: UploadFile = File(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
-    """Crear una nueva solicitud"""
+    """
+    Crear una nueva solicitud.
+
+    Si ya hay una solicitud pendiente o completada con el mismo CIF/NIF,
+    responde 409 con su id, o la crea indicando duplicado_de (según
+    DUPLICATE_CIF_MODE). Las solicitudes del mismo código postal con un
+    nombre parecido se devuelven en posibles_duplicados.
+    """
     try:
+        duplicado_de = await comprobar_cif_duplicado(db, cif_nif)
+        posibles_duplicados = await buscar_posibles_duplicados(db, nombre, codigoPostal)
+
         documentos = {}
         if sepa:
-            file_extension = sepa.filename.split('.')[-1].lower()
-            if file_extension not in ['pdf', 'doc', 'docx']:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Tipo de archivo no permitido. Solo se permiten PDF y documentos Word."
-                )
-            file_name = f"{uuid.uuid4()}.{file_extension}"
-            file_path = UPLOAD_DIR / file_name
-            content = await sepa.read()
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
-            file_url = f"/uploads/documents/{file_name}"
-            documentos['sepa'] = file_url
+            documentos['sepa'] = await guardar_documento(sepa)
 
         solicitud_data = {
             "nombre": nombre,
@@ -160,41 +246,45 @@ async def crear_solicitud(
 
         nueva_solicitud = models.Solicitud(
             comercial_id=current_user.id,
-            datos_cliente=json.dumps(solicitud.dict()),  # Convertir a string JSON
+            datos_cliente=solicitud.model_dump(mode="json"),
             estado=EstadoSolicitud.PENDIENTE_DIRECTOR,
             aprobado_director=False,
             aprobado_pedidos=False,
             aprobado_admin=False,
-            notas=json.dumps({})  # Convertir a string JSON
+            notas={}
         )
+        indexar(nueva_solicitud)
+        indexar_bloques(nueva_solicitud)
 
         db.add(nueva_solicitud)
-        db.commit()
-        db.refresh(nueva_solicitud)
+        await db.commit()
+        await db.refresh(nueva_solicitud)
+        registrar_transicion(nueva_solicitud.comercial_id, None, nueva_solicitud.estado)
 
         logger.info(f"Solicitud creada con ID: {nueva_solicitud.id}")
+        if duplicado_de:
+            logger.warning("Solicitud %s con CIF/NIF ya solicitado en %s", nueva_solicitud.id, duplicado_de)
+        if posibles_duplicados:
+            logger.warning(
+                "Solicitud %s parecida a %d solicitudes existentes",
+                nueva_solicitud.id, len(posibles_duplicados)
+            )
 
         return {
-            "id": str(nueva_solicitud.id),
-            "datos_comercial": nueva_solicitud.datos_cliente,
-            "estado": nueva_solicitud.estado,
-            "fecha_creacion": nueva_solicitud.creado_en,
-            "ultima_modificacion": nueva_solicitud.actualizado_en,
-            "aprobado_director": nueva_solicitud.aprobado_director,
-            "aprobado_pedidos": nueva_solicitud.aprobado_pedidos,
-            "aprobado_admin": nueva_solicitud.aprobado_admin,
-            "notas": nueva_solicitud.notas
+            **solicitud_a_respuesta(nueva_solicitud),
+            "duplicado_de": duplicado_de,
+            "posibles_duplicados": posibles_duplicados,
         }
     except HTTPException as he:
         logger.warning("Solicitud rechazada: %s", he.detail)
-        db.rollback()
+        await db.rollback()
         raise he
     except ValidationError as ve:
         logger.error(f"Error de validación Pydantic: {ve}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=422, detail=str(ve))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error al crear solicitud: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(
@@ -204,28 +294,14 @@ async def crear_solicitud(
 
 # Endpoint para subir documentos (generalizado)
 @app.post('/api/upload/documento')
-def upload_document(
+async def upload_document(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
-    """Endpoint para subir cualquier documento"""
+    """Endpoint para subir cualquier documento (PDF o Word, ver uploads.py)"""
     try:
-        file_extension = file.filename.split('.')[-1].lower()
-        if file_extension not in ['pdf', 'doc', 'docx']:
-            raise HTTPException(
-                status_code=400,
-                detail="Tipo de archivo no permitido. Solo se permiten PDF y documentos Word."
-            )
+        file_url = await guardar_documento(file)
 
-        file_name = f"{uuid.uuid4()}.{file_extension}"
-        file_path = UPLOAD_DIR / file_name
-        
-        content = file.file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-        
-        file_url = f"/uploads/documents/{file_name}"
-        
         return {
             "url": file_url,
             "filename": file.filename
@@ -241,17 +317,26 @@ def upload_document(
 
 # Mantén el endpoint anterior por compatibilidad, pero redirige al nuevo
 @app.post('/api/upload/sepa')
-def upload_sepa(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    return upload_document(file, current_user)
+async def upload_sepa(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    return await upload_document(file, current_user)
 
 # Endpoint para obtener solicitudes pendientes por rol
 @app.get('/api/solicitudes/pendientes/{rol}', response_model=List[SolicitudResponse])
-def obtener_solicitudes_pendientes_por_rol(
+async def obtener_solicitudes_pendientes_por_rol(
     rol: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
-    """Obtener solicitudes pendientes según el rol"""
+    """
+    Obtener solicitudes pendientes según el rol, paginadas por cursor.
+
+    La siguiente página se pide con el valor de la cabecera X-Next-Cursor;
+    con incluir_total=true se devuelve además X-Total-Count.
+    """
     try:
         current_role = get_user_role_value(current_user)
 
@@ -262,39 +347,29 @@ def obtener_solicitudes_pendientes_por_rol(
                 detail="No tiene permisos para ver estas solicitudes"
             )
 
-        estado_buscar = None
-        if rol == "director":
-            estado_buscar = EstadoSolicitud.PENDIENTE_DIRECTOR
-        elif rol == "pedidos":
-            estado_buscar = EstadoSolicitud.PENDIENTE_PEDIDOS
-        elif rol == "admin":
-            estado_buscar = EstadoSolicitud.PENDIENTE_ADMIN
-        else:
+        estado_buscar = ESTADO_PENDIENTE_POR_ROL.get(rol)
+        if estado_buscar is None:
             raise HTTPException(status_code=400, detail="Rol no válido")
 
-        result = db.execute(
-            select(models.Solicitud)
-            .where(models.Solicitud.estado == estado_buscar)
-            .order_by(models.Solicitud.creado_en.desc())
+        result = await db.execute(
+            keyset_page(
+                select(models.Solicitud).where(models.Solicitud.estado == estado_buscar),
+                models.Solicitud.creado_en, models.Solicitud.id, limit, cursor
+            )
         )
-        solicitudes = result.scalars().all()
-        
+        solicitudes, siguiente = split_page(result.scalars().all(), limit)
+
+        total = None
+        if incluir_total:
+            total = await db.scalar(
+                select(func.count()).select_from(models.Solicitud)
+                .where(models.Solicitud.estado == estado_buscar)
+            )
+        set_page_headers(response, siguiente, total)
+
         logger.info("Solicitudes pendientes consultadas para rol %s", rol)
         
-        return [
-            {
-                "id": str(solicitud.id),
-                "datos_comercial": solicitud.datos_cliente,
-                "estado": solicitud.estado,
-                "fecha_creacion": solicitud.creado_en,
-                "ultima_modificacion": solicitud.actualizado_en,
-                "aprobado_director": solicitud.aprobado_director,
-                "aprobado_pedidos": solicitud.aprobado_pedidos,
-                "aprobado_admin": solicitud.aprobado_admin,
-                "notas": solicitud.notas
-            }
-            for solicitud in solicitudes
-        ]
+        return [solicitud_a_respuesta(solicitud) for solicitud in solicitudes]
     except HTTPException:
         raise
     except Exception as e:
@@ -307,100 +382,31 @@ def obtener_solicitudes_pendientes_por_rol(
 
 # Endpoint para aprobar/rechazar solicitudes
 @app.put('/api/solicitudes/{solicitud_id}/aprobar')
-def aprobar_rechazar_solicitud(
+async def aprobar_rechazar_solicitud(
     solicitud_id: UUID,
     datos: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
     """Aprobar o rechazar una solicitud según el rol del usuario"""
     try:
-        current_role = get_user_role_value(current_user)
-
-        result = db.execute(
-            select(models.Solicitud).where(models.Solicitud.id == solicitud_id)
+        # Un único UPDATE condicionado al estado y la versión leídos: si otro
+        # usuario la procesa a la vez, solo uno gana y el otro recibe 409
+        solicitud = await aprobar_rechazar(
+            db, solicitud_id, get_user_role_value(current_user), datos
         )
-        solicitud = result.scalar_one_or_none()
-        
-        if not solicitud:
-            raise HTTPException(
-                status_code=404,
-                detail="Solicitud no encontrada"
-            )
-            
-        if (current_role == 'director' and solicitud.estado != EstadoSolicitud.PENDIENTE_DIRECTOR) or \
-           (current_role == 'pedidos' and solicitud.estado != EstadoSolicitud.PENDIENTE_PEDIDOS) or \
-           (current_role == 'admin' and solicitud.estado != EstadoSolicitud.PENDIENTE_ADMIN):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Esta solicitud no está pendiente para el rol {current_role}"
-            )
-            
-        aprobar = datos.get('aprobar', False)
-        notas = datos.get('notas', '')
-        
-        if aprobar:
-            if current_role == 'director':
-                marcas = datos.get('marcas', [])
-                tarifa = datos.get('tarifa', '')
-                if not marcas or not tarifa:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Se requieren marcas y tarifa para aprobar la solicitud"
-                    )
-                if not solicitud.datos_cliente:
-                    solicitud.datos_cliente = {}
-                solicitud.datos_cliente['marcas_aprobadas'] = marcas
-                solicitud.datos_cliente['tarifa_aprobada'] = tarifa
-                solicitud.aprobado_director = True
-                solicitud.estado = EstadoSolicitud.PENDIENTE_PEDIDOS
-                if not solicitud.notas:
-                    solicitud.notas = {}
-                solicitud.notas['director'] = notas
-                
-            elif current_role == 'pedidos':
-                solicitud.aprobado_pedidos = True
-                solicitud.estado = EstadoSolicitud.PENDIENTE_ADMIN
-                if not solicitud.notas:
-                    solicitud.notas = {}
-                solicitud.notas['pedidos'] = notas
-                
-            elif current_role == 'admin':
-                termino_pago = datos.get('termino_pago', '')
-                if not termino_pago:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Se requiere término de pago para aprobar la solicitud"
-                    )
-                if not solicitud.datos_cliente:
-                    solicitud.datos_cliente = {}
-                solicitud.datos_cliente['termino_pago'] = termino_pago
-                solicitud.aprobado_admin = True
-                solicitud.estado = EstadoSolicitud.COMPLETADO
-                if not solicitud.notas:
-                    solicitud.notas = {}
-                solicitud.notas['admin'] = notas
-        else:
-            solicitud.estado = EstadoSolicitud.RECHAZADO
-            if not solicitud.notas:
-                solicitud.notas = {}
-            solicitud.notas[current_role] = notas
-            
-        solicitud.actualizado_en = datetime.utcnow()
-        db.commit()
-        db.refresh(solicitud)
-        
         logger.info("Solicitud %s actualizada correctamente", solicitud_id)
-        
+
         return {
             "id": str(solicitud.id),
             "estado": solicitud.estado,
+            "version": solicitud.version,
             "mensaje": "Solicitud procesada correctamente"
         }
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error al procesar solicitud: {e}")
         logger.error(traceback.format_exc())
         raise HTTPException(
@@ -408,44 +414,52 @@ def aprobar_rechazar_solicitud(
             detail=f"Error al procesar la solicitud: {str(e)}"
         )
 
-# Endpoint para obtener resumen de solicitudes
-@app.get('/api/solicitudes/resumen')
-def obtener_resumen_solicitudes(
+# Endpoint para aprobar/rechazar varias solicitudes de una vez
+@app.post('/api/solicitudes/aprobar-lote', response_model=AprobacionLoteResponse)
+async def aprobar_rechazar_lote_solicitudes(
+    lote: AprobacionLote,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
-    """Obtener resumen de solicitudes para el dashboard"""
+    """
+    Aplica la misma decisión (y los mismos datos del rol) a una lista de
+    solicitudes en una transacción, con un resultado por solicitud
+    """
     try:
-        result = db.execute(
-            select(
-                models.Solicitud.id,
-                models.Solicitud.comercial_id,
-                models.Solicitud.datos_cliente,
-                models.Solicitud.estado,
-                models.Solicitud.aprobado_director,
-                models.Solicitud.aprobado_pedidos,
-                models.Solicitud.aprobado_admin,
-                models.Solicitud.notas,
-                models.Solicitud.creado_en,
-                models.Solicitud.actualizado_en
-            )
-            .where(models.Solicitud.comercial_id == current_user.id)
+        resultados = await aprobar_rechazar_lote(
+            db, lote.ids, get_user_role_value(current_user), lote.model_dump(exclude={"ids"})
         )
-        solicitudes = result.all()
+        procesadas = sum(1 for resultado in resultados if resultado["status_code"] == 200)
+        logger.info("Lote de aprobación: %s de %s solicitudes procesadas", procesadas, len(resultados))
 
-        pendientes = sum(1 for s in solicitudes if s.estado in [
-            EstadoSolicitud.PENDIENTE_DIRECTOR,
-            EstadoSolicitud.PENDIENTE_PEDIDOS,
-            EstadoSolicitud.PENDIENTE_ADMIN
-        ])
-        completadas = sum(1 for s in solicitudes if s.estado == EstadoSolicitud.COMPLETADO)
-        rechazadas = sum(1 for s in solicitudes if s.estado == EstadoSolicitud.RECHAZADO)
+        return {"procesadas": procesadas, "resultados": resultados}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error al procesar el lote de solicitudes: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="Error al procesar el lote de solicitudes"
+        )
 
-        return {
-            "pendientes": pendientes,
-            "completadas": completadas,
-            "rechazadas": rechazadas
-        }
+# Endpoint para obtener resumen de solicitudes
+@app.get('/api/solicitudes/resumen')
+async def obtener_resumen_solicitudes(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Obtener resumen de solicitudes para el dashboard.
+
+    Conteos agregados en SQL; director, pedidos y admin reciben además los
+    de la cola global (pendientes_rol y global).
+    """
+    try:
+        return await obtener_resumen(db, current_user.id, get_user_role_value(current_user))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener resumen: {e}")
         raise HTTPException(
@@ -455,14 +469,18 @@ def obtener_resumen_solicitudes(
 
 # Endpoint para obtener solicitudes por usuario
 @app.get('/api/solicitudes/usuario/{email}', response_model=List[SolicitudResponse])
-def obtener_solicitudes_usuario(
+async def obtener_solicitudes_usuario(
     email: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
-    """Obtener solicitudes creadas por un usuario comercial"""
+    """Obtener solicitudes creadas por un usuario comercial, paginadas por cursor"""
     try:
-        result_user = db.execute(
+        result_user = await db.execute(
             select(User).where(User.email == email)
         )
         user = result_user.scalar_one_or_none()
@@ -481,7 +499,7 @@ def obtener_solicitudes_usuario(
                 detail="No tiene permisos para ver estas solicitudes"
             )
             
-        result = db.execute(
+        query = (
             select(
                 models.Solicitud.id,
                 models.Solicitud.comercial_id,
@@ -495,26 +513,22 @@ def obtener_solicitudes_usuario(
                 models.Solicitud.actualizado_en
             )
             .where(models.Solicitud.comercial_id == user.id)
-            .order_by(models.Solicitud.creado_en.desc())
         )
-        
-        solicitudes = result.all()
+        result = await db.execute(
+            keyset_page(query, models.Solicitud.creado_en, models.Solicitud.id, limit, cursor)
+        )
+        solicitudes, siguiente = split_page(result.all(), limit)
+
+        total = None
+        if incluir_total:
+            total = await db.scalar(
+                select(func.count()).select_from(models.Solicitud)
+                .where(models.Solicitud.comercial_id == user.id)
+            )
+        set_page_headers(response, siguiente, total)
         logger.info("Solicitudes consultadas para usuario %s", email)
         
-        return [
-            {
-                "id": str(solicitud.id),
-                "datos_comercial": solicitud.datos_cliente,
-                "estado": solicitud.estado,
-                "fecha_creacion": solicitud.creado_en,
-                "ultima_modificacion": solicitud.actualizado_en,
-                "aprobado_director": solicitud.aprobado_director,
-                "aprobado_pedidos": solicitud.aprobado_pedidos,
-                "aprobado_admin": solicitud.aprobado_admin,
-                "notas": solicitud.notas
-            }
-            for solicitud in solicitudes
-        ]
+        return [solicitud_a_respuesta(solicitud) for solicitud in solicitudes]
     except HTTPException:
         raise
     except Exception as e:
@@ -525,15 +539,195 @@ def obtener_solicitudes_usuario(
             detail="Error al obtener las solicitudes"
         )
 
+# Endpoint para buscar solicitudes por cliente
+@app.get('/api/solicitudes/search', response_model=List[SolicitudResponse])
+async def buscar_solicitudes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_RESULTS),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Busca solicitudes por nombre del cliente, CIF/NIF, población, contacto o
+    correo. Cada palabra se busca por prefijo ("electro mart" encuentra
+    "Electrodomésticos Martínez") y los resultados vienen ordenados por
+    relevancia. Los comerciales solo ven sus propias solicitudes.
+    """
+    try:
+        rol = get_user_role_value(current_user)
+        comercial_id = None if rol in ESTADO_PENDIENTE_POR_ROL else current_user.id
+        solicitudes = await buscar(db, q, limit, comercial_id)
+        return [solicitud_a_respuesta(solicitud) for solicitud in solicitudes]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al buscar solicitudes: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="Error al buscar solicitudes"
+        )
+
+# Endpoint para exportar solicitudes
+@app.get('/api/solicitudes/export')
+async def exportar_solicitudes(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    estado: Optional[EstadoSolicitud] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    comercial_email: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Exporta las solicitudes (solo admin) en CSV o NDJSON, con datos_cliente
+    aplanado en columnas. La respuesta se genera en streaming desde un
+    cursor del servidor, con memoria constante sea cual sea el volumen.
+    """
+    if get_user_role_value(current_user) != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para exportar solicitudes"
+        )
+
+    query = consulta_exportacion(estado, desde, hasta, comercial_email)
+    fecha = datetime.utcnow().strftime("%Y%m%d")
+    if format == "ndjson":
+        contenido, media_type = exportar_ndjson(query), "application/x-ndjson"
+    else:
+        contenido, media_type = exportar_csv(query), "text/csv; charset=utf-8"
+
+    logger.info("Exportación de solicitudes en formato %s", format)
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="solicitudes_{fecha}.{format}"'}
+    )
+
+# Endpoint para archivar solicitudes finalizadas
+@app.post('/admin/solicitudes/archivar')
+async def archivar_solicitudes(
+    antiguedad_dias: int = Query(ARCHIVE_AFTER_DAYS, ge=0),
+    tamano_lote: int = Query(ARCHIVE_BATCH_SIZE, ge=1, le=5000),
+    max_lotes: int = Query(10, ge=1, le=ARCHIVE_MAX_BATCHES_PER_REQUEST),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Mueve a solicitudes_archivadas las solicitudes COMPLETADO/RECHAZADO más
+    antiguas que antiguedad_dias, en lotes de tamano_lote por transacción y
+    como mucho ARCHIVE_MAX_BATCHES_PER_REQUEST lotes por petición. Para
+    ejecuciones programadas sin límite de lotes, usar archivar_solicitudes.py.
+    """
+    if get_user_role_value(current_user) != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para archivar solicitudes"
+        )
+    try:
+        total = await SolicitudService(db).archivar_lote(antiguedad_dias, tamano_lote, max_lotes)
+        logger.info("Solicitudes archivadas: %d", total)
+        return {"archivadas": total}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al archivar solicitudes: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="Error al archivar las solicitudes"
+        )
+
+# Endpoint para el informe de posibles clientes duplicados
+@app.get('/admin/solicitudes/duplicados')
+async def obtener_informe_duplicados(
+    umbral: float = Query(DUPLICATE_NAME_THRESHOLD, ge=0, le=1),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Pares de solicitudes vigentes con el mismo código postal y nombre
+    parecido (solo admin), en NDJSON: un par por línea, generado en
+    streaming bloque a bloque. Para informes programados, usar
+    informe_duplicados.py.
+    """
+    if get_user_role_value(current_user) != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para ver el informe de duplicados"
+        )
+
+    logger.info("Informe de duplicados con umbral %s", umbral)
+    return StreamingResponse(
+        exportar_informe_duplicados(umbral),
+        media_type="application/x-ndjson",
+    )
+
+# Endpoint para consultar solicitudes archivadas
+@app.get('/api/solicitudes/archivadas', response_model=List[SolicitudArchivadaResponse])
+async def obtener_solicitudes_archivadas(
+    response: Response,
+    comercial_email: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Solicitudes archivadas, más recientes primero y paginadas por cursor.
+    Los comerciales ven las suyas; admin puede ver todas o filtrar por
+    comercial_email.
+    """
+    try:
+        if get_user_role_value(current_user) != 'admin':
+            if comercial_email and comercial_email != current_user.email:
+                raise HTTPException(
+                    status_code=403,
+                    detail="No tiene permisos para ver estas solicitudes"
+                )
+            comercial_email = current_user.email
+
+        filtros = []
+        if comercial_email:
+            filtros.append(models.SolicitudArchivada.comercial_email == comercial_email)
+
+        result = await db.execute(
+            keyset_page(
+                select(models.SolicitudArchivada).where(*filtros),
+                models.SolicitudArchivada.fecha_creacion,
+                models.SolicitudArchivada.id, limit, cursor
+            )
+        )
+        archivadas, siguiente = split_page(
+            result.scalars().all(), limit, created_attr="fecha_creacion"
+        )
+
+        total = None
+        if incluir_total:
+            total = await db.scalar(
+                select(func.count()).select_from(models.SolicitudArchivada).where(*filtros)
+            )
+        set_page_headers(response, siguiente, total)
+
+        return [SolicitudArchivadaResponse.from_orm(archivada) for archivada in archivadas]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al obtener solicitudes archivadas: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="Error al obtener las solicitudes archivadas"
+        )
+
 # Endpoint para obtener información del usuario actual
 @app.get("/users/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user_completo)):
     """Obtener información del usuario actual"""
     return UserResponse.from_orm(current_user)
 
 # Endpoint para actualizar el perfil del usuario actual
 @app.put("/users/me", response_model=UserResponse)
-def update_user_profile(
+async def update_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
@@ -547,7 +741,7 @@ def update_user_profile(
                 detail="No tienes permiso para cambiar el rol o el estado de actividad"
             )
 
-        return auth_service.update_user(str(current_user.id), user_update)
+        return await auth_service.update_user(str(current_user.id), user_update)
     except HTTPException:
         raise
     except Exception as e:
@@ -559,14 +753,14 @@ def update_user_profile(
 
 # Endpoint para cambiar la contraseña del usuario actual
 @app.post("/users/me/change-password")
-def change_password(
+async def change_password(
     password_change: PasswordChange,
     current_user: User = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """Permite a un usuario cambiar su contraseña"""
     try:
-        return auth_service.change_password(current_user, password_change)
+        return await auth_service.change_password(current_user, password_change)
     except HTTPException:
         raise
     except Exception as e:
@@ -578,7 +772,7 @@ def change_password(
 
 # Endpoint para obtener todos los usuarios (solo para admins)
 @app.get("/users", response_model=List[UserResponse])
-def get_all_users(
+async def get_all_users(
     current_user: User = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
@@ -589,7 +783,7 @@ def get_all_users(
                 status_code=403,
                 detail="No tienes permiso para ver todos los usuarios"
             )
-        return auth_service.get_all_users()
+        return await auth_service.get_all_users()
     except HTTPException:
         raise
     except Exception as e:
@@ -601,7 +795,7 @@ def get_all_users(
 
 # Endpoint para crear un nuevo usuario (solo para admins)
 @app.post("/users", response_model=Dict[str, Any])
-def create_user(
+async def create_user(
     user: UserCreate,
     current_user: User = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
@@ -613,7 +807,7 @@ def create_user(
                 status_code=403,
                 detail="No tienes permiso para crear usuarios"
             )
-        return auth_service.create_user(user)
+        return await auth_service.create_user(user)
     except HTTPException:
         raise
     except Exception as e:
@@ -625,7 +819,7 @@ def create_user(
 
 # Endpoint para eliminar un usuario (solo para admins)
 @app.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: str,
     current_user: User = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
@@ -637,7 +831,7 @@ def delete_user(
                 status_code=403,
                 detail="No tienes permiso para eliminar usuarios"
             )
-        return auth_service.delete_user(user_id)
+        return await auth_service.delete_user(user_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -649,7 +843,7 @@ def delete_user(
 
 # Endpoint para actualizar un usuario (solo para admins)
 @app.put("/users/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: str,
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
@@ -662,7 +856,7 @@ def update_user(
                 status_code=403,
                 detail="No tienes permiso para actualizar usuarios"
             )
-        return auth_service.update_user(user_id, user_update)
+        return await auth_service.update_user(user_id, user_update)
     except HTTPException:
         raise
     except Exception as e:
@@ -682,6 +876,8 @@ def read_root():
     return FileResponse(str(BASE_DIR / "static" / "index.html"))
 
 if __name__ == '__main__':
+    import uvicorn
+
     config = uvicorn.Config(
         "app:app",
         host=os.getenv("HOST", "127.0.0.1"),
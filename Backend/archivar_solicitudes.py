@@ -0,0 +1,40 @@
+"""
+Archiva en lotes las solicitudes finalizadas (COMPLETADO/RECHAZADO).
+
+Pensado para ejecutarse periódicamente (cron, job de Container Apps):
+    python archivar_solicitudes.py
+    python archivar_solicitudes.py --dias 180 --lote 1000 --max-lotes 20
+
+Por defecto usa ARCHIVE_AFTER_DAYS y ARCHIVE_BATCH_SIZE. Se puede ejecutar
+en varias réplicas a la vez: cada lote bloquea sus filas hasta su commit
+(FOR UPDATE SKIP LOCKED; UPDLOCK + READPAST en SQL Server) y las demás
+réplicas se las saltan.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from database import get_session, dispose_engines
+from services.solicitud_service import SolicitudService, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(dias: int, lote: int, max_lotes: int):
+    try:
+        async for db in get_session():
+            total = await SolicitudService(db).archivar_lote(dias, lote, max_lotes)
+            logger.info("Solicitudes archivadas: %d", total)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiva solicitudes finalizadas antiguas")
+    parser.add_argument("--dias", type=int, default=ARCHIVE_AFTER_DAYS, help="antigüedad mínima en días")
+    parser.add_argument("--lote", type=int, default=ARCHIVE_BATCH_SIZE, help="solicitudes por transacción")
+    parser.add_argument("--max-lotes", type=int, default=0, help="máximo de lotes (0 = sin límite)")
+    args = parser.parse_args()
+    asyncio.run(main(args.dias, args.lote, args.max_lotes))
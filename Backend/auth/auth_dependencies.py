@@ -1,26 +1,110 @@
+from uuid import UUID
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import select
-from auth.auth_handler import AuthHandler
-from database import get_db
-from models import User
+from auth.auth_handler import get_auth_handler
+from auth.last_access import last_access
+from auth.user_cache import (
+    versiones_cache, usuario_en_cache, guardar_usuario,
+)
+from database import get_session
+from models import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-auth_handler = AuthHandler()
 
-def get_current_user(
+# Claims con los que un token no necesita cargar el usuario
+CLAIMS_USUARIO = ("uid", "rol", "activo", "tv")
+
+
+def _token_revocado() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail="Token revocado, vuelve a iniciar sesión",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _version_vigente(db: AsyncSession, user_id: UUID):
+    """(token_version, activo) del usuario, de la caché o con una consulta por clave primaria."""
+    clave = str(user_id)
+    if versiones_cache.activa:
+        vigente = versiones_cache.obtener(clave)
+        if vigente is not None:
+            return vigente
+    result = await db.execute(
+        select(User.token_version, User.activo).where(User.id == user_id)
+    )
+    fila = result.first()
+    # activo NULL (filas antiguas) cuenta como activo
+    vigente = (fila.token_version, fila.activo is not False) if fila else None
+    if vigente is not None and versiones_cache.activa:
+        versiones_cache.guardar(clave, vigente)
+    return vigente
+
+
+async def _cargar_usuario(db: AsyncSession, email: str) -> User:
+    user = usuario_en_cache(email)
+    if user is not None:
+        return user
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+
+    if not user:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+    guardar_usuario(email, user)
+    return user
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ) -> User:
     """
     Dependencia que obtiene el usuario actual basado en el token JWT.
     Se usa en endpoints que requieren autenticación.
+
+    Con un token con claims completos solo se comprueba (con caché) que su
+    versión siga vigente y el usuario activo; el User devuelto se construye
+    con los claims (id, email, rol, activo) y no está en la sesión. Para
+    el registro completo, usar get_current_user_completo.
     """
-    token_data = auth_handler.decode_token(token)
-    result = db.execute(select(User).where(User.email == token_data["sub"]))
-    user = result.scalar_one_or_none()
-    
-    if not user:
+    token_data = get_auth_handler().decode_token(token)
+    if not all(claim in token_data for claim in CLAIMS_USUARIO):
+        # Token emitido antes de los claims completos
+        user = await _cargar_usuario(db, token_data["sub"])
+        last_access.record_request(user.id)
+        return user
+
+    user_id = UUID(token_data["uid"])
+    vigente = await _version_vigente(db, user_id)
+    if vigente is None:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
-    return user
\ No newline at end of file
+    token_version, activo = vigente
+    if token_version != token_data["tv"] or not activo:
+        raise _token_revocado()
+
+    last_access.record_request(user_id)
+    return User(
+        id=user_id,
+        email=token_data["sub"],
+        rol=UserRole(token_data["rol"]),
+        activo=activo,
+        token_version=token_version,
+    )
+
+
+async def get_current_user_completo(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_session)
+) -> User:
+    """
+    Registro completo del usuario del token (con la caché de usuarios de
+    auth.user_cache). El usuario devuelto puede no estar en la sesión: para
+    modificarlo hay que cargarlo de nuevo.
+    """
+    token_data = get_auth_handler().decode_token(token)
+    user = await _cargar_usuario(db, token_data["sub"])
+    if "tv" in token_data and (user.token_version != token_data["tv"] or user.activo is False):
+        raise _token_revocado()
+    return user
@@ -1,10 +1,12 @@
 # auth_handler.py
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 import jwt
 from jwt import InvalidTokenError
-from passlib.context import CryptContext
 from fastapi import HTTPException
+from auth.password_hashing import build_password_context
+import hashlib
 import logging
 import os
 import secrets
@@ -28,11 +30,12 @@ class AuthHandler:
         self.access_token_expire_minutes = int(
             os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
         )
-        self.pwd_context = CryptContext(
-            schemes=["bcrypt"],
-            deprecated="auto",
-            bcrypt__rounds=12
+        self.refresh_token_expire_days = int(
+            os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7")
         )
+        # Misma configuración que los procesos de auth.password_hashing;
+        # estos métodos síncronos quedan para los scripts (semillas, CLI)
+        self.pwd_context = build_password_context()
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verifica si una contraseña coincide con su hash."""
@@ -68,6 +71,32 @@ class AuthHandler:
             logger.error(f"Error al crear token JWT: {str(e)}")
             raise
     
+    def create_user_access_token(self, user) -> str:
+        """
+        Crea el token de un usuario con los claims que usan los endpoints
+        (id, rol, activo) y su token_version, para no tener que cargarlo.
+        """
+        rol = user.rol.value if hasattr(user.rol, "value") else str(user.rol)
+        return self.create_access_token(data={
+            "sub": user.email,
+            "uid": str(user.id),
+            "rol": rol,
+            "activo": user.activo is not False,
+            "tv": user.token_version,
+        })
+
+    def generate_refresh_token(self) -> str:
+        """Genera un refresh token aleatorio (256 bits, URL-safe)."""
+        return secrets.token_urlsafe(32)
+
+    def hash_refresh_token(self, token: str) -> str:
+        """
+        SHA-256 del refresh token, que es lo único que se guarda. No hace
+        falta bcrypt: el token es aleatorio y no se puede adivinar por
+        fuerza bruta como una contraseña.
+        """
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
     def decode_token(self, token: str) -> dict:
         """Decodifica y verifica un token JWT."""
         try:
@@ -96,3 +125,9 @@ class AuthHandler:
                 status_code=500,
                 detail="Error al generar contraseña temporal"
             )
+
+
+@lru_cache(maxsize=1)
+def get_auth_handler() -> AuthHandler:
+    """Instancia compartida de AuthHandler, creada en el primer uso."""
+    return AuthHandler()
@@ -1,19 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_session
 from auth.auth_service import AuthService
+from auth.login_throttle import login_throttle
+from schemas import RefreshTokenRequest
 
 router = APIRouter(tags=["auth"])
 
 @router.post("/token")
-def login_for_access_token(
+async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
     """
     Endpoint para obtener un token JWT mediante credenciales de usuario.
+
+    Antes de consultar el usuario o verificar la contraseña se aplican los
+    límites de auth.login_throttle (429 con Retry-After).
+    """
+    ip = request.client.host if request.client else None
+    await login_throttle.check(ip, form_data.username)
+    auth_service = AuthService(db)
+    try:
+        result = await auth_service.authenticate_user(form_data.username, form_data.password)
+    except HTTPException as e:
+        if e.status_code == 401:
+            await login_throttle.record_failure(form_data.username)
+        raise
+    await login_throttle.record_success(form_data.username)
+    return result
+
+
+@router.post("/token/refresh")
+async def refresh_access_token(
+    body: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Endpoint para renovar el token JWT con un refresh token, sin contraseña.
+    Devuelve un token de acceso y un refresh token nuevos; el anterior deja
+    de valer.
+    """
+    auth_service = AuthService(db)
+    return await auth_service.refresh_access_token(body.refresh_token)
+
+
+@router.post("/token/revoke")
+async def revoke_refresh_token(
+    body: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Endpoint para cerrar la sesión: revoca el refresh token y los rotados
+    a partir del mismo inicio de sesión.
     """
     auth_service = AuthService(db)
-    result = auth_service.authenticate_user(form_data.username, form_data.password)
-    return result
\ No newline at end of file
+    return await auth_service.revoke_refresh_token(body.refresh_token)
@@ -1,10 +1,15 @@
 # auth_service.py
-from datetime import datetime
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import select
 from fastapi import HTTPException
-from models import User
-from auth.auth_handler import AuthHandler
+import metrics
+from models import User, RefreshToken
+from auth.auth_handler import get_auth_handler
+from auth.password_hashing import password_hasher
+from auth.user_cache import invalidar_usuario
+from auth.last_access import last_access
 import logging
 import uuid
 from schemas import UserCreate, UserUpdate, UserResponse, PasswordChange
@@ -13,15 +18,42 @@ from schemas import UserCreate, UserUpdate, UserResponse, PasswordChange
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+refrescos = metrics.Counter()
+refrescos_rechazados = metrics.Counter()
+reutilizaciones = metrics.Counter()
+
+metrics.register("refresh_tokens", lambda: {
+    "renovados": refrescos.value,
+    "rechazados": refrescos_rechazados.value,
+    "reutilizados": reutilizaciones.value,
+})
+
+
+def error_refresh_token() -> HTTPException:
+    refrescos_rechazados.inc()
+    return HTTPException(
+        status_code=401,
+        detail="Refresh token no válido o caducado, vuelve a iniciar sesión"
+    )
+
+
 class AuthService:
-    def __init__(self, db: Session):
+    """
+    Operaciones de autenticación y gestión de usuarios.
+
+    ``db`` es la sesión de ``database.get_session`` (``AsyncSession`` o
+    ``ThreadedSession``); el hashing bcrypt se ejecuta en el pool de procesos
+    de ``auth.password_hashing``, que responde 503 si está saturado.
+    """
+
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.auth_handler = AuthHandler()
+        self.auth_handler = get_auth_handler()
 
-    def authenticate_user(self, email: str, password: str):
+    async def authenticate_user(self, email: str, password: str):
         """Autentica un usuario."""
         try:
-            result = self.db.execute(
+            result = await self.db.execute(
                 select(User).where(User.email == email)
             )
             user = result.scalar_one_or_none()
@@ -33,25 +65,41 @@ class AuthService:
                     detail="Credenciales incorrectas"
                 )
 
-            # Verificar contraseña
-            if not self.auth_handler.verify_password(password, user.password_hash):
+            # Verificar contraseña; si el hash usa otro esquema o coste que
+            # la configuración actual se recibe uno nuevo, que se guarda
+            valida, nuevo_hash = await password_hasher.verify_and_update(password, user.password_hash)
+            if not valida:
                 logger.error("Verificación de contraseña fallida")
                 raise HTTPException(
                     status_code=401,
                     detail="Credenciales incorrectas"
                 )
 
-            # Actualizar último acceso
-            user.ultimo_acceso = datetime.utcnow()
-            self.db.commit()
+            if user.activo is False:
+                logger.error(f"Usuario desactivado: {email}")
+                raise HTTPException(
+                    status_code=403,
+                    detail="Usuario desactivado"
+                )
 
-            # Crear token
-            access_token = self.auth_handler.create_access_token(
-                data={"sub": user.email, "rol": user.rol.value}
-            )
+            # Último acceso (en diferido, ver auth.last_access) y un refresh
+            # token de una familia nueva: el login solo hace un INSERT. Los
+            # caducados se borran al rotar (refresh_access_token)
+            ahora = datetime.utcnow()
+            self._registrar_acceso(user, ahora)
+            if nuevo_hash is not None:
+                user.password_hash = nuevo_hash
+                logger.info(f"Hash de contraseña actualizado a la configuración actual: {email}")
+            refresh_token = self._issue_refresh_token(user)
+            await self.db.commit()
+            invalidar_usuario(user)
+
+            # Crear token (con id, rol, activo y token_version)
+            access_token = self.auth_handler.create_user_access_token(user)
 
             return {
                 "access_token": access_token,
+                "refresh_token": refresh_token,
                 "token_type": "bearer",
                 "user_rol": user.rol.value,
                 "user_role": user.rol.value,
@@ -68,13 +116,138 @@ class AuthService:
                 detail="Error interno del servidor"
             )
 
-    def create_user(self, user: UserCreate):
+    @staticmethod
+    def _registrar_acceso(user: User, ahora: datetime) -> None:
+        """
+        Guarda el último acceso en el búfer de auth.last_access, o en la
+        transacción en curso si está desactivado (LAST_ACCESS_FLUSH_SECONDS=0).
+        """
+        if last_access.enabled:
+            last_access.record(user.id, ahora)
+        else:
+            user.ultimo_acceso = ahora
+
+    def _issue_refresh_token(self, user: User, familia: uuid.UUID = None) -> str:
+        """Añade a la sesión un refresh token del usuario; lo confirma quien llama."""
+        token = self.auth_handler.generate_refresh_token()
+        self.db.add(RefreshToken(
+            id=uuid.uuid4(),
+            token_hash=self.auth_handler.hash_refresh_token(token),
+            familia=familia or uuid.uuid4(),
+            user_id=user.id,
+            token_version=user.token_version,
+            expira_en=datetime.utcnow() + timedelta(days=self.auth_handler.refresh_token_expire_days),
+        ))
+        return token
+
+    async def refresh_access_token(self, refresh_token: str):
+        """
+        Emite un token de acceso nuevo a partir de un refresh token, sin
+        verificar la contraseña: una búsqueda por índice del hash del token
+        y un UPDATE que lo marca como usado. El refresh token se rota (se
+        devuelve otro de la misma familia); presentar uno ya usado indica
+        que se ha filtrado y revoca la familia entera.
+        """
+        try:
+            ahora = datetime.utcnow()
+            fila = (await self.db.execute(
+                select(RefreshToken, User)
+                .join(User, User.id == RefreshToken.user_id)
+                .where(RefreshToken.token_hash == self.auth_handler.hash_refresh_token(refresh_token))
+            )).first()
+            if fila is None:
+                raise error_refresh_token()
+            token, user = fila
+
+            if token.usado_en is not None and token.revocado_en is None:
+                reutilizaciones.inc()
+                logger.warning(f"Refresh token reutilizado, se revoca su familia: {user.email}")
+                await self._revoke_family(token.familia, ahora)
+                await self.db.commit()
+                raise error_refresh_token()
+            if (
+                token.revocado_en is not None
+                or user.activo is False
+                or token.token_version != user.token_version
+            ):
+                raise error_refresh_token()
+
+            # Compare-and-set: si dos peticiones lo usan a la vez, solo una rota
+            usado = (await self.db.execute(
+                update(RefreshToken)
+                .where(
+                    RefreshToken.id == token.id,
+                    RefreshToken.usado_en.is_(None),
+                    RefreshToken.revocado_en.is_(None),
+                    RefreshToken.expira_en > ahora,
+                )
+                .values(usado_en=ahora)
+                .returning(RefreshToken.id)
+                .execution_options(synchronize_session=False)
+            )).first()
+            if usado is None:
+                await self.db.rollback()
+                raise error_refresh_token()
+
+            # De paso, en la misma transacción, se borran sus refresh tokens caducados
+            await self.db.execute(
+                delete(RefreshToken)
+                .where(RefreshToken.user_id == user.id, RefreshToken.expira_en < ahora)
+                .execution_options(synchronize_session=False)
+            )
+            nuevo_refresh_token = self._issue_refresh_token(user, token.familia)
+            await self.db.commit()
+            refrescos.inc()
+
+            return {
+                "access_token": self.auth_handler.create_user_access_token(user),
+                "refresh_token": nuevo_refresh_token,
+                "token_type": "bearer",
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error inesperado en refresh_access_token: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail="Error interno del servidor"
+            )
+
+    async def revoke_refresh_token(self, refresh_token: str):
+        """Revoca la familia del refresh token (cierre de sesión)."""
+        try:
+            familia = (await self.db.execute(
+                select(RefreshToken.familia)
+                .where(RefreshToken.token_hash == self.auth_handler.hash_refresh_token(refresh_token))
+            )).scalar_one_or_none()
+            if familia is not None:
+                await self._revoke_family(familia, datetime.utcnow())
+                await self.db.commit()
+            return {"message": "Sesión cerrada correctamente"}
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error al revocar refresh token: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail="Error al cerrar la sesión"
+            )
+
+    async def _revoke_family(self, familia: uuid.UUID, ahora: datetime) -> None:
+        await self.db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.familia == familia, RefreshToken.revocado_en.is_(None))
+            .values(revocado_en=ahora)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def create_user(self, user: UserCreate):
         """Crea un nuevo usuario con una contraseña temporal."""
         try:
             # Verificar si el usuario ya existe
-            existing_user = self.db.execute(
+            existing_user = (await self.db.execute(
                 select(User).where(User.email == user.email)
-            ).scalar_one_or_none()
+            )).scalar_one_or_none()
             if existing_user:
                 logger.error(f"El email ya está registrado: {user.email}")
                 raise HTTPException(
@@ -84,7 +257,7 @@ class AuthService:
 
             # Generar una contraseña temporal
             temporary_password = self.auth_handler.generate_temporary_password()
-            password_hash = self.auth_handler.get_password_hash(temporary_password)
+            password_hash = await password_hasher.hash(temporary_password)
 
             # Crear el nuevo usuario
             new_user = User(
@@ -98,8 +271,8 @@ class AuthService:
             )
 
             self.db.add(new_user)
-            self.db.commit()
-            self.db.refresh(new_user)
+            await self.db.commit()
+            await self.db.refresh(new_user)
 
             logger.info("Usuario creado con éxito: %s", new_user.email)
 
@@ -110,19 +283,19 @@ class AuthService:
         except HTTPException:
             raise
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Error al crear usuario: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail="Error al crear el usuario"
             )
 
-    def delete_user(self, user_id: str):
+    async def delete_user(self, user_id: str):
         """Elimina un usuario por su ID."""
         try:
-            user = self.db.execute(
+            user = (await self.db.execute(
                 select(User).where(User.id == user_id)
-            ).scalar_one_or_none()
+            )).scalar_one_or_none()
             if not user:
                 logger.error(f"Usuario no encontrado: {user_id}")
                 raise HTTPException(
@@ -130,8 +303,9 @@ class AuthService:
                     detail="Usuario no encontrado"
                 )
 
-            self.db.delete(user)
-            self.db.commit()
+            await self.db.delete(user)
+            await self.db.commit()
+            invalidar_usuario(user)
 
             logger.info(f"Usuario eliminado con éxito: {user_id}")
 
@@ -139,19 +313,19 @@ class AuthService:
         except HTTPException:
             raise
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Error al eliminar usuario: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail="Error al eliminar el usuario"
             )
 
-    def update_user(self, user_id: str, user_update: UserUpdate):
+    async def update_user(self, user_id: str, user_update: UserUpdate):
         """Actualiza los datos de un usuario."""
         try:
-            user = self.db.execute(
+            user = (await self.db.execute(
                 select(User).where(User.id == user_id)
-            ).scalar_one_or_none()
+            )).scalar_one_or_none()
             if not user:
                 logger.error(f"Usuario no encontrado: {user_id}")
                 raise HTTPException(
@@ -159,18 +333,27 @@ class AuthService:
                     detail="Usuario no encontrado"
                 )
 
+            # Cambiar el rol, desactivar o cambiar la contraseña revoca los
+            # tokens emitidos (claims rol/activo/tv)
+            revocar = False
             if user_update.nombre_completo is not None:
                 user.nombre_completo = user_update.nombre_completo
             if user_update.rol is not None:
+                revocar = revocar or user_update.rol.value != user.rol.value
                 user.rol = user_update.rol
             if user_update.activo is not None:
+                revocar = revocar or (user.activo is not False and not user_update.activo)
                 user.activo = user_update.activo
             if user_update.password is not None:
-                user.password_hash = self.auth_handler.get_password_hash(user_update.password)
+                user.password_hash = await password_hasher.hash(user_update.password)
                 user.is_temporary_password = False  # Si se cambia la contraseña, ya no es temporal
+                revocar = True
+            if revocar:
+                user.token_version = User.token_version + 1
 
-            self.db.commit()
-            self.db.refresh(user)
+            await self.db.commit()
+            invalidar_usuario(user)
+            await self.db.refresh(user)
 
             logger.info(f"Usuario actualizado con éxito: {user_id}")
 
@@ -178,22 +361,24 @@ class AuthService:
         except HTTPException:
             raise
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Error al actualizar usuario: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail="Error al actualizar el usuario"
             )
 
-    def get_all_users(self):
+    async def get_all_users(self):
         """Obtiene todos los usuarios."""
         try:
-            result = self.db.execute(select(User))
+            result = await self.db.execute(select(User))
             users = result.scalars().all()
 
             logger.info(f"Se encontraron {len(users)} usuarios")
 
             return [UserResponse.from_orm(user) for user in users]
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error al obtener usuarios: {str(e)}", exc_info=True)
             raise HTTPException(
@@ -201,11 +386,23 @@ class AuthService:
                 detail="Error al obtener los usuarios"
             )
 
-    def change_password(self, user: User, password_change: PasswordChange):
+    async def change_password(self, user: User, password_change: PasswordChange):
         """Permite a un usuario cambiar su contraseña."""
         try:
+            # current_user puede venir de la caché, fuera de la sesión
+            user = (await self.db.execute(
+                select(User).where(User.id == user.id)
+            )).scalar_one_or_none()
+            if not user:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Usuario no encontrado"
+                )
+
             # Verificar la contraseña actual
-            if not self.auth_handler.verify_password(password_change.current_password, user.password_hash):
+            if not await password_hasher.verify(
+                password_change.current_password, user.password_hash
+            ):
                 logger.error("Contraseña actual incorrecta")
                 raise HTTPException(
                     status_code=401,
@@ -213,19 +410,30 @@ class AuthService:
                 )
 
             # Actualizar la contraseña
-            user.password_hash = self.auth_handler.get_password_hash(password_change.new_password)
+            user.password_hash = await password_hasher.hash(password_change.new_password)
             user.is_temporary_password = False  # La contraseña ya no es temporal
-            user.ultimo_acceso = datetime.utcnow()
-            self.db.commit()
-            self.db.refresh(user)
+            self._registrar_acceso(user, datetime.utcnow())
+            # Revoca los tokens anteriores (también los refresh tokens); se
+            # devuelven unos nuevos con la versión incrementada
+            user.token_version = User.token_version + 1
+            await self.db.commit()
+            invalidar_usuario(user)
+            await self.db.refresh(user)
+            refresh_token = self._issue_refresh_token(user)
+            await self.db.commit()
 
             logger.info(f"Contraseña cambiada con éxito para usuario: {user.email}")
 
-            return {"message": "Contraseña actualizada correctamente"}
+            return {
+                "message": "Contraseña actualizada correctamente",
+                "access_token": self.auth_handler.create_user_access_token(user),
+                "refresh_token": refresh_token,
+                "token_type": "bearer",
+            }
         except HTTPException:
             raise
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Error al cambiar contraseña: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
@@ -0,0 +1,166 @@
+"""
+Escritura diferida de ``usuarios.ultimo_acceso``.
+
+El inicio de sesión actualizaba la fila del usuario en su propia
+transacción solo para guardar la hora del último acceso. En su lugar,
+``LastAccessRecorder`` guarda en memoria la hora más reciente por id de
+usuario y una tarea en segundo plano las escribe cada
+``LAST_ACCESS_FLUSH_SECONDS``: un ``UPDATE ... SET ultimo_acceso = CASE id
+...`` por cada ``LAST_ACCESS_BATCH_SIZE`` usuarios, haya habido los inicios
+de sesión que haya. Lo pendiente también se escribe al parar la app.
+
+* ``LAST_ACCESS_FLUSH_SECONDS=0`` desactiva el buffer: quien llama escribe
+  la columna en su propia transacción, como antes.
+* ``LAST_ACCESS_TRACK_REQUESTS=true`` registra además cada petición
+  autenticada (``get_current_user``), así que ``ultimo_acceso`` pasa a ser
+  la última actividad y no el último inicio de sesión, igualmente sin una
+  escritura por petición.
+
+Las horas llegan como mucho un intervalo tarde, y un worker que muere (sin
+pararse) pierde las pendientes. Si una escritura falla, sus entradas se
+conservan para el siguiente intento. Métricas en ``last_access``.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, literal, update
+
+import metrics
+from database import get_session
+from models import User
+
+logger = logging.getLogger(__name__)
+
+LAST_ACCESS_FLUSH_SECONDS = float(os.getenv("LAST_ACCESS_FLUSH_SECONDS", "10"))
+LAST_ACCESS_TRACK_REQUESTS = os.getenv("LAST_ACCESS_TRACK_REQUESTS", "false").lower() == "true"
+# Usuarios por UPDATE; cada uno ocupa tres parámetros (SQL Server admite 2100)
+LAST_ACCESS_BATCH_SIZE = int(os.getenv("LAST_ACCESS_BATCH_SIZE", "500"))
+
+
+class LastAccessRecorder:
+    """Último acceso de cada usuario, escrito en la base de datos por lotes."""
+
+    def __init__(
+        self,
+        interval: float = LAST_ACCESS_FLUSH_SECONDS,
+        track_requests: bool = LAST_ACCESS_TRACK_REQUESTS,
+        batch_size: int = LAST_ACCESS_BATCH_SIZE,
+    ):
+        self.interval = interval
+        self.track_requests = track_requests
+        self.batch_size = batch_size
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = metrics.Counter()
+        self.written = metrics.Counter()
+        self.errors = metrics.Counter()
+        self.flush_latency = metrics.Histogram()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def record(self, user_id, when: Optional[datetime] = None) -> None:
+        """Anota un acceso; de cada usuario solo se escribe el más reciente."""
+        when = when or datetime.utcnow()
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or when > previous:
+                self._pending[user_id] = when
+        self.recorded.inc()
+
+    def record_request(self, user_id) -> None:
+        """Anota una petición autenticada, si LAST_ACCESS_TRACK_REQUESTS está activo."""
+        if self.enabled and self.track_requests:
+            self.record(user_id)
+
+    def _restore(self, entries: dict) -> None:
+        with self._lock:
+            for user_id, when in entries.items():
+                previous = self._pending.get(user_id)
+                if previous is None or when > previous:
+                    self._pending[user_id] = when
+
+    async def flush(self) -> int:
+        """Escribe las horas pendientes; devuelve a cuántos usuarios."""
+        with self._lock:
+            entries, self._pending = self._pending, {}
+        if not entries:
+            return 0
+
+        start = time.perf_counter()
+        items = list(entries.items())
+        try:
+            async for db in get_session():
+                for i in range(0, len(items), self.batch_size):
+                    batch = dict(items[i:i + self.batch_size])
+                    await db.execute(
+                        update(User)
+                        .where(User.id.in_(list(batch)))
+                        .values(ultimo_acceso=case(
+                            {
+                                user_id: literal(when, type_=User.ultimo_acceso.type)
+                                for user_id, when in batch.items()
+                            },
+                            value=User.id,
+                        ))
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+        except Exception as e:
+            self.errors.inc()
+            self._restore(entries)
+            logger.error(f"No se pudo escribir ultimo_acceso de {len(entries)} usuarios: {str(e)}")
+            return 0
+        self.flush_latency.observe((time.perf_counter() - start) * 1000)
+        self.written.inc(len(entries))
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Error inesperado al escribir ultimo_acceso: %s", e)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="last-access-flush")
+
+    async def stop(self) -> None:
+        """Para la tarea en segundo plano y escribe lo pendiente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self.interval,
+            "track_requests": self.track_requests,
+            "pending": pending,
+            "recorded": self.recorded.value,
+            "written": self.written.value,
+            "errors": self.errors.value,
+            "flush_ms": self.flush_latency.snapshot(),
+        }
+
+
+last_access = LastAccessRecorder()
+
+metrics.register("last_access", last_access.snapshot)
@@ -0,0 +1,287 @@
+"""
+Limitación de intentos de inicio de sesión en /token, con ventana deslizante.
+
+Cada intento cuesta una búsqueda del usuario y una verificación bcrypt (ver
+auth.password_hashing), así que adivinar contraseñas o probar credenciales
+robadas consume la misma capacidad que necesitan los usuarios reales.
+``LoginThrottle`` rechaza los intentos con 429 + Retry-After *antes* de que
+/token acceda a la base de datos o a bcrypt:
+
+* Por IP del cliente: como mucho ``LOGIN_IP_MAX_ATTEMPTS`` intentos
+  (correctos o no) en los últimos ``LOGIN_IP_WINDOW_SECONDS``.
+* Por cuenta (el usuario enviado, en minúsculas): tras
+  ``LOGIN_ACCOUNT_MAX_FAILURES`` intentos fallidos en los últimos
+  ``LOGIN_ACCOUNT_WINDOW_SECONDS`` la cuenta se bloquea
+  ``LOGIN_LOCKOUT_SECONDS``. Cada nuevo bloqueo mientras se recuerda el
+  anterior dura el doble, hasta ``LOGIN_LOCKOUT_MAX_SECONDS``. Un inicio
+  de sesión correcto borra los fallos y el nivel de bloqueo de la cuenta.
+
+Las ventanas son registros deslizantes con la hora de cada intento. Por
+defecto están en la memoria del proceso, así que cada worker cuenta por su
+cuenta (con ``WEB_CONCURRENCY`` workers pasan hasta ese múltiplo de los
+límites). Con ``LOGIN_THROTTLE_REDIS_URL`` se comparten entre workers y
+réplicas a través de Redis; solo entonces se importa el paquete ``redis``.
+Si Redis falla, los intentos se dejan pasar (y se cuentan en
+``backend_errors``) en lugar de bloquear a todo el mundo.
+
+La IP del cliente es ``request.client.host``; detrás de un proxy inverso,
+uvicorn debe ejecutarse con ``--proxy-headers`` (como en el Dockerfile)
+para que sea la del cliente real y no la del proxy.
+
+Métricas en ``login_throttle``: intentos rechazados por cada límite,
+bloqueos iniciados y errores del almacén.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOGIN_IP_MAX_ATTEMPTS = int(os.getenv("LOGIN_IP_MAX_ATTEMPTS", "20"))
+LOGIN_IP_WINDOW_SECONDS = float(os.getenv("LOGIN_IP_WINDOW_SECONDS", "60"))
+LOGIN_ACCOUNT_MAX_FAILURES = int(os.getenv("LOGIN_ACCOUNT_MAX_FAILURES", "5"))
+LOGIN_ACCOUNT_WINDOW_SECONDS = float(os.getenv("LOGIN_ACCOUNT_WINDOW_SECONDS", "900"))
+LOGIN_LOCKOUT_SECONDS = float(os.getenv("LOGIN_LOCKOUT_SECONDS", "30"))
+LOGIN_LOCKOUT_MAX_SECONDS = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "900"))
+LOGIN_THROTTLE_REDIS_URL = os.getenv("LOGIN_THROTTLE_REDIS_URL", "").strip()
+
+# Claves que guarda el almacén en memoria (se descartan las menos usadas),
+# para que una avalancha de usuarios inventados no lo haga crecer sin límite.
+MEMORY_STORE_MAX_KEYS = 100_000
+
+# Longitud máxima del usuario usado como clave; uno más largo no es un email válido.
+MAX_ACCOUNT_KEY_LENGTH = 254
+
+
+class LoginThrottledError(HTTPException):
+    """Demasiados intentos desde esta IP o para esta cuenta (429)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail="Demasiados intentos de inicio de sesión, inténtalo de nuevo más tarde",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+# ── Almacenes ────────────────────────────────────────────────
+#
+# Los dos almacenes guardan, por clave, un registro deslizante de horas
+# (``hit`` añade una y devuelve cuántas caen en la ventana y la más antigua)
+# y un bloqueo (hasta, nivel) que caduca solo.
+
+class MemoryStore:
+    """Almacén de cada worker; cada registro guarda como mucho ``limit`` horas."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = MEMORY_STORE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._logs: "OrderedDict[str, deque]" = OrderedDict()
+        self._locks: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _put(entries: OrderedDict, key: str, value, max_keys: int) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_keys:
+            entries.popitem(last=False)
+
+    async def hit(self, key: str, window: float, limit: int, now: float) -> Tuple[int, float]:
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None:
+                log = deque(maxlen=limit)
+            while log and log[0] <= now - window:
+                log.popleft()
+            log.append(now)
+            self._put(self._logs, key, log, self.max_keys)
+            return len(log), log[0]
+
+    async def clear(self, key: str) -> None:
+        with self._lock:
+            self._logs.pop(key, None)
+            self._locks.pop(key, None)
+
+    async def get_lockout(self, key: str, now: float) -> Optional[Tuple[float, int]]:
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                return None
+            until, level, expires = entry
+            if expires <= now:
+                del self._locks[key]
+                return None
+            return until, level
+
+    async def set_lockout(self, key: str, until: float, level: int, ttl: float, now: float) -> None:
+        with self._lock:
+            self._logs.pop(key, None)
+            self._put(self._locks, key, (until, level, now + ttl), self.max_keys)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisStore:
+    """Almacén compartido por todos los workers y réplicas, con sorted sets de Redis."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+
+    async def hit(self, key: str, window: float, limit: int, now: float) -> Tuple[int, float]:
+        log_key = f"login:log:{key}"
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zremrangebyscore(log_key, 0, now - window)
+        pipe.zadd(log_key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+        # Como en memoria, solo se guardan las ``limit`` entradas más recientes
+        pipe.zremrangebyrank(log_key, 0, -limit - 1)
+        pipe.zcard(log_key)
+        pipe.zrange(log_key, 0, 0, withscores=True)
+        pipe.expire(log_key, math.ceil(window))
+        _, _, _, count, oldest, _ = await pipe.execute()
+        return count, oldest[0][1] if oldest else now
+
+    async def clear(self, key: str) -> None:
+        await self._redis.delete(f"login:log:{key}", f"login:lock:{key}")
+
+    async def get_lockout(self, key: str, now: float) -> Optional[Tuple[float, int]]:
+        value = await self._redis.get(f"login:lock:{key}")
+        if value is None:
+            return None
+        until, level = value.decode().split(":")
+        return float(until), int(level)
+
+    async def set_lockout(self, key: str, until: float, level: int, ttl: float, now: float) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(f"login:log:{key}")
+        pipe.set(f"login:lock:{key}", f"{until}:{level}", ex=math.ceil(ttl))
+        await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+# ── Limitador ────────────────────────────────────────────────
+
+class LoginThrottle:
+    """Límites por IP y por cuenta del endpoint /token."""
+
+    def __init__(
+        self,
+        store,
+        ip_max_attempts: int = LOGIN_IP_MAX_ATTEMPTS,
+        ip_window: float = LOGIN_IP_WINDOW_SECONDS,
+        account_max_failures: int = LOGIN_ACCOUNT_MAX_FAILURES,
+        account_window: float = LOGIN_ACCOUNT_WINDOW_SECONDS,
+        lockout: float = LOGIN_LOCKOUT_SECONDS,
+        lockout_max: float = LOGIN_LOCKOUT_MAX_SECONDS,
+    ):
+        self.store = store
+        self.ip_max_attempts = ip_max_attempts
+        self.ip_window = ip_window
+        self.account_max_failures = account_max_failures
+        self.account_window = account_window
+        self.lockout = lockout
+        self.lockout_max = lockout_max
+        self.throttled_ip = metrics.Counter()
+        self.throttled_account = metrics.Counter()
+        self.lockouts = metrics.Counter()
+        self.backend_errors = metrics.Counter()
+
+    @staticmethod
+    def account_key(username: str) -> str:
+        return (username or "").strip().lower()[:MAX_ACCOUNT_KEY_LENGTH]
+
+    async def _guarded(self, operation):
+        """Ejecuta una llamada al almacén; si falla, lo registra y deja pasar el intento."""
+        try:
+            return await operation
+        except Exception as e:
+            self.backend_errors.inc()
+            logger.error(f"Error en el almacén de límites de inicio de sesión ({self.store.name}): {str(e)}")
+            return None
+
+    async def check(self, ip: Optional[str], username: str) -> None:
+        """
+        Cuenta un intento desde ``ip`` y lo rechaza si la IP o la cuenta
+        superan su límite. Se llama antes de buscar el usuario.
+
+        Raises:
+            LoginThrottledError: 429 con Retry-After
+        """
+        now = time.time()
+        if ip and self.ip_max_attempts > 0:
+            hit = await self._guarded(self.store.hit(f"ip:{ip}", self.ip_window, self.ip_max_attempts + 1, now))
+            if hit is not None and hit[0] > self.ip_max_attempts:
+                self.throttled_ip.inc()
+                raise LoginThrottledError(hit[1] + self.ip_window - now)
+
+        if self.account_max_failures > 0:
+            lockout = await self._guarded(self.store.get_lockout(f"user:{self.account_key(username)}", now))
+            if lockout is not None and lockout[0] > now:
+                self.throttled_account.inc()
+                raise LoginThrottledError(lockout[0] - now)
+
+    async def record_failure(self, username: str) -> None:
+        """Cuenta un intento fallido; bloquea la cuenta al llegar al límite."""
+        if self.account_max_failures <= 0:
+            return
+        key = f"user:{self.account_key(username)}"
+        now = time.time()
+        hit = await self._guarded(self.store.hit(key, self.account_window, self.account_max_failures, now))
+        if hit is None or hit[0] < self.account_max_failures:
+            return
+        previous = await self._guarded(self.store.get_lockout(key, now))
+        level = previous[1] + 1 if previous is not None else 0
+        duration = min(self.lockout * 2 ** level, self.lockout_max)
+        # El nivel se recuerda una ventana más tras el bloqueo, así que quien
+        # espera a que termine recibe uno más largo la próxima vez.
+        await self._guarded(self.store.set_lockout(key, now + duration, level, duration + self.account_window, now))
+        self.lockouts.inc()
+        logger.warning(f"Cuenta bloqueada {duration:.0f} s tras {hit[0]} intentos fallidos (nivel {level})")
+
+    async def record_success(self, username: str) -> None:
+        if self.account_max_failures > 0:
+            await self._guarded(self.store.clear(f"user:{self.account_key(username)}"))
+
+    async def close(self) -> None:
+        await self._guarded(self.store.close())
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": self.store.name,
+            "ip_max_attempts": self.ip_max_attempts,
+            "account_max_failures": self.account_max_failures,
+            "throttled_ip": self.throttled_ip.value,
+            "throttled_account": self.throttled_account.value,
+            "lockouts": self.lockouts.value,
+            "backend_errors": self.backend_errors.value,
+        }
+
+
+def build_store():
+    if LOGIN_THROTTLE_REDIS_URL:
+        logger.info("Límites de inicio de sesión compartidos a través de Redis")
+        return RedisStore(LOGIN_THROTTLE_REDIS_URL)
+    return MemoryStore()
+
+
+login_throttle = LoginThrottle(build_store())
+
+metrics.register("login_throttle", login_throttle.snapshot)
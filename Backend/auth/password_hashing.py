@@ -0,0 +1,252 @@
+"""
+Hash y verificación de contraseñas fuera del pool de hilos de las peticiones.
+
+bcrypt es costoso en CPU a propósito (unos 250 ms por llamada con 12
+rondas). En el pool de hilos compartido de anyio, una ráfaga de inicios de
+sesión ocupa los hilos que necesitan el resto de endpoints (y
+``DB_SESSION_MODE=sync``). Aquí se ejecuta en un ``ProcessPoolExecutor``
+propio y acotado:
+
+* ``PASSWORD_HASH_WORKERS`` procesos, que arrancan con el primer uso
+  (contexto "spawn", así que no heredan hilos ni conexiones). Con ``0`` se
+  mantiene el comportamiento anterior de calcular el hash en el pool de
+  hilos.
+* Como mucho ``PASSWORD_HASH_MAX_PENDING`` llamadas en curso o en cola por
+  worker de la aplicación. Por encima, fallan enseguida con
+  ``PasswordHashingBusyError`` (HTTP 503 + Retry-After) en lugar de
+  esperar segundos en la cola.
+* Métricas en ``password_hashing``: llamadas pendientes y en cola,
+  rechazos e histogramas de latencia (total por operación y tiempo en
+  bcrypt).
+
+* El esquema y el coste salen de ``PASSWORD_HASH_SCHEME`` (``bcrypt`` o
+  ``argon2``), ``BCRYPT_ROUNDS`` y ``ARGON2_*``; se miden en la máquina de
+  destino con ``benchmark_hash_cost.py``. Los hashes hechos con otro
+  esquema o coste se siguen verificando, y ``verify_and_update`` devuelve
+  uno nuevo para ellos (``needs_update`` de passlib), que el login guarda:
+  al cambiar la configuración los usuarios se migran según inician sesión.
+
+Las funciones de los workers están en este módulo, que solo importa
+passlib y utilidades ligeras, para que cada proceso arranque rápido.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+import multiprocessing
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Esquemas con los que se verifican los hashes guardados; las contraseñas
+# nuevas usan PASSWORD_HASH_SCHEME y el resto quedan obsoletos (se vuelven a
+# calcular en el siguiente login). argon2 necesita el paquete argon2-cffi,
+# que solo se carga al calcular o comprobar un hash argon2.
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt").strip().lower()
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+
+def build_password_context(
+    scheme: str = PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> CryptContext:
+    """
+    El CryptContext que usan la API, sus procesos de workers y los scripts.
+    Los argumentos permiten a benchmark_hash_cost.py probar otros valores.
+    """
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(f"PASSWORD_HASH_SCHEME debe ser uno de {', '.join(PASSWORD_HASH_SCHEMES)}")
+    return CryptContext(
+        schemes=[scheme] + [other for other in PASSWORD_HASH_SCHEMES if other != scheme],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+# ── Lado del worker ──────────────────────────────────────────
+
+_worker_context = None
+
+
+def _context() -> CryptContext:
+    global _worker_context
+    if _worker_context is None:
+        _worker_context = build_password_context()
+    return _worker_context
+
+
+def _hash(password: str) -> tuple:
+    start = time.perf_counter()
+    hashed = _context().hash(password)
+    return hashed, (time.perf_counter() - start) * 1000
+
+
+def _verify(password: str, hashed: str) -> tuple:
+    start = time.perf_counter()
+    valid = _context().verify(password, hashed)
+    return valid, (time.perf_counter() - start) * 1000
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple:
+    """((válida, hash nuevo o None), ms); hash nuevo solo si ha cambiado la configuración."""
+    start = time.perf_counter()
+    context = _context()
+    valid = context.verify(password, hashed)
+    new_hash = context.hash(password) if valid and context.needs_update(hashed) else None
+    return (valid, new_hash), (time.perf_counter() - start) * 1000
+
+
+# ── Lado de la API ───────────────────────────────────────────
+
+class PasswordHashingBusyError(HTTPException):
+    """Demasiadas llamadas de hash pendientes, o el pool de workers caído (503)."""
+
+    def __init__(self, detail: str = "Servicio de autenticación saturado, inténtalo de nuevo en unos segundos"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": "2"})
+
+
+class PasswordHasher:
+    """Ejecutor acotado de bcrypt que comparten las peticiones de un worker de la aplicación."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = metrics.Counter()
+        self.rehashed = metrics.Counter()
+        self.latency = {"hash": metrics.Histogram(), "verify": metrics.Histogram()}
+        self.bcrypt_latency = metrics.Histogram()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset(self) -> None:
+        """Descarta un pool roto; la siguiente llamada arranca uno nuevo."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected.inc()
+                raise PasswordHashingBusyError()
+            self.pending += 1
+
+    def _release(self, *_) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def _run(self, operation: str, fn, *args):
+        self._acquire()
+        start = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                result, bcrypt_ms = await run_in_threadpool(fn, *args)
+            finally:
+                self._release()
+        else:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError):
+                self._release()
+                self._reset()
+                raise PasswordHashingBusyError("Servicio de autenticación no disponible temporalmente")
+            # La plaza se libera cuando termina el worker, aunque la
+            # petición se cancele mientras espera.
+            future.add_done_callback(self._release)
+            try:
+                result, bcrypt_ms = await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                logger.error("El pool de workers de hash de contraseñas se ha roto; se reinicia")
+                self._reset()
+                raise PasswordHashingBusyError("Servicio de autenticación no disponible temporalmente")
+        self.latency[operation].observe((time.perf_counter() - start) * 1000)
+        self.bcrypt_latency.observe(bcrypt_ms)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """False si la contraseña no coincide y también si el hash está mal formado."""
+        try:
+            return await self._run("verify", _verify, password, hashed)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error en verify_password: {str(e)}")
+            return False
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Como verify, y además un hash nuevo cuando ``hashed`` usa otro esquema
+        o coste que la configuración actual (lo guarda quien llama).
+        """
+        try:
+            valid, new_hash = await self._run("verify", _verify_and_update, password, hashed)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error en verify_password: {str(e)}")
+            return False, None
+        if new_hash is not None:
+            self.rehashed.inc()
+        return valid, new_hash
+
+    def shutdown(self) -> None:
+        self._reset()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            pending = self.pending
+        return {
+            "scheme": PASSWORD_HASH_SCHEME,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "queued": max(0, pending - self.workers) if self.workers > 0 else None,
+            "rejected": self.rejected.value,
+            "rehashed": self.rehashed.value,
+            "hash_ms": self.latency["hash"].snapshot(),
+            "verify_ms": self.latency["verify"].snapshot(),
+            "bcrypt_ms": self.bcrypt_latency.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+metrics.register("password_hashing", password_hasher.snapshot)
@@ -0,0 +1,112 @@
+"""
+Cachés en memoria de usuarios para get_current_user.
+
+* versiones_cache: (token_version, activo) por id de usuario. Es lo único
+  que get_current_user consulta para un token con claims completos (id,
+  rol, activo, tv): si la versión coincide y el usuario sigue activo, el
+  resto se toma del token. TOKEN_VERSION_CACHE_TTL_SECONDS acota cuánto
+  tarda otro worker en ver una revocación.
+* usuarios_cache: copia de las columnas del usuario por sujeto del token
+  (el email), para los endpoints que necesitan el registro completo
+  (/users/me) y los tokens emitidos antes de los claims completos. Cada
+  acierto devuelve una instancia User nueva, sin sesión, así que dos
+  peticiones nunca comparten el objeto.
+
+Ambas guardan como mucho USER_CACHE_MAX_ENTRIES entradas (se descartan las
+menos usadas). AuthService invalida las entradas de un usuario al iniciar
+sesión, actualizarlo, eliminarlo o cambiar su contraseña en este worker;
+en los demás workers el cambio se ve al caducar el TTL.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import inspect
+
+import metrics
+from models import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1000"))
+TOKEN_VERSION_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", "10"))
+
+_COLUMNAS = [atributo.key for atributo in inspect(User).column_attrs]
+
+
+class CacheTTL:
+    """Valores con TTL y expulsión LRU."""
+
+    def __init__(self, ttl: float, max_entradas: int):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.Counter()
+        self.misses = metrics.Counter()
+        self.invalidaciones = metrics.Counter()
+
+    @property
+    def activa(self) -> bool:
+        return self.ttl > 0 and self.max_entradas > 0
+
+    def obtener(self, clave: str):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                self._entradas.pop(clave, None)
+                self.misses.inc()
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits.inc()
+            return entrada[1]
+
+    def guardar(self, clave: str, valor) -> None:
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, clave: str) -> None:
+        with self._lock:
+            if self._entradas.pop(clave, None) is not None:
+                self.invalidaciones.inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.activa,
+            "entries": len(self._entradas),
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "invalidations": self.invalidaciones.value,
+        }
+
+
+usuarios_cache = CacheTTL(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+versiones_cache = CacheTTL(TOKEN_VERSION_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+metrics.register("user_cache", usuarios_cache.snapshot)
+metrics.register("token_version_cache", versiones_cache.snapshot)
+
+
+def usuario_en_cache(email: str) -> Optional[User]:
+    columnas = usuarios_cache.obtener(email) if usuarios_cache.activa else None
+    return User(**columnas) if columnas is not None else None
+
+
+def guardar_usuario(email: str, user: User) -> None:
+    if usuarios_cache.activa:
+        usuarios_cache.guardar(email, {columna: getattr(user, columna) for columna in _COLUMNAS})
+
+
+def invalidar_usuario(user: User) -> None:
+    """Llamar tras confirmar (commit) un cambio en el usuario."""
+    usuarios_cache.invalidar(user.email)
+    versiones_cache.invalidar(str(user.id))
@@ -0,0 +1,183 @@
+"""
+Concurrency check for approvals (services.aprobacion_service).
+
+For each round, inserts one synthetic solicitud pending for the director
+and fires ``--parallel`` director approvals at it at the same time, each
+on its own session, against the configured DATABASE_URL. Exactly one must
+succeed and the rest must get 409; the solicitud must end up
+PENDIENTE_PEDIDOS with version 2. Also reports the latency of the winning
+transition.
+
+``--batch N`` also races two POST /api/solicitudes/aprobar-lote batches
+(services.aprobacion_service.aprobar_rechazar_lote) over the same N
+solicitudes, checking that each one is approved by exactly one batch,
+and times N single approvals (one session each, as N requests would)
+against one batch of N.
+
+Exits with status 1 if any round has zero or several winners, or an error
+other than 409. The synthetic solicitudes are deleted at the end; use a
+scratch database anyway.
+
+Usage:
+    python benchmark_aprobaciones.py
+    python benchmark_aprobaciones.py --parallel 20 --rounds 50
+    python benchmark_aprobaciones.py --rounds 0 --batch 50
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+
+from database import AsyncSessionLocal, dispose_engines
+from models import Solicitud, EstadoSolicitud
+from services.aprobacion_service import aprobar_rechazar, aprobar_rechazar_lote
+
+# comercial_id of the synthetic rows, so the cleanup only touches those
+BENCHMARK_COMERCIAL_ID = uuid.uuid5(uuid.NAMESPACE_URL, "benchmark_aprobaciones")
+
+APROBACION_DIRECTOR = {"aprobar": True, "marcas": ["BENCH"], "tarifa": "T1", "notas": "benchmark"}
+
+
+async def create_solicitudes(count: int) -> list:
+    ids = [uuid.uuid4() for _ in range(count)]
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(Solicitud), [{
+            "id": solicitud_id,
+            "comercial_id": BENCHMARK_COMERCIAL_ID,
+            "datos_cliente": {"nombre": "Benchmark aprobaciones SL"},
+            "estado": EstadoSolicitud.PENDIENTE_DIRECTOR,
+            "notas": {},
+        } for solicitud_id in ids])
+        await session.commit()
+    return ids
+
+
+async def approve(solicitud_id: uuid.UUID, start: asyncio.Event):
+    """Return ("ok", ms), ("409", ms) or ("error: ...", ms)."""
+    async with AsyncSessionLocal() as session:
+        await start.wait()
+        t0 = time.perf_counter()
+        try:
+            await aprobar_rechazar(session, solicitud_id, "director", dict(APROBACION_DIRECTOR))
+            outcome = "ok"
+        except HTTPException as exc:
+            outcome = "409" if exc.status_code == 409 else f"error: {exc.status_code} {exc.detail}"
+        except Exception as exc:
+            outcome = f"error: {exc!r}"
+        return outcome, (time.perf_counter() - t0) * 1000
+
+
+async def run_round(parallel: int):
+    solicitud_id, = await create_solicitudes(1)
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(approve(solicitud_id, start)) for _ in range(parallel)]
+    await asyncio.sleep(0.05)  # let every task open its session
+    start.set()
+    results = await asyncio.gather(*tasks)
+    async with AsyncSessionLocal() as session:
+        final = (await session.execute(
+            select(Solicitud.estado, Solicitud.version).where(Solicitud.id == solicitud_id)
+        )).first()
+    return results, final
+
+
+async def approve_batch(ids: list, start: asyncio.Event) -> list:
+    async with AsyncSessionLocal() as session:
+        await start.wait()
+        return await aprobar_rechazar_lote(session, ids, "director", dict(APROBACION_DIRECTOR))
+
+
+async def run_batch(size: int) -> list:
+    """Race two batches over the same ids, then time singles against a batch."""
+    failures = []
+    ids = await create_solicitudes(size)
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(approve_batch(ids, start)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    start.set()
+    first, second = await asyncio.gather(*tasks)
+    for a, b in zip(first, second):
+        codes = sorted((a["status_code"], b["status_code"]))
+        if codes != [200, 409]:
+            failures.append(f"batch race: solicitud {a['id']} got {codes}")
+    print(f"2 racing batches of {size}: {sum(r['status_code'] == 200 for r in first + second)} approvals")
+
+    ids = await create_solicitudes(size)
+    t0 = time.perf_counter()
+    for solicitud_id in ids:
+        async with AsyncSessionLocal() as session:
+            await aprobar_rechazar(session, solicitud_id, "director", dict(APROBACION_DIRECTOR))
+    singles_ms = (time.perf_counter() - t0) * 1000
+
+    ids = await create_solicitudes(size)
+    t0 = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        results = await aprobar_rechazar_lote(session, ids, "director", dict(APROBACION_DIRECTOR))
+    batch_ms = (time.perf_counter() - t0) * 1000
+    if any(r["status_code"] != 200 for r in results):
+        failures.append("batch of fresh solicitudes did not approve them all")
+    print(f"{size} single approvals: {singles_ms:.1f} ms; one batch of {size}: {batch_ms:.1f} ms")
+    return failures
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(Solicitud).where(Solicitud.comercial_id == BENCHMARK_COMERCIAL_ID))
+        await session.commit()
+
+
+async def run(args) -> list:
+    failures = []
+    winner_ms = []
+    try:
+        for n in range(args.rounds):
+            results, final = await run_round(args.parallel)
+            wins = [ms for outcome, ms in results if outcome == "ok"]
+            conflicts = sum(1 for outcome, _ in results if outcome == "409")
+            errors = [outcome for outcome, _ in results if outcome.startswith("error")]
+            winner_ms.extend(wins)
+            if len(wins) != 1 or errors:
+                failures.append(f"round {n}: {len(wins)} winners, {conflicts} conflicts, errors {errors[:3]}")
+            elif (final.estado, final.version) != (EstadoSolicitud.PENDIENTE_PEDIDOS, 2):
+                failures.append(f"round {n}: final state {final.estado} version {final.version}")
+        print(
+            f"{args.rounds} rounds x {args.parallel} parallel approvals: "
+            f"{args.rounds - len(failures)} rounds with exactly one winner"
+        )
+        if winner_ms:
+            winner_ms.sort()
+            print(
+                f"winning transition p50={winner_ms[len(winner_ms) // 2]:.1f} ms "
+                f"max={winner_ms[-1]:.1f} ms"
+            )
+        if args.batch:
+            failures.extend(await run_batch(args.batch))
+    finally:
+        await cleanup()
+        await dispose_engines()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallel", type=int, default=10, help="concurrent approvals per solicitud")
+    parser.add_argument("--rounds", type=int, default=20, help="solicitudes to race on")
+    parser.add_argument("--batch", type=int, default=0, metavar="N", help="also race and time batches of N")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("OK: exactly one approval wins each race")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Latency benchmark for /api/solicitudes/search (services.busqueda_service).
+
+Runs each query ``--runs`` times against the configured DATABASE_URL and
+reports p50/p95 per query and overall. Exits with status 1 when the overall
+p95 exceeds the budget, so it can run in CI or before a release.
+
+``--generate N`` first inserts N synthetic solicitudes (with their search
+terms) owned by a fixed benchmark comercial_id; ``--cleanup`` deletes them
+afterwards. Use a scratch database for that, not production.
+
+Usage:
+    python benchmark_busqueda.py
+    python benchmark_busqueda.py --generate 500000 --runs 50
+    python benchmark_busqueda.py --query "martinez valencia" --query B123 --budget-ms 30
+    python benchmark_busqueda.py --cleanup
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, insert
+
+from database import AsyncSessionLocal, dispose_engines
+from models import Solicitud, SolicitudTermino, EstadoSolicitud
+from services.busqueda_service import buscar, terminos_solicitud
+
+# comercial_id of the synthetic rows, so --cleanup only touches those
+BENCHMARK_COMERCIAL_ID = uuid.uuid5(uuid.NAMESPACE_URL, "benchmark_busqueda")
+
+DEFAULT_QUERIES = [
+    "malte", "B0012345", "ferco suri", "valencia maritel", "c12345@example",
+    "hogar", "b00199999", "dismaco", "ana lopez valencia",
+]
+
+_SYLLABLES = [
+    "ma", "ri", "tel", "co", "sur", "nor", "fer", "ele", "ctro", "ho",
+    "gar", "dis", "tri", "bu", "cio", "nes", "al", "ba", "ce", "te",
+]
+_TOWNS = ["valencia", "madrid", "sevilla", "bilbao", "murcia", "alicante", "malaga", "zaragoza"]
+
+
+async def generate(total: int, batch: int = 5000) -> None:
+    rnd = random.Random(1)
+    async with AsyncSessionLocal() as session:
+        for start in range(0, total, batch):
+            solicitudes, terminos = [], []
+            for i in range(start, min(total, start + batch)):
+                nombre = " ".join(
+                    "".join(rnd.choice(_SYLLABLES) for _ in range(3)) for _ in range(2)
+                ) + " SL"
+                datos = {
+                    "nombre": nombre,
+                    "cif_nif": "B%08d" % i,
+                    "poblacion": rnd.choice(_TOWNS),
+                    "correo": f"c{i}@example.es",
+                    "nombreContacto": "Ana Lopez",
+                }
+                solicitud_id = uuid.uuid4()
+                solicitudes.append({
+                    "id": solicitud_id,
+                    "comercial_id": BENCHMARK_COMERCIAL_ID,
+                    "datos_cliente": datos,
+                    "estado": EstadoSolicitud.PENDIENTE_DIRECTOR,
+                    "notas": {},
+                })
+                terminos.extend(
+                    {"solicitud_id": solicitud_id, "termino": termino, "peso": peso}
+                    for termino, peso in terminos_solicitud(datos).items()
+                )
+            await session.execute(insert(Solicitud), solicitudes)
+            await session.execute(insert(SolicitudTermino), terminos)
+            await session.commit()
+            print(f"generated {min(total, start + batch)}/{total}", flush=True)
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(Solicitud).where(Solicitud.comercial_id == BENCHMARK_COMERCIAL_ID)
+        )
+        await session.commit()
+        print(f"deleted {result.rowcount} synthetic solicitudes")
+
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(queries, runs: int, limit: int):
+    """Return {query: (hits, [ms per run])}."""
+    timings = {}
+    async with AsyncSessionLocal() as session:
+        for query in queries:
+            await buscar(session, query, limit)  # warm-up
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                hits = await buscar(session, query, limit)
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[query] = (len(hits), samples)
+    return timings
+
+
+async def run(args):
+    try:
+        if args.cleanup:
+            await cleanup()
+            return None
+        if args.generate:
+            await generate(args.generate)
+        return await measure(args.query or DEFAULT_QUERIES, args.runs, args.limit)
+    finally:
+        await dispose_engines()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", help="query to time (repeatable)")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--limit", type=int, default=20, help="results per search, as the API default")
+    parser.add_argument(
+        "--budget-ms", type=float,
+        default=float(os.getenv("SEARCH_P95_BUDGET_MS", "50")),
+    )
+    parser.add_argument("--generate", type=int, default=0, metavar="N", help="insert N synthetic solicitudes first")
+    parser.add_argument("--cleanup", action="store_true", help="delete the synthetic solicitudes and exit")
+    args = parser.parse_args()
+
+    timings = asyncio.run(run(args))
+    if timings is None:
+        return 0
+
+    all_samples = []
+    for query, (hits, samples) in timings.items():
+        all_samples.extend(samples)
+        print(
+            f"{query!r:24} hits={hits:3}  p50={_percentile(samples, 0.5):7.1f} ms"
+            f"  p95={_percentile(samples, 0.95):7.1f} ms"
+        )
+    p95 = _percentile(all_samples, 0.95)
+    print(f"overall p95: {p95:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if p95 > args.budget_ms:
+        print("FAIL: search p95 over budget")
+        return 1
+    print("OK: search p95 within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Scaling benchmark for fuzzy duplicate detection (services.duplicados_service).
+
+Builds the blocking index in memory for growing synthetic datasets, using the
+same key and similarity functions as the API, and reports for each size:
+
+1. Candidates compared per submission check, against a naive check that
+   compares with every existing solicitud.
+2. Comparisons made by the batch report, against all n*(n-1)/2 pairs.
+3. Time per submission check, and whether planted near-duplicates (accents,
+   "S.L." vs "SL", word order, one typo) are found.
+
+No database is needed. Exits with status 1 when the per-check comparisons
+grow as fast as the dataset (i.e. the check is not sub-linear) or when a
+planted duplicate is missed.
+
+Usage:
+    python benchmark_duplicados.py
+    python benchmark_duplicados.py --sizes 1000 10000 100000 --checks 500
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+
+from normalizacion import normalizar_texto
+from services.duplicados_service import (
+    DUPLICATE_NAME_THRESHOLD, claves_bloqueo, nombre_comparable, similitud,
+)
+
+_SYLLABLES = [
+    "ma", "ri", "tel", "co", "sur", "nor", "fer", "ele", "ctro", "ho",
+    "gar", "dis", "tri", "bu", "cio", "nes", "al", "ba", "ce", "te",
+    "mí", "ñe", "zá", "gó",
+]
+_SUFFIXES = ["S.L.", "SL", "S.A.", "", "SLU"]
+
+
+def _random_name(rnd: random.Random) -> str:
+    words = [
+        "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        for _ in range(rnd.randint(1, 3))
+    ]
+    return " ".join(words + [rnd.choice(_SUFFIXES)]).strip()
+
+
+def _variant(rnd: random.Random, name: str) -> str:
+    """A near-duplicate as a sales rep would type it."""
+    words = name.replace("S.L.", "SL").split()
+    if len(words) > 2 and rnd.random() < 0.5:
+        words[0], words[1] = words[1], words[0]
+    variant = " ".join(words).upper()
+    if rnd.random() < 0.5:
+        variant = normalizar_texto(variant).upper()  # typed without accents
+    if rnd.random() < 0.5 and len(variant) > 8:
+        # one dropped letter, past the blocking prefix of the first word
+        i = rnd.randint(5, len(variant) - 1)
+        variant = variant[:i] + variant[i + 1:]
+    return variant
+
+
+def build(size: int, rnd: random.Random, postal_codes: int):
+    """Return (raw names, comparable names, postal codes, blocks: key -> [index])."""
+    raw, names, cps, blocks = [], [], [], defaultdict(list)
+    for i in range(size):
+        name = _random_name(rnd)
+        cp = "%05d" % rnd.randrange(postal_codes)
+        raw.append(name)
+        names.append(nombre_comparable(name))
+        cps.append(cp)
+        for key in claves_bloqueo(name, cp):
+            blocks[key].append(i)
+    return raw, names, cps, blocks
+
+
+def check(name: str, cp: str, names, blocks, threshold: float):
+    """Return (candidates compared, best similarity) for one submission."""
+    candidates = set()
+    for key in claves_bloqueo(name, cp):
+        candidates.update(blocks.get(key, ()))
+    comparable = nombre_comparable(name)
+    best = max((similitud(comparable, names[i]) for i in candidates), default=0.0)
+    return len(candidates), best
+
+
+def report_comparisons(blocks) -> int:
+    """Distinct pairs compared by the batch report (pairs inside each block)."""
+    seen = set()
+    for members in blocks.values():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                seen.add((members[a], members[b]))
+    return len(seen)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--checks", type=int, default=300, help="submission checks per size")
+    parser.add_argument(
+        "--postal-codes", type=int, default=11000,
+        help="distinct postal codes (Spain has about 11,000)",
+    )
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_NAME_THRESHOLD)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>8} {'cmp/check':>10} {'naive':>8} {'report cmp':>11} {'naive pairs':>14} "
+        f"{'ms/check':>9} {'found':>7}"
+    )
+    per_check = []
+    failures = []
+    for size in args.sizes:
+        rnd = random.Random(size)
+        raw, names, cps, blocks = build(size, rnd, args.postal_codes)
+        raw_names = [_random_name(random.Random(size * 7 + i)) for i in range(args.checks)]
+
+        compared = 0
+        found = 0
+        start = time.perf_counter()
+        for i in range(args.checks):
+            # half the checks are planted near-duplicates of an existing row
+            if i % 2 == 0:
+                target = rnd.randrange(size)
+                n, best = check(_variant(rnd, raw[target]), cps[target], names, blocks, args.threshold)
+                found += best >= args.threshold
+            else:
+                n, _ = check(raw_names[i], "%05d" % rnd.randrange(args.postal_codes), names, blocks, args.threshold)
+            compared += n
+        elapsed_ms = (time.perf_counter() - start) * 1000 / args.checks
+
+        planted = (args.checks + 1) // 2
+        per_check.append(compared / args.checks)
+        print(
+            f"{size:>8} {compared / args.checks:>10.1f} {size:>8} {report_comparisons(blocks):>11} "
+            f"{size * (size - 1) // 2:>14} {elapsed_ms:>9.3f} {found:>3}/{planted}"
+        )
+        if found < planted * 0.9:
+            failures.append(f"only {found}/{planted} planted duplicates found at size {size}")
+
+    if len(args.sizes) > 1:
+        growth = per_check[-1] / max(per_check[0], 1e-9)
+        data_growth = args.sizes[-1] / args.sizes[0]
+        print(f"comparisons per check grew x{growth:.1f} while the data grew x{data_growth:.0f}")
+        if growth >= data_growth:
+            failures.append("comparisons per check grow linearly with the data")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("OK: duplicate check stays sub-linear")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
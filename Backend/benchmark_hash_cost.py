@@ -0,0 +1,165 @@
+"""
+Password hashing cost calibration (auth.password_hashing).
+
+Measures, on this machine, how long one hash and one verification take for
+each scheme and cost:
+
+* bcrypt: ``--bcrypt-rounds`` (default 10-14). Each extra round doubles
+  the cost.
+* argon2: every ``--argon2-time-costs`` x ``--argon2-memory-kib``
+  combination (needs the argon2-cffi package; skipped otherwise).
+
+Settings whose verification is already over 4x the budget are not
+measured further. For each scheme it recommends the strongest setting
+whose median verification fits ``--budget-ms``. It also prints the login
+throughput that setting allows per app worker with
+PASSWORD_HASH_WORKERS processes, and the variables to set. Run it on the
+target machine (e.g. a Container Apps replica with the production vCPU
+size), not a laptop.
+
+Changing the settings is safe: existing hashes keep verifying and are
+rehashed with the new settings on each user's next login.
+
+Exits with status 1 when the configured setting (PASSWORD_HASH_SCHEME,
+BCRYPT_ROUNDS, ARGON2_*) takes longer than the budget.
+
+Usage:
+    python benchmark_hash_cost.py
+    python benchmark_hash_cost.py --budget-ms 150 --samples 10
+    python benchmark_hash_cost.py --schemes argon2 --argon2-memory-kib 19456,65536
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from auth.password_hashing import (  # noqa: E402
+    ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST, BCRYPT_ROUNDS,
+    PASSWORD_HASH_SCHEME, PASSWORD_HASH_SCHEMES, PASSWORD_HASH_WORKERS, build_password_context,
+)
+
+PASSWORD = "calibracion-Contraseña-1"
+
+
+def _int_list(value: str) -> list:
+    if "-" in value:
+        low, high = value.split("-")
+        return list(range(int(low), int(high) + 1))
+    return [int(item) for item in value.split(",") if item]
+
+
+def _argon2_available() -> bool:
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def measure(settings: dict, samples: int) -> tuple:
+    """Return (hash ms, verify ms) medians for one setting."""
+    context = build_password_context(**settings)
+    hash_ms, verify_ms = [], []
+    hashed = context.hash(PASSWORD)  # warm-up (loads the backend)
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        hashed = context.hash(PASSWORD)
+        hash_ms.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        verify_ms.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(hash_ms), statistics.median(verify_ms)
+
+
+def candidates(args):
+    """(scheme, label, settings, variables) in increasing cost per scheme."""
+    if "bcrypt" in args.schemes:
+        for rounds in args.bcrypt_rounds:
+            yield "bcrypt", f"rounds={rounds}", {"scheme": "bcrypt", "bcrypt_rounds": rounds}, {
+                "PASSWORD_HASH_SCHEME": "bcrypt", "BCRYPT_ROUNDS": rounds,
+            }
+    if "argon2" in args.schemes:
+        for memory in args.argon2_memory_kib:
+            for time_cost in args.argon2_time_costs:
+                settings = {
+                    "scheme": "argon2", "argon2_time_cost": time_cost,
+                    "argon2_memory_cost": memory, "argon2_parallelism": args.argon2_parallelism,
+                }
+                yield "argon2", f"t={time_cost} m={memory} KiB p={args.argon2_parallelism}", settings, {
+                    "PASSWORD_HASH_SCHEME": "argon2", "ARGON2_TIME_COST": time_cost,
+                    "ARGON2_MEMORY_COST": memory, "ARGON2_PARALLELISM": args.argon2_parallelism,
+                }
+
+
+def current_settings() -> dict:
+    return {
+        "scheme": PASSWORD_HASH_SCHEME,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "argon2_time_cost": ARGON2_TIME_COST,
+        "argon2_memory_cost": ARGON2_MEMORY_COST,
+        "argon2_parallelism": ARGON2_PARALLELISM,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=250, help="verification latency budget per login")
+    parser.add_argument("--samples", type=int, default=5, help="hash/verify pairs per setting")
+    parser.add_argument("--schemes", default=",".join(PASSWORD_HASH_SCHEMES))
+    parser.add_argument("--bcrypt-rounds", type=_int_list, default="10-14", help="e.g. 10-14 or 11,12")
+    parser.add_argument("--argon2-time-costs", type=_int_list, default="1-4")
+    parser.add_argument("--argon2-memory-kib", type=_int_list, default="19456,47104,65536")
+    parser.add_argument("--argon2-parallelism", type=int, default=ARGON2_PARALLELISM)
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS or 1,
+                        help="hashing processes per app worker, for the throughput estimate")
+    args = parser.parse_args()
+    args.schemes = [scheme.strip() for scheme in args.schemes.split(",") if scheme.strip()]
+    if "argon2" in args.schemes and not _argon2_available():
+        print("argon2: skipped (pip install argon2-cffi to measure it)")
+        args.schemes.remove("argon2")
+
+    best = {}
+    too_slow = set()
+    print(f"{'scheme':8} {'setting':28} {'hash':>9} {'verify':>9} {'logins/s':>9}")
+    for scheme, label, settings, variables in candidates(args):
+        group = (scheme, settings.get("argon2_memory_cost"))
+        if group in too_slow:
+            continue
+        hash_ms, verify_ms = measure(settings, args.samples)
+        throughput = args.workers * 1000 / verify_ms
+        fits = verify_ms <= args.budget_ms
+        print(
+            f"{scheme:8} {label:28} {hash_ms:7.1f}ms {verify_ms:7.1f}ms {throughput:9.1f}"
+            f"{'' if fits else '  over budget'}"
+        )
+        if fits:
+            best[scheme] = (label, verify_ms, throughput, variables)
+        elif verify_ms > 4 * args.budget_ms:
+            too_slow.add(group)
+
+    print(f"\nRecommended for a {args.budget_ms:.0f} ms budget ({args.workers} hashing processes per app worker):")
+    if not best:
+        print("  no setting fits; raise the budget or add CPU")
+    for scheme, (label, verify_ms, throughput, variables) in best.items():
+        print(f"  {scheme}: {label} (verify {verify_ms:.0f} ms, ~{throughput:.1f} logins/s per app worker)")
+        print("    " + " ".join(f"{name}={value}" for name, value in variables.items()))
+
+    settings = current_settings()
+    if settings["scheme"] == "argon2" and not _argon2_available():
+        print("FAIL: PASSWORD_HASH_SCHEME=argon2 but argon2-cffi is not installed")
+        return 1
+    _, verify_ms = measure(settings, args.samples)
+    if verify_ms > args.budget_ms:
+        print(f"FAIL: configured {settings['scheme']} settings verify in {verify_ms:.0f} ms, over the budget")
+        return 1
+    print(f"OK: configured {settings['scheme']} settings verify in {verify_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Login-storm benchmark for auth.password_hashing.
+
+Fires ``--logins`` concurrent bcrypt verifications (what /token does for
+each login) and, meanwhile, probes every ``--probe-interval-ms`` how long a
+trivial call takes to get through the anyio thread pool, which is what
+sync endpoints and DB_SESSION_MODE=sync queries wait for. Runs twice:
+
+1. threads: PASSWORD_HASH_WORKERS=0, hashing in the thread pool (the old
+   behaviour).
+2. processes: the bounded process pool, with the configured workers and
+   pending limit (calls over the limit are rejected with 503).
+
+Reports logins served and rejected, storm duration and the probe p50/p95.
+Exits with status 1 when the probe p95 in process mode is over the budget.
+No database is needed.
+
+Usage:
+    python benchmark_hashing.py
+    python benchmark_hashing.py --logins 300 --workers 4 --max-pending 64
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from anyio import to_thread
+from starlette.concurrency import run_in_threadpool
+
+from auth.password_hashing import (
+    PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS, PasswordHasher, PasswordHashingBusyError,
+    build_password_context,
+)
+from database import THREADPOOL_MAX_WORKERS
+
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def storm(hasher: PasswordHasher, hashed: str, logins: int, interval_ms: float):
+    """Return (served, rejected, storm seconds, probe latencies in ms)."""
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_MAX_WORKERS
+    # Warm-up: start the worker processes outside the measurement
+    await asyncio.gather(*(hasher.verify("secreto", hashed) for _ in range(max(1, hasher.workers))))
+
+    outcomes = []
+
+    async def login():
+        try:
+            outcomes.append(await hasher.verify("secreto", hashed))
+        except PasswordHashingBusyError:
+            outcomes.append(None)
+
+    probes = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await run_in_threadpool(lambda: None)
+            probes.append((time.perf_counter() - t0) * 1000)
+            await asyncio.sleep(interval_ms / 1000)
+
+    probe_task = asyncio.create_task(probe())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await probe_task
+    hasher.shutdown()
+    served = sum(1 for outcome in outcomes if outcome)
+    rejected = sum(1 for outcome in outcomes if outcome is None)
+    return served, rejected, elapsed, probes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="concurrent logins in the storm")
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS or 2)
+    parser.add_argument("--max-pending", type=int, default=PASSWORD_HASH_MAX_PENDING)
+    parser.add_argument("--probe-interval-ms", type=float, default=10)
+    parser.add_argument("--budget-ms", type=float, default=50, help="probe p95 budget in process mode")
+    args = parser.parse_args()
+
+    hashed = build_password_context().hash("secreto")
+    results = {}
+    for mode, workers, max_pending in (
+        ("threads", 0, args.logins),
+        ("processes", args.workers, args.max_pending),
+    ):
+        served, rejected, elapsed, probes = asyncio.run(
+            storm(PasswordHasher(workers, max_pending), hashed, args.logins, args.probe_interval_ms)
+        )
+        results[mode] = _percentile(probes, 0.95)
+        print(
+            f"{mode:10} served={served:4} rejected={rejected:4} storm={elapsed:6.2f} s  "
+            f"thread pool probe p50={_percentile(probes, 0.5):7.1f} ms p95={results[mode]:7.1f} ms"
+        )
+
+    if results["processes"] > args.budget_ms:
+        print(f"FAIL: thread pool probe p95 over {args.budget_ms:.0f} ms during the storm")
+        return 1
+    print("OK: the login storm does not starve the thread pool")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
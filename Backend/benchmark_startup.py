@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark for the API.
+
+Measures, in fresh interpreter processes:
+
+1. Import time of ``app`` (``python -X importtime``), with the slowest
+   modules by cumulative time.
+2. Time to first request: starts uvicorn and polls ``/health/live`` until it
+   answers. This includes the lifespan (schema version check and first DB
+   connection), so it needs the usual .env / DATABASE_URL.
+
+Exits with status 1 when a measurement exceeds its budget, so it can run in
+CI or before a release.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 5 --import-budget-ms 1200 --first-request-budget-ms 4000
+    python benchmark_startup.py --skip-first-request   # no database needed
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def measure_import(top: int):
+    """Return (total ms, [(cumulative ms, module)]) for one cold ``import app``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit("import app failed")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self_us | cumulative_us | <indent>module"
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((int(cumulative_us) / 1000, name.strip()))
+
+    total = next((ms for ms, name in modules if name == "app"), 0.0)
+    slowest = sorted((m for m in modules if m[1] != "app"), reverse=True)[:top]
+    return total, slowest
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(timeout: float) -> float:
+    """Start uvicorn and return ms until ``/health/live`` answers 200."""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    url = f"http://127.0.0.1:{port}/health/live"
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                sys.stderr.write(proc.stderr.read().decode(errors="replace")[-2000:])
+                raise SystemExit("uvicorn exited before answering")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise SystemExit(f"No answer from {url} within {timeout:.0f} s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per measurement (median is used)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument(
+        "--import-budget-ms", type=float,
+        default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500")),
+    )
+    parser.add_argument(
+        "--first-request-budget-ms", type=float,
+        default=float(os.getenv("STARTUP_FIRST_REQUEST_BUDGET_MS", "5000")),
+    )
+    parser.add_argument("--skip-first-request", action="store_true")
+    args = parser.parse_args()
+
+    failures = []
+
+    import_runs = [measure_import(args.top) for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in import_runs)
+    print(f"import app: {import_ms:.0f} ms (median of {args.runs}, budget {args.import_budget_ms:.0f} ms)")
+    print("slowest imports (cumulative):")
+    for ms, name in import_runs[-1][1]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append("import")
+
+    if not args.skip_first_request:
+        first_ms = statistics.median(measure_first_request(timeout=60) for _ in range(args.runs))
+        print(
+            f"time to first request: {first_ms:.0f} ms "
+            f"(median of {args.runs}, budget {args.first_request_budget_ms:.0f} ms)"
+        )
+        if first_ms > args.first_request_budget_ms:
+            failures.append("first request")
+
+    if failures:
+        print(f"FAIL: cold start over budget ({', '.join(failures)})")
+        return 1
+    print("OK: cold start within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
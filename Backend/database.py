@@ -9,23 +9,58 @@ Supports two authentication modes for Azure SQL:
    (``user:password@host``). Works with any database backend.
 
 2. **Entra ID service-principal mode**: set ``AZURE_CLIENT_ID``,
-   ``AZURE_TENANT_ID`` and ``AZURE_CLIENT_SECRET``. The module acquires an
-   Azure AD token via MSAL and injects it into the ODBC connection string.
-   ``DATABASE_URL`` should still point at the server/database (credentials
-   are not needed in the URL in this mode).
+   ``AZURE_TENANT_ID`` and ``AZURE_CLIENT_SECRET``. An ``EntraTokenProvider``
+   caches the Azure AD token, refreshes it in the background ahead of expiry
+   and injects it into every new ODBC connection (``attrs_before``).
+   ``DB_SERVER`` and ``DB_NAME`` identify the server/database; ``DATABASE_URL``
+   must still be set but its credentials are not used in this mode.
+
+Importing the module is cheap: settings are read from the environment, but
+engines and session factories are built lazily on first use (see
+``_LazyDatabase``), and MSAL is only imported when Entra ID is configured.
+
+Request handlers obtain their session through ``get_session``. With
+``DB_SESSION_MODE=async`` (default) that is a native ``AsyncSession`` on
+``async_engine``; with ``DB_SESSION_MODE=sync`` it is a ``ThreadedSession``
+that exposes the same awaitable API but runs every call of the sync
+``SessionLocal`` in the anyio thread pool, so both paths can be benchmarked
+side by side without touching the endpoints.
+
+Pool sizing comes from ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``,
+``DB_POOL_TIMEOUT`` and ``DB_POOL_RECYCLE``; when ``DB_MAX_CONNECTIONS`` is set
+it is split across ``WEB_CONCURRENCY`` workers so the whole container stays
+under the database session limit. Both engines use instrumented pools whose
+checkout waits and occupancy are exported through ``metrics``.
+
+Sessions from ``get_session`` go through ``db_resilience``: transient errors
+on the first statement of a unit of work are retried with backoff, and a
+circuit breaker answers 503 while the database is down.
+
+The schema is managed by Alembic (``migrations/``). ``init_db`` (run once per
+deployment by ``python init_db.py``) migrates under a database lock and
+seeds the admin; API workers only call ``check_schema_version`` at startup.
 """
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from pathlib import Path
+from functools import cached_property
 import os
 import logging
-import msal
 import time
-import asyncio
+import threading
+
+from entra_token import EntraTokenProvider, SQL_COPT_SS_ACCESS_TOKEN
+from db_resilience import ResilientSessionMixin, run_async
+import metrics
 
 # Configuration
 logging.basicConfig(level=logging.INFO)
@@ -41,91 +76,279 @@ TENANT_ID = os.getenv("AZURE_TENANT_ID", "")
 
 USE_ENTRA_AUTH = bool(CLIENT_ID and CLIENT_SECRET and TENANT_ID)
 
-
-def get_access_token() -> str:
-    """Acquire an Azure AD access token for the database resource."""
-    authority = f"https://login.microsoftonline.com/{TENANT_ID}"
-    app = msal.ConfidentialClientApplication(
+# Created lazily: the API fetches the first token at startup
+# (warm_access_token); scripts fetch it when the first connection is opened.
+token_provider = (
+    EntraTokenProvider(
         CLIENT_ID,
-        authority=authority,
-        client_credential=CLIENT_SECRET,
+        CLIENT_SECRET,
+        TENANT_ID,
+        refresh_margin_seconds=int(os.getenv("ENTRA_TOKEN_REFRESH_MARGIN_SECONDS", "600")),
     )
-    scope = ["https://database.windows.net/.default"]
-    result = app.acquire_token_for_client(scopes=scope)
+    if USE_ENTRA_AUTH
+    else None
+)
+
+
+def get_access_token() -> str:
+    """Return the cached Azure AD access token for the database resource."""
+    if token_provider is None:
+        raise ValueError("Entra ID authentication is not configured")
+    return token_provider.get_token()
 
-    if "access_token" not in result:
-        error_description = result.get(
-            "error_description", "No error description provided"
-        )
-        logger.error("Failed to acquire access token: %s", error_description)
-        raise ValueError(f"Failed to acquire access token: {error_description}")
 
-    logger.info("Access token acquired successfully")
-    return result["access_token"]
+async def warm_access_token() -> None:
+    """
+    Fetch the first Entra ID token in a worker thread and start its
+    background refresher, so ``_inject_access_token`` only reads the cache
+    and never runs the MSAL network call on the event loop. No-op without
+    Entra ID.
+    """
+    if token_provider is not None:
+        await run_in_threadpool(token_provider.get_token_struct)
 
 
-# ── Build the SQLAlchemy URLs ────────────────────────────────────
+# ── Settings ─────────────────────────────────────────────────────
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
-if not DATABASE_URL:
-    raise ValueError(
-        "DATABASE_URL environment variable is not set. "
-        "Copy Backend/.env.example to Backend/.env and configure it."
-    )
+# Session flavour handed to request handlers: "async" or "sync".
+DB_SESSION_MODE = os.getenv("DB_SESSION_MODE", "async").strip().lower()
 
-if USE_ENTRA_AUTH:
-    # Entra ID service-principal mode: build an ODBC connection string
-    # with the acquired token. DATABASE_URL is expected to be an
-    # aioodbc URL whose query portion contains the server/database.
-    access_token = get_access_token()
-    conn_str = (
-        "DRIVER={ODBC Driver 18 for SQL Server};"
-        f"SERVER={os.getenv('DB_SERVER', '')};"
-        f"DATABASE={os.getenv('DB_NAME', '')};"
-        "Authentication=ActiveDirectoryServicePrincipal;"
-        "Encrypt=yes;"
-        f"UID={CLIENT_ID};"
-        f"PWD={CLIENT_SECRET};"
-        f"AccessToken={access_token}"
-    )
-    encoded = quote_plus(conn_str)
-    SYNC_DATABASE_URL = f"mssql+pyodbc:///?odbc_connect={encoded}"
-    ASYNC_DATABASE_URL = f"mssql+aioodbc:///?odbc_connect={encoded}"
-else:
-    # Connection-string mode: use DATABASE_URL directly.
-    SYNC_DATABASE_URL = DATABASE_URL
-    # Derive the async URL from the sync URL for common drivers.
-    if DATABASE_URL.startswith("mssql+pyodbc://"):
-        ASYNC_DATABASE_URL = DATABASE_URL.replace(
-            "mssql+pyodbc://", "mssql+aioodbc://", 1
+if DB_SESSION_MODE not in ("async", "sync"):
+    raise ValueError("DB_SESSION_MODE must be 'async' or 'sync'")
+
+# (sync driver, async driver) pairs used to derive one URL from the other.
+_DRIVER_PAIRS = (
+    ("mssql+pyodbc", "mssql+aioodbc"),
+    ("postgresql+psycopg2", "postgresql+asyncpg"),
+    ("postgresql", "postgresql+asyncpg"),
+)
+
+
+def build_database_urls() -> tuple:
+    """Return (sync URL, async URL) for the configured database."""
+    if not DATABASE_URL:
+        raise ValueError(
+            "DATABASE_URL environment variable is not set. "
+            "Copy Backend/.env.example to Backend/.env and configure it."
         )
-    else:
-        ASYNC_DATABASE_URL = DATABASE_URL
 
-logger.info("Database URL configured (credentials hidden)")
+    if USE_ENTRA_AUTH:
+        # Entra ID service-principal mode: the ODBC connection string carries
+        # no credentials; the token is attached per connection by
+        # _inject_access_token below.
+        conn_str = (
+            "DRIVER={ODBC Driver 18 for SQL Server};"
+            f"SERVER={os.getenv('DB_SERVER', '')};"
+            f"DATABASE={os.getenv('DB_NAME', '')};"
+            "Encrypt=yes;"
+        )
+        encoded = quote_plus(conn_str)
+        return (
+            f"mssql+pyodbc:///?odbc_connect={encoded}",
+            f"mssql+aioodbc:///?odbc_connect={encoded}",
+        )
+
+    # Connection-string mode: DATABASE_URL may name either the sync or the
+    # async driver; derive its counterpart for the common drivers.
+    for sync_scheme, async_scheme in _DRIVER_PAIRS:
+        if DATABASE_URL.startswith(f"{sync_scheme}://"):
+            return DATABASE_URL, DATABASE_URL.replace(sync_scheme, async_scheme, 1)
+        if DATABASE_URL.startswith(f"{async_scheme}://"):
+            return DATABASE_URL.replace(async_scheme, sync_scheme, 1), DATABASE_URL
+    return DATABASE_URL, DATABASE_URL
+
+# ── Pool sizing ──────────────────────────────────────────────────
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# Total connections the whole container may open (0 = no cap).
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Size of the anyio thread pool used for sync endpoints and offloaded calls.
+THREADPOOL_MAX_WORKERS = int(os.getenv("THREADPOOL_MAX_WORKERS", "40"))
+
+
+def get_pool_limits() -> tuple:
+    """Return (pool_size, max_overflow) for one worker process."""
+    pool_size, max_overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+    if DB_MAX_CONNECTIONS > 0:
+        per_worker = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+        pool_size = min(pool_size, per_worker)
+        max_overflow = max(0, min(max_overflow, per_worker - pool_size))
+    return pool_size, max_overflow
+
+
+POOL_SIZE, MAX_OVERFLOW = get_pool_limits()
+
+if DB_SESSION_MODE == "sync" and THREADPOOL_MAX_WORKERS > POOL_SIZE + MAX_OVERFLOW:
+    logger.warning(
+        "THREADPOOL_MAX_WORKERS (%d) exceeds the sync pool capacity (%d); "
+        "threads will queue on the pool under load",
+        THREADPOOL_MAX_WORKERS,
+        POOL_SIZE + MAX_OVERFLOW,
+    )
+
+
+# ── Pool instrumentation ────────────────────────────────────────
+class PoolMetrics:
+    """Checkout waiters, wait-time histogram and timeouts of one pool class."""
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkout_wait_ms = metrics.Histogram()
+        self.timeouts = metrics.Counter()
+        self._lock = threading.Lock()
+
+    def _adjust_waiting(self, delta: int) -> None:
+        with self._lock:
+            self.waiting += delta
+
+
+class _InstrumentedPoolMixin:
+    """Time every checkout, including the wait for a free slot."""
+
+    pool_metrics: PoolMetrics
+
+    def _do_get(self):
+        pool_metrics = self.pool_metrics
+        pool_metrics._adjust_waiting(1)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts.inc()
+            raise
+        finally:
+            pool_metrics._adjust_waiting(-1)
+            pool_metrics.checkout_wait_ms.observe((time.perf_counter() - start) * 1000)
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pool_metrics = PoolMetrics()
+
+
+# SQLAlchemy names pool loggers after the pool class; keep these at the
+# WARN level SQLAlchemy uses for its own pools instead of the root INFO.
+for _pool_class in (InstrumentedQueuePool, InstrumentedAsyncQueuePool):
+    logging.getLogger(f"{__name__}.{_pool_class.__name__}").setLevel(logging.WARNING)
+
+
+def _pool_snapshot(pool) -> dict:
+    pool_metrics = pool.pool_metrics
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": MAX_OVERFLOW,
+        "waiting": pool_metrics.waiting,
+        "timeouts": pool_metrics.timeouts.value,
+        "checkout_wait_ms": pool_metrics.checkout_wait_ms.snapshot(),
+    }
+
 
 # ── Engines ──────────────────────────────────────────────────────
-engine = create_engine(
-    SYNC_DATABASE_URL,
-    echo=False,
+_pool_options = dict(
     pool_pre_ping=True,
-    pool_recycle=1800,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
 
-async_engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    echo=False,
-    pool_pre_ping=True,
-    pool_recycle=1800,
-    pool_size=5,
-    max_overflow=10,
-)
 
-# ── Sessions ─────────────────────────────────────────────────────
-SessionLocal = sessionmaker(engine, expire_on_commit=False)
+def _inject_access_token(dialect, conn_rec, cargs, cparams):
+    """Hand the cached token to pyodbc for each new connection (no network call once warm)."""
+    attrs_before = dict(cparams.get("attrs_before") or {})
+    attrs_before[SQL_COPT_SS_ACCESS_TOKEN] = token_provider.get_token_struct()
+    cparams["attrs_before"] = attrs_before
+
+
+class ResilientAsyncSession(ResilientSessionMixin, AsyncSession):
+    """``AsyncSession`` with transient-fault retry and circuit breaker."""
+
+
+class _LazyDatabase:
+    """
+    Engines and session factories, built on first use.
 
-AsyncSessionLocal = async_sessionmaker(
-    async_engine, expire_on_commit=False, class_=AsyncSession
+    Importing this module only reads settings: the driver modules
+    (pyodbc/aioodbc/asyncpg...) are loaded and the URL is validated when a
+    caller first touches ``engine``, ``async_engine``, ``SessionLocal`` or
+    ``AsyncSessionLocal`` (module attributes proxied through ``__getattr__``).
+    In async mode the sync engine is therefore only built for migrations.
+    """
+
+    @cached_property
+    def urls(self) -> tuple:
+        urls = build_database_urls()
+        logger.info("Database URL configured (credentials hidden), session mode: %s", DB_SESSION_MODE)
+        return urls
+
+    @cached_property
+    def engine(self):
+        sync_engine = create_engine(
+            self.urls[0],
+            echo=False,
+            poolclass=InstrumentedQueuePool,
+            **_pool_options,
+        )
+        if USE_ENTRA_AUTH:
+            event.listen(sync_engine, "do_connect", _inject_access_token)
+        return sync_engine
+
+    @cached_property
+    def async_engine(self):
+        engine_async = create_async_engine(
+            self.urls[1],
+            echo=False,
+            poolclass=InstrumentedAsyncQueuePool,
+            **_pool_options,
+        )
+        if USE_ENTRA_AUTH:
+            event.listen(engine_async.sync_engine, "do_connect", _inject_access_token)
+        return engine_async
+
+    @cached_property
+    def SessionLocal(self):
+        return sessionmaker(self.engine, expire_on_commit=False)
+
+    @cached_property
+    def AsyncSessionLocal(self):
+        return async_sessionmaker(
+            self.async_engine, expire_on_commit=False, class_=ResilientAsyncSession
+        )
+
+    def built(self, name: str) -> bool:
+        return name in self.__dict__
+
+
+_db = _LazyDatabase()
+
+
+def __getattr__(name):
+    if name in ("engine", "async_engine", "SessionLocal", "AsyncSessionLocal"):
+        return getattr(_db, name)
+    if name == "SYNC_DATABASE_URL":
+        return _db.urls[0]
+    if name == "ASYNC_DATABASE_URL":
+        return _db.urls[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+metrics.register(
+    "db_pool_sync",
+    lambda: _pool_snapshot(_db.engine.pool) if _db.built("engine") else {},
+)
+metrics.register(
+    "db_pool_async",
+    lambda: _pool_snapshot(_db.async_engine.pool) if _db.built("async_engine") else {},
 )
 
 Base = declarative_base()
@@ -135,9 +358,9 @@ Base = declarative_base()
 def verify_database_connection() -> bool:
     """Verify the database connection (synchronous)."""
     try:
-        with engine.connect() as conn:
+        with _db.engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        logger.info("Database connection verified successfully")
+        logger.debug("Database connection verified successfully")
         return True
     except Exception as e:
         logger.error("Error verifying database connection: %s", e)
@@ -147,9 +370,9 @@ def verify_database_connection() -> bool:
 async def verify_database_connection_async() -> bool:
     """Verify the database connection (asynchronous)."""
     try:
-        async with async_engine.connect() as conn:
+        async with _db.async_engine.connect() as conn:
             await conn.execute(text("SELECT 1"))
-        logger.info("Database connection verified successfully (async)")
+        logger.debug("Database connection verified successfully (async)")
         return True
     except Exception as e:
         logger.error("Error verifying database connection (async): %s", e)
@@ -157,9 +380,73 @@ async def verify_database_connection_async() -> bool:
 
 
 # ── Session dependencies ────────────────────────────────────────
+class _ThreadedSessionBase:
+    """
+    ``AsyncSession``-compatible facade over a synchronous ``Session``.
+
+    Every blocking call is dispatched to the anyio thread pool and results
+    are buffered there, so callers never touch the DBAPI cursor from the
+    event loop. Used when ``DB_SESSION_MODE=sync``.
+    """
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    def in_transaction(self) -> bool:
+        return self.sync_session.in_transaction()
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    def _execute_buffered(self, statement, params=None, **kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        if isinstance(result, CursorResult) and not result.returns_rows:
+            # UPDATE/DELETE without RETURNING: only rowcount, nothing to buffer
+            return result
+        return result.freeze()()
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self._execute_buffered, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None) -> None:
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+class ThreadedSession(ResilientSessionMixin, _ThreadedSessionBase):
+    """Thread-offloaded sync session with transient-fault retry and circuit breaker."""
+
+
 def get_db():
     """Yield a synchronous database session."""
-    session = SessionLocal()
+    session = _db.SessionLocal()
     try:
         yield session
     finally:
@@ -168,17 +455,194 @@ def get_db():
 
 async def get_async_db():
     """Yield an asynchronous database session."""
-    async with AsyncSessionLocal() as session:
+    async with _db.AsyncSessionLocal() as session:
         try:
             yield session
         finally:
             await session.close()
 
 
+async def get_session():
+    """
+    Yield the request-scoped session selected by ``DB_SESSION_MODE``.
+
+    Both flavours expose the awaitable ``AsyncSession`` API (``execute``,
+    ``commit``, ``refresh``, ``delete``...), so endpoints and services are
+    written once against it.
+    """
+    if DB_SESSION_MODE == "sync":
+        session = ThreadedSession(_db.SessionLocal())
+        try:
+            yield session
+        finally:
+            await session.close()
+    else:
+        async for session in get_async_db():
+            yield session
+
+
+async def stream_partitions(statement, size: int):
+    """
+    Yield lists of up to ``size`` rows read through a server-side cursor.
+
+    Runs in a session of its own (so it can outlive the request handler, e.g.
+    inside a ``StreamingResponse``) and keeps at most one partition in memory.
+    Opening the cursor goes through the circuit breaker and retry policy;
+    a failure halfway through the stream is not retried.
+    """
+    statement = statement.execution_options(yield_per=size)
+    if DB_SESSION_MODE == "sync":
+        session = _db.SessionLocal()
+        try:
+            result = await run_async(lambda: run_in_threadpool(session.execute, statement))
+            partitions = result.partitions(size)
+            while True:
+                partition = await run_in_threadpool(next, partitions, None)
+                if partition is None:
+                    break
+                yield partition
+        finally:
+            await run_in_threadpool(session.close)
+    else:
+        async with _db.AsyncSessionLocal() as session:
+            result = await run_async(lambda: session.stream(statement))
+            async for partition in result.partitions(size):
+                yield partition
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection of the engines built so far."""
+    if _db.built("async_engine"):
+        await _db.async_engine.dispose()
+    if _db.built("engine"):
+        await run_in_threadpool(_db.engine.dispose)
+
+
+# ── Schema migrations ───────────────────────────────────────────
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+# Name/key of the database lock that serialises migrations across workers,
+# replicas and deployment jobs.
+MIGRATION_LOCK_NAME = "formulario_alta_migrations"
+MIGRATION_LOCK_KEY = 748213501
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("DB_MIGRATION_LOCK_TIMEOUT_MS", "300000"))
+# Development convenience: let each worker migrate (under the lock) at startup.
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").lower() == "true"
+# Revision of the schema created by the old create_all() bootstrap.
+BASELINE_REVISION = "0001"
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def get_schema_head() -> str:
+    """Return the newest revision shipped with this code."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def _acquire_migration_lock(connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    elif dialect == "mssql":
+        status = connection.execute(
+            text(
+                "DECLARE @r int; "
+                "EXEC @r = sp_getapplock @Resource = :name, @LockMode = 'Exclusive', "
+                "@LockOwner = 'Session', @LockTimeout = :timeout; "
+                "SELECT @r"
+            ),
+            {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_MS},
+        ).scalar()
+        if status is None or status < 0:
+            raise RuntimeError(f"Could not acquire the migration lock (sp_getapplock={status})")
+    # Session-level locks survive the commit; alembic manages its own transaction.
+    connection.commit()
+
+
+def _release_migration_lock(connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    elif dialect == "mssql":
+        connection.execute(
+            text("EXEC sp_releaseapplock @Resource = :name, @LockOwner = 'Session'"),
+            {"name": MIGRATION_LOCK_NAME},
+        )
+    connection.commit()
+
+
+def run_migrations() -> None:
+    """
+    Upgrade the schema to head while holding a cross-process database lock.
+
+    Concurrent callers (several replicas starting at once) wait for the lock
+    and then find the schema already at head. Databases bootstrapped by the
+    old ``create_all()`` (tables present, no ``alembic_version``) are stamped
+    at the baseline revision first.
+    """
+    from alembic import command
+    from sqlalchemy import inspect
+
+    config = _alembic_config()
+    with _db.engine.connect() as connection:
+        _acquire_migration_lock(connection)
+        try:
+            inspector = inspect(connection)
+            if inspector.has_table("usuarios") and not inspector.has_table("alembic_version"):
+                logger.warning("Existing schema without alembic_version: stamping %s", BASELINE_REVISION)
+                config.attributes["connection"] = connection
+                command.stamp(config, BASELINE_REVISION)
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+        finally:
+            _release_migration_lock(connection)
+    logger.info("Database schema at revision %s", get_schema_head())
+
+
+async def get_schema_revision():
+    """Return the revision recorded in ``alembic_version`` (None if absent)."""
+    try:
+        async with _db.async_engine.connect() as conn:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            return result.scalar()
+    except DBAPIError:
+        return None
+
+
+async def check_schema_version() -> None:
+    """
+    Worker startup check: one query comparing the database revision with
+    the code's head. Migrates first (under the lock) only when
+    ``DB_MIGRATE_ON_STARTUP=true``.
+    """
+    head = get_schema_head()
+    current = await get_schema_revision()
+    if current == head:
+        logger.info("Database schema up to date (revision %s)", head)
+        return
+    if DB_MIGRATE_ON_STARTUP:
+        await run_in_threadpool(run_migrations)
+        return
+    raise RuntimeError(
+        f"Database schema revision is {current!r}, expected {head!r}. "
+        "Run `python init_db.py` (or `alembic upgrade head`) before starting the API."
+    )
+
+
 # ── Initialization ──────────────────────────────────────────────
 async def init_db():
     """
-    Create all tables and optionally seed an admin user.
+    Migrate the schema to head and optionally seed an admin user.
+
+    This is the one-off deployment step (``python init_db.py``); API workers
+    only run ``check_schema_version``.
 
     The seed admin credentials are read from environment variables:
       SEED_ADMIN_EMAIL (default: empty, disabled)
@@ -189,7 +653,7 @@ async def init_db():
     both SEED_ADMIN_EMAIL and SEED_ADMIN_PASSWORD.
     """
     try:
-        Base.metadata.create_all(bind=engine)
+        await run_in_threadpool(run_migrations)
 
         seed_email = os.getenv("SEED_ADMIN_EMAIL", "").strip()
         seed_password = os.getenv("SEED_ADMIN_PASSWORD", "")
@@ -201,16 +665,16 @@ async def init_db():
                     "SEED_ADMIN_PASSWORD must be set when SEED_ADMIN_EMAIL is provided"
                 )
 
-            async with AsyncSessionLocal() as session:
+            async with _db.AsyncSessionLocal() as session:
                 from models import User, UserRole
-                from auth.auth_handler import AuthHandler
+                from auth.auth_handler import get_auth_handler
 
                 result = await session.execute(
                     text("SELECT 1 FROM usuarios WHERE email = :email"),
                     {"email": seed_email},
                 )
                 if not result.scalar():
-                    auth_handler = AuthHandler()
+                    auth_handler = get_auth_handler()
                     hashed_password = auth_handler.get_password_hash(seed_password)
                     nuevo_usuario = User(
                         email=seed_email,
@@ -233,19 +697,9 @@ async def init_db():
 
 
 # ── Retry helper ────────────────────────────────────────────────
-async def execute_with_retry(func, max_retries=3, delay=1):
-    """Execute an async function with retry on transient connection errors."""
-    retries = 0
-    while retries < max_retries:
-        try:
-            return await func()
-        except Exception as e:
-            if "08S01" in str(e) and retries < max_retries - 1:
-                retries += 1
-                logger.warning(
-                    "Connection error. Retrying (%d/%d)...", retries, max_retries
-                )
-                await asyncio.sleep(delay)
-            else:
-                logger.error("Error after %d attempts: %s", retries, e)
-                raise
+async def execute_with_retry(func):
+    """
+    Run a whole async unit of work (``func`` opens its own session) under
+    the shared retry policy and circuit breaker; see ``db_resilience``.
+    """
+    return await run_async(func)
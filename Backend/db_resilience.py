@@ -0,0 +1,318 @@
+"""
+Transient-fault handling for database access.
+
+* ``is_transient_error`` classifies SQL Server / Azure SQL and PostgreSQL
+  errors that are worth retrying (connection drops, failovers, throttling,
+  deadlocks, serialization failures).
+* ``RetryPolicy`` retries with exponential backoff and full jitter, bounded
+  by a maximum number of attempts and an overall deadline.
+* ``CircuitBreaker`` opens after consecutive transient failures and rejects
+  calls with ``DatabaseUnavailableError`` (HTTP 503) until a trial call
+  succeeds, so requests fail fast instead of waiting for pool timeouts.
+* ``ResilientSessionMixin`` applies both to the session classes returned by
+  ``database.get_session`` (``AsyncSession`` and ``ThreadedSession``).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Azure SQL / SQL Server native error numbers documented as transient.
+SQLSERVER_TRANSIENT_ERRORS = {
+    "20", "64", "233", "1205", "4060", "4221", "10053", "10054", "10060",
+    "10928", "10929", "40143", "40197", "40501", "40540", "40613",
+    "42108", "42109", "49918", "49919", "49920",
+}
+# ODBC SQLSTATEs (pyodbc) and PostgreSQL SQLSTATEs (asyncpg / psycopg2).
+TRANSIENT_SQLSTATES = {
+    "08S01", "08001", "08004", "HYT00", "HYT01",
+    "40001", "40P01", "53300", "57P01", "57P02", "57P03",
+}
+# Any PostgreSQL "connection exception" (class 08) is transient.
+TRANSIENT_SQLSTATE_CLASSES = ("08",)
+
+_NATIVE_ERROR_RE = re.compile(r"\((\d{2,5})\)")
+_SQLSTATE_RE = re.compile(r"\[([0-9A-Z]{5})\]")
+
+
+def _error_codes(exc: BaseException) -> set:
+    orig = getattr(exc, "orig", None) or exc
+    codes = set()
+    for attr in ("sqlstate", "pgcode"):
+        value = getattr(orig, attr, None)
+        if value:
+            codes.add(str(value))
+    args = getattr(orig, "args", ())
+    if args and isinstance(args[0], str) and len(args[0]) == 5:
+        codes.add(args[0])
+    message = str(orig)
+    codes.update(_NATIVE_ERROR_RE.findall(message))
+    codes.update(_SQLSTATE_RE.findall(message))
+    return codes
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Return True if ``exc`` is a database error that is safe to retry."""
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    if not isinstance(exc, (DBAPIError, ConnectionError, OSError)):
+        return False
+    for code in _error_codes(exc):
+        if code in SQLSERVER_TRANSIENT_ERRORS or code in TRANSIENT_SQLSTATES:
+            return True
+        if len(code) == 5 and code.startswith(TRANSIENT_SQLSTATE_CLASSES):
+            return True
+    return isinstance(exc, (ConnectionError, OSError))
+
+
+class DatabaseUnavailableError(HTTPException):
+    """The database is unreachable or the circuit breaker is open (503)."""
+
+    def __init__(self, detail: str = "Base de datos no disponible temporalmente"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed → open → half-open)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.opened = metrics.Counter()
+        self.rejected = metrics.Counter()
+
+    def before_call(self) -> None:
+        """Raise ``DatabaseUnavailableError`` if calls are not allowed now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected.inc()
+                    raise DatabaseUnavailableError()
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                self.rejected.inc()
+                raise DatabaseUnavailableError()
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Database circuit breaker closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state == self.CLOSED:
+                    logger.warning(
+                        "Database circuit breaker opened after %d transient failures",
+                        self.consecutive_failures,
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.opened.inc()
+
+    def release(self) -> None:
+        """End a half-open trial that failed for a non-transient reason."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and a deadline."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.1,
+        max_delay: float = 2.0,
+        deadline: float = 10.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def next_delay(self, attempt: int, started: float):
+        """Delay before retry number ``attempt`` (1-based), or None to give up."""
+        if attempt >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+
+retry_policy = RetryPolicy(
+    max_attempts=int(os.getenv("DB_RETRY_MAX_ATTEMPTS", "4")),
+    base_delay=float(os.getenv("DB_RETRY_BASE_DELAY_SECONDS", "0.1")),
+    max_delay=float(os.getenv("DB_RETRY_MAX_DELAY_SECONDS", "2")),
+    deadline=float(os.getenv("DB_RETRY_DEADLINE_SECONDS", "10")),
+)
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("DB_BREAKER_RESET_SECONDS", "15")),
+)
+
+retries = metrics.Counter()
+retries_exhausted = metrics.Counter()
+transient_failures = metrics.Counter()
+
+metrics.register("db_resilience", lambda: {
+    "breaker_state": breaker.state,
+    "breaker_consecutive_failures": breaker.consecutive_failures,
+    "breaker_opened": breaker.opened.value,
+    "breaker_rejected": breaker.rejected.value,
+    "retries": retries.value,
+    "retries_exhausted": retries_exhausted.value,
+    "transient_failures": transient_failures.value,
+})
+
+
+def _on_error(exc: BaseException) -> bool:
+    """Account for a failed call; return True if it was transient."""
+    if is_transient_error(exc):
+        transient_failures.inc()
+        breaker.record_failure()
+        return True
+    breaker.release()
+    return False
+
+
+async def run_async(func, retry: bool = True, on_retry=None):
+    """
+    Await ``func()`` under the circuit breaker, retrying transient errors.
+
+    ``on_retry`` (async, optional) runs before each retry, e.g. a rollback.
+    Transient errors that outlive the policy become ``DatabaseUnavailableError``.
+    """
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = await func()
+        except Exception as e:
+            if not _on_error(e):
+                raise
+            delay = retry_policy.next_delay(attempt, started) if retry else None
+            if delay is None:
+                if retry:
+                    retries_exhausted.inc()
+                logger.error("Transient database error after %d attempt(s): %s", attempt, e)
+                raise DatabaseUnavailableError() from e
+            retries.inc()
+            logger.warning(
+                "Transient database error, retrying in %.2f s (%d/%d): %s",
+                delay, attempt, retry_policy.max_attempts, e,
+            )
+            if on_retry is not None:
+                await on_retry()
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def run_sync(func, retry: bool = True, on_retry=None):
+    """Blocking counterpart of ``run_async`` for scripts and worker threads."""
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not _on_error(e):
+                raise
+            delay = retry_policy.next_delay(attempt, started) if retry else None
+            if delay is None:
+                if retry:
+                    retries_exhausted.inc()
+                logger.error("Transient database error after %d attempt(s): %s", attempt, e)
+                raise DatabaseUnavailableError() from e
+            retries.inc()
+            logger.warning(
+                "Transient database error, retrying in %.2f s (%d/%d): %s",
+                delay, attempt, retry_policy.max_attempts, e,
+            )
+            if on_retry is not None:
+                on_retry()
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+class ResilientSessionMixin:
+    """
+    Breaker and retry for the awaitable session API.
+
+    Only the first statement of a unit of work (no transaction open yet) is
+    retried, after a rollback; later statements and commits are not replayed
+    because earlier work in the transaction would be lost, but their
+    transient failures still count towards the breaker.
+    """
+
+    async def execute(self, statement, params=None, **kwargs):
+        parent = super().execute
+        return await run_async(
+            lambda: parent(statement, params, **kwargs),
+            retry=not self.in_transaction(),
+            on_retry=self.rollback,
+        )
+
+    async def scalar(self, statement, params=None, **kwargs):
+        parent = super().scalar
+        return await run_async(
+            lambda: parent(statement, params, **kwargs),
+            retry=not self.in_transaction(),
+            on_retry=self.rollback,
+        )
+
+    async def get(self, entity, ident, **kwargs):
+        parent = super().get
+        return await run_async(
+            lambda: parent(entity, ident, **kwargs),
+            retry=not self.in_transaction(),
+            on_retry=self.rollback,
+        )
+
+    async def flush(self, objects=None):
+        parent = super().flush
+        return await run_async(lambda: parent(objects), retry=False)
+
+    async def commit(self):
+        return await run_async(super().commit, retry=False)
@@ -0,0 +1,142 @@
+"""
+Cached Microsoft Entra ID access tokens for Azure SQL connections.
+
+``EntraTokenProvider`` acquires a token for the ``database.windows.net``
+resource through MSAL, keeps it in memory and refreshes it from a daemon
+thread ahead of expiry. ``database.py`` hands the token to pyodbc on every
+new pooled connection through ``attrs_before`` (``SQL_COPT_SS_ACCESS_TOKEN``),
+so no token is baked into the connection string and no network call happens
+at import time.
+
+The API warms the cache at startup in a worker thread
+(``database.warm_access_token``); from then on ``get_token_struct`` only
+reads the encoded token kept in memory, so opening a connection on the
+event loop never waits for Entra ID. Only a cold or expired cache (scripts,
+or a refresher that kept failing until expiry) fetches synchronously.
+"""
+
+import logging
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# pyodbc connection attribute used by the SQL Server ODBC driver to accept
+# an access token instead of UID/PWD.
+SQL_COPT_SS_ACCESS_TOKEN = 1256
+
+DATABASE_SCOPE = ["https://database.windows.net/.default"]
+
+# Lower bound between background refresh attempts; also the retry delay
+# after a failed refresh while the current token is still valid.
+MIN_REFRESH_INTERVAL_SECONDS = 30
+
+
+class EntraTokenProvider:
+    """Thread-safe, self-refreshing cache of an Entra ID access token."""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        tenant_id: str,
+        refresh_margin_seconds: int = 600,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.tenant_id = tenant_id
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._app = None
+        self._token = None
+        self._token_struct = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _acquire(self) -> None:
+        """Fetch a token from Entra ID and store it with its expiry."""
+        if self._app is None:
+            import msal
+
+            self._app = msal.ConfidentialClientApplication(
+                self.client_id,
+                authority=f"https://login.microsoftonline.com/{self.tenant_id}",
+                client_credential=self.client_secret,
+            )
+        result = self._app.acquire_token_for_client(scopes=DATABASE_SCOPE)
+
+        if "access_token" not in result:
+            error_description = result.get(
+                "error_description", "No error description provided"
+            )
+            logger.error("Failed to acquire access token: %s", error_description)
+            raise ValueError(f"Failed to acquire access token: {error_description}")
+
+        self._token = result["access_token"]
+        self._token_struct = self._encode(self._token)
+        self._expires_at = time.time() + int(result.get("expires_in", 3600))
+        logger.info(
+            "Access token acquired, valid for %d s",
+            int(self._expires_at - time.time()),
+        )
+
+    def get_token(self) -> str:
+        """Return a valid token, fetching it synchronously only on a cold cache."""
+        if self._token is None or time.time() >= self._expires_at - 60:
+            with self._lock:
+                if self._token is None or time.time() >= self._expires_at - 60:
+                    self._acquire()
+        self.start()
+        return self._token
+
+    @staticmethod
+    def _encode(token: str) -> bytes:
+        raw = token.encode("utf-16-le")
+        return struct.pack(f"<I{len(raw)}s", len(raw), raw)
+
+    def get_token_struct(self) -> bytes:
+        """
+        Return the token encoded as the ODBC driver expects it, from memory
+        while it has not expired; the background refresher renews it ahead
+        of time.
+        """
+        token_struct = self._token_struct
+        if token_struct is None or time.time() >= self._expires_at:
+            self.get_token()
+            token_struct = self._token_struct
+        return token_struct
+
+    def start(self) -> None:
+        """Start the background refresher (idempotent)."""
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop,
+                    name="entra-token-refresher",
+                    daemon=True,
+                )
+                self._refresher.start()
+
+    def stop(self) -> None:
+        """Ask the background refresher to exit."""
+        self._stop.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            delay = max(
+                self._expires_at - self.refresh_margin_seconds - time.time(),
+                MIN_REFRESH_INTERVAL_SECONDS,
+            )
+            if self._stop.wait(delay):
+                return
+            try:
+                with self._lock:
+                    self._acquire()
+            except Exception as e:
+                # Keep serving the current token until it really expires;
+                # the next iteration retries after the minimum interval.
+                logger.warning("Background token refresh failed: %s", e)
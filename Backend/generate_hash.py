@@ -1,5 +1,6 @@
 """
-Utility to generate a bcrypt password hash.
+Utility to generate a password hash with the API's settings
+(PASSWORD_HASH_SCHEME, BCRYPT_ROUNDS, ARGON2_*).
 
 Usage:
     python generate_hash.py <password>
@@ -8,13 +9,14 @@ Or without arguments, it will prompt for a password interactively.
 """
 
 import sys
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12,
-)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from auth.password_hashing import build_password_context  # noqa: E402
+
+pwd_context = build_password_context()
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
@@ -0,0 +1,107 @@
+"""
+Cached database health for the liveness/readiness probes.
+
+``DatabaseHealthMonitor`` runs ``verify_database_connection_async`` from a
+background task every ``HEALTH_CHECK_INTERVAL_SECONDS`` and keeps the last
+result in memory. ``GET /health/ready`` only reads that result, so probes
+answer immediately, never open a connection themselves and never wait for a
+pool slot. The status is considered stale (not ready) when the last
+successful check is older than ``HEALTH_STALE_AFTER_SECONDS``.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from database import verify_database_connection_async
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+HEALTH_STALE_AFTER_SECONDS = float(os.getenv("HEALTH_STALE_AFTER_SECONDS", "30"))
+
+
+class DatabaseHealthMonitor:
+    """Periodically checks the database and caches the outcome."""
+
+    def __init__(
+        self,
+        interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = HEALTH_CHECK_TIMEOUT_SECONDS,
+        stale_after: float = HEALTH_STALE_AFTER_SECONDS,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.database_ok = False
+        self.last_check: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check_now(self) -> bool:
+        """Run one check and record its result."""
+        try:
+            ok = await asyncio.wait_for(
+                verify_database_connection_async(), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Database health check timed out after %.1f s", self.timeout)
+            ok = False
+
+        if ok != self.database_ok:
+            log = logger.info if ok else logger.warning
+            log("Database health changed: %s", "ok" if ok else "unreachable")
+        self.database_ok = ok
+        self.last_check = time.monotonic()
+        if ok:
+            self.last_success = self.last_check
+        return ok
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check_now()
+            except Exception as e:
+                logger.error("Unexpected error in database health check: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="db-health-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_ready(self) -> bool:
+        """True when the last check succeeded and is not stale."""
+        return (
+            self.database_ok
+            and self.last_success is not None
+            and time.monotonic() - self.last_success <= self.stale_after
+        )
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        ready = self.is_ready()
+        return {
+            "status": "ok" if ready else "degraded",
+            "database": "ok" if self.database_ok else "unreachable",
+            "stale": self.database_ok and not ready,
+            "last_check_age_seconds": (
+                round(now - self.last_check, 3) if self.last_check is not None else None
+            ),
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+
+
+db_health = DatabaseHealthMonitor()
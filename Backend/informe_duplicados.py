@@ -0,0 +1,49 @@
+"""
+Informe de posibles clientes duplicados: pares de solicitudes vigentes con
+el mismo código postal y un nombre parecido.
+
+Solo compara solicitudes que comparten clave de bloqueo, así que puede
+ejecutarse periódicamente (cron, job de Container Apps) sobre toda la tabla:
+    python informe_duplicados.py > duplicados.csv
+    python informe_duplicados.py --umbral 0.9 --salida duplicados.csv
+
+Por defecto usa DUPLICATE_NAME_THRESHOLD.
+"""
+
+import argparse
+import asyncio
+import csv
+import logging
+import sys
+
+from database import dispose_engines
+from services.duplicados_service import informe_duplicados, DUPLICATE_NAME_THRESHOLD
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNAS = ["solicitud_a", "nombre_a", "solicitud_b", "nombre_b", "similitud", "mismo_cif"]
+
+
+async def main(umbral: float, salida: str):
+    fichero = open(salida, "w", newline="", encoding="utf-8") if salida else sys.stdout
+    try:
+        writer = csv.DictWriter(fichero, fieldnames=COLUMNAS)
+        writer.writeheader()
+        total = 0
+        async for par in informe_duplicados(umbral):
+            writer.writerow(par)
+            total += 1
+        logger.info("Posibles duplicados: %d pares", total)
+    finally:
+        if salida:
+            fichero.close()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Informe de posibles clientes duplicados")
+    parser.add_argument("--umbral", type=float, default=DUPLICATE_NAME_THRESHOLD, help="similitud mínima (0-1)")
+    parser.add_argument("--salida", help="fichero CSV (por defecto, la salida estándar)")
+    args = parser.parse_args()
+    asyncio.run(main(args.umbral, args.salida))
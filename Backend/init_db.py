@@ -1,5 +1,15 @@
+"""
+Deployment step: migrate the schema to head and seed the optional admin.
+
+Run once per deployment before starting the API workers:
+    python init_db.py
+
+Safe to run concurrently from several replicas; migrations are serialised
+by a database lock (see database.run_migrations).
+"""
+
 import asyncio
-from database import init_db, async_engine
+from database import init_db, dispose_engines
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -10,8 +20,8 @@ async def main():
     await init_db()
     logger.info("Inicialización completada")
     
-    # Cierra la conexión
-    await async_engine.dispose()
+    # Cierra las conexiones
+    await dispose_engines()
 
 if __name__ == "__main__":
     asyncio.run(main())
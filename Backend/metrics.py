@@ -0,0 +1,75 @@
+"""
+In-process metrics registry.
+
+Components create ``Counter`` and ``Histogram`` objects (thread-safe, no
+external dependency) and register a snapshot callable under a name with
+``register``. ``GET /admin/metrics`` returns ``snapshot()``, one entry per
+registered component. Values are per worker process.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable
+
+# Default latency buckets in milliseconds (upper bounds, cumulative).
+DEFAULT_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts, like Prometheus."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_MS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {"count": count, "sum": round(total, 3), "buckets": buckets}
+
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    """Register (or replace) the snapshot callable of a component."""
+    _providers[name] = provider
+
+
+def snapshot() -> dict:
+    """Collect the current values of every registered component."""
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,55 @@
+"""
+Alembic environment.
+
+Uses the sync ``engine`` from ``database.py`` so migrations connect exactly
+like the application does. ``database.run_migrations`` passes in a
+connection that already holds the migration lock through
+``config.attributes["connection"]``.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, engine, SYNC_DATABASE_URL
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit the SQL to stdout instead of executing it (``alembic upgrade --sql``)."""
+    context.configure(
+        url=SYNC_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,77 @@
+"""Initial schema: usuarios, solicitudes, solicitudes_archivadas
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+estado_solicitud = sa.Enum(
+    'PENDIENTE_DIRECTOR', 'PENDIENTE_PEDIDOS', 'PENDIENTE_ADMIN', 'COMPLETADO', 'RECHAZADO',
+    name='estadosolicitud',
+)
+user_role = sa.Enum('comercial', 'director', 'pedidos', 'admin', name='userrole')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'usuarios',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password_hash', sa.String(), nullable=False),
+        sa.Column('nombre_completo', sa.String(), nullable=False),
+        sa.Column('rol', user_role, nullable=False),
+        sa.Column('activo', sa.Boolean(), nullable=True),
+        sa.Column('ultimo_acceso', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('is_temporary_password', sa.Boolean(), nullable=True),
+    )
+    op.create_index('ix_usuarios_email', 'usuarios', ['email'], unique=True)
+
+    op.create_table(
+        'solicitudes',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('comercial_id', UUID(as_uuid=True), nullable=False),
+        sa.Column('datos_cliente', sa.String(), nullable=False),
+        sa.Column('estado', estado_solicitud, nullable=False),
+        sa.Column('aprobado_director', sa.Boolean(), nullable=True),
+        sa.Column('aprobado_pedidos', sa.Boolean(), nullable=True),
+        sa.Column('aprobado_admin', sa.Boolean(), nullable=True),
+        sa.Column('notas', sa.String(), nullable=True),
+        sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_table(
+        'solicitudes_archivadas',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('solicitud_original_id', UUID(as_uuid=True), nullable=False),
+        sa.Column('resumen', sa.String(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('fecha_aprobacion_director', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('fecha_aprobacion_pedidos', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('fecha_aprobacion_admin', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('comercial_email', sa.String(), nullable=False),
+        sa.Column('cliente_nombre', sa.String(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('solicitudes_archivadas')
+    op.drop_table('solicitudes')
+    op.drop_index('ix_usuarios_email', table_name='usuarios')
+    op.drop_table('usuarios')
+    bind = op.get_bind()
+    estado_solicitud.drop(bind, checkfirst=True)
+    user_role.drop(bind, checkfirst=True)
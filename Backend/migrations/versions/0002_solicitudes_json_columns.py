@@ -0,0 +1,134 @@
+"""Native JSON for solicitudes.datos_cliente/notas plus extracted, indexed columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+* PostgreSQL: datos_cliente and notas become JSONB.
+* SQL Server: they become NVARCHAR(max) with an ISJSON check constraint.
+* cliente_nombre, cif_nif, tipo_carga and metodo_pago are copied out of
+  datos_cliente into indexed columns and backfilled for existing rows.
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# column -> (JSON keys, length). Form submissions use camelCase keys, the
+# demo seed used snake_case.
+EXTRACTED_COLUMNS = {
+    'cliente_nombre': (('nombre',), 255),
+    'cif_nif': (('cif_nif',), 32),
+    'tipo_carga': (('tipoCarga', 'tipo_carga'), 16),
+    'metodo_pago': (('metodoPago', 'metodo_pago'), 32),
+}
+
+
+def _convert_json_columns(dialect: str) -> None:
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE solicitudes "
+            "ALTER COLUMN datos_cliente TYPE JSONB USING datos_cliente::jsonb, "
+            "ALTER COLUMN notas TYPE JSONB USING COALESCE(NULLIF(notas, ''), '{}')::jsonb"
+        )
+        return
+
+    # Legacy rows may hold '' in notas, which is not valid JSON.
+    op.execute("UPDATE solicitudes SET notas = '{}' WHERE notas IS NULL OR notas = ''")
+    if dialect == 'mssql':
+        op.execute("ALTER TABLE solicitudes ALTER COLUMN datos_cliente NVARCHAR(max) NOT NULL")
+        op.execute("ALTER TABLE solicitudes ALTER COLUMN notas NVARCHAR(max) NULL")
+        op.create_check_constraint(
+            'ck_solicitudes_datos_cliente_json', 'solicitudes', 'ISJSON(datos_cliente) = 1'
+        )
+        op.create_check_constraint(
+            'ck_solicitudes_notas_json', 'solicitudes', 'notas IS NULL OR ISJSON(notas) = 1'
+        )
+    else:
+        with op.batch_alter_table('solicitudes') as batch:
+            batch.alter_column('datos_cliente', type_=sa.JSON(), existing_nullable=False)
+            batch.alter_column('notas', type_=sa.JSON(), existing_nullable=True)
+
+
+def _backfill(dialect: str) -> None:
+    if dialect in ('postgresql', 'mssql'):
+        if dialect == 'postgresql':
+            extract = "datos_cliente->>'{key}'"
+        else:
+            extract = "JSON_VALUE(datos_cliente, '$.{key}')"
+        assignments = []
+        for column, (keys, length) in EXTRACTED_COLUMNS.items():
+            values = ', '.join(extract.format(key=key) for key in keys)
+            value = f"COALESCE({values})" if len(keys) > 1 else values
+            assignments.append(f"{column} = LEFT({value}, {length})")
+        op.execute(f"UPDATE solicitudes SET {', '.join(assignments)}")
+        return
+
+    bind = op.get_bind()
+    solicitudes = sa.table(
+        'solicitudes',
+        sa.column('id'),
+        sa.column('datos_cliente', sa.JSON()),
+        *(sa.column(column) for column in EXTRACTED_COLUMNS),
+    )
+    for row in bind.execute(sa.select(solicitudes.c.id, solicitudes.c.datos_cliente)).all():
+        datos = row.datos_cliente
+        if isinstance(datos, str):
+            datos = json.loads(datos)
+        values = {}
+        for column, (keys, length) in EXTRACTED_COLUMNS.items():
+            value = next((datos[k] for k in keys if datos.get(k) not in (None, '')), None)
+            values[column] = str(value).strip()[:length] if value is not None else None
+        bind.execute(
+            solicitudes.update().where(solicitudes.c.id == row.id).values(**values)
+        )
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    op.add_column('solicitudes', sa.Column('cliente_nombre', sa.String(255), nullable=True))
+    op.add_column('solicitudes', sa.Column('cif_nif', sa.String(32), nullable=True))
+    op.add_column('solicitudes', sa.Column('tipo_carga', sa.String(16), nullable=True))
+    op.add_column('solicitudes', sa.Column('metodo_pago', sa.String(32), nullable=True))
+
+    _convert_json_columns(dialect)
+    _backfill(dialect)
+
+    for column in EXTRACTED_COLUMNS:
+        op.create_index(f'ix_solicitudes_{column}', 'solicitudes', [column])
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    for column in EXTRACTED_COLUMNS:
+        op.drop_index(f'ix_solicitudes_{column}', table_name='solicitudes')
+
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE solicitudes "
+            "ALTER COLUMN datos_cliente TYPE VARCHAR USING datos_cliente::text, "
+            "ALTER COLUMN notas TYPE VARCHAR USING notas::text"
+        )
+    elif dialect == 'mssql':
+        op.drop_constraint('ck_solicitudes_notas_json', 'solicitudes', type_='check')
+        op.drop_constraint('ck_solicitudes_datos_cliente_json', 'solicitudes', type_='check')
+        op.execute("ALTER TABLE solicitudes ALTER COLUMN datos_cliente VARCHAR(max) NOT NULL")
+        op.execute("ALTER TABLE solicitudes ALTER COLUMN notas VARCHAR(max) NULL")
+    else:
+        with op.batch_alter_table('solicitudes') as batch:
+            batch.alter_column('datos_cliente', type_=sa.String(), existing_nullable=False)
+            batch.alter_column('notas', type_=sa.String(), existing_nullable=True)
+
+    with op.batch_alter_table('solicitudes') as batch:
+        for column in EXTRACTED_COLUMNS:
+            batch.drop_column(column)
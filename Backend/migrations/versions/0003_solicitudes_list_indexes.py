@@ -0,0 +1,34 @@
+"""Composite indexes for the keyset-paginated solicitud lists
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+The pending queues filter on estado and the per-user list on comercial_id,
+both ordered by (creado_en, id) descending. id is the keyset tie-breaker, so
+it is part of the index too.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_solicitudes_estado_creado_en', 'solicitudes', ['estado', 'creado_en', 'id']
+    )
+    op.create_index(
+        'ix_solicitudes_comercial_id_creado_en', 'solicitudes', ['comercial_id', 'creado_en', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_solicitudes_comercial_id_creado_en', table_name='solicitudes')
+    op.drop_index('ix_solicitudes_estado_creado_en', table_name='solicitudes')
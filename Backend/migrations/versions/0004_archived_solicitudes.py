@@ -0,0 +1,97 @@
+"""Prepare solicitudes_archivadas for the batch archiver
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+* resumen becomes native JSON (JSONB / NVARCHAR(max) + ISJSON).
+* New estado (COMPLETADO / RECHAZADO) and archivado_en columns.
+* comercial_email and cliente_nombre get a length so they can be indexed on
+  SQL Server.
+* solicitud_original_id is unique, which makes re-running an archive batch
+  harmless.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    op.add_column('solicitudes_archivadas', sa.Column('estado', sa.String(20), nullable=True))
+    op.add_column(
+        'solicitudes_archivadas',
+        sa.Column('archivado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE solicitudes_archivadas "
+            "ALTER COLUMN resumen TYPE JSONB USING resumen::jsonb, "
+            "ALTER COLUMN comercial_email TYPE VARCHAR(255), "
+            "ALTER COLUMN cliente_nombre TYPE VARCHAR(255)"
+        )
+    elif dialect == 'mssql':
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN resumen NVARCHAR(max) NOT NULL")
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN comercial_email VARCHAR(255) NOT NULL")
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN cliente_nombre VARCHAR(255) NOT NULL")
+        op.create_check_constraint(
+            'ck_solicitudes_archivadas_resumen_json', 'solicitudes_archivadas', 'ISJSON(resumen) = 1'
+        )
+    else:
+        with op.batch_alter_table('solicitudes_archivadas') as batch:
+            batch.alter_column('resumen', type_=sa.JSON(), existing_nullable=False)
+            batch.alter_column('comercial_email', type_=sa.String(255), existing_nullable=False)
+            batch.alter_column('cliente_nombre', type_=sa.String(255), existing_nullable=False)
+
+    op.create_index(
+        'ix_solicitudes_archivadas_solicitud_original_id', 'solicitudes_archivadas',
+        ['solicitud_original_id'], unique=True,
+    )
+    op.create_index(
+        'ix_solicitudes_archivadas_comercial_email_fecha', 'solicitudes_archivadas',
+        ['comercial_email', 'fecha_creacion', 'id'],
+    )
+    op.create_index(
+        'ix_solicitudes_archivadas_fecha_creacion', 'solicitudes_archivadas',
+        ['fecha_creacion', 'id'],
+    )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    op.drop_index('ix_solicitudes_archivadas_fecha_creacion', table_name='solicitudes_archivadas')
+    op.drop_index('ix_solicitudes_archivadas_comercial_email_fecha', table_name='solicitudes_archivadas')
+    op.drop_index('ix_solicitudes_archivadas_solicitud_original_id', table_name='solicitudes_archivadas')
+
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE solicitudes_archivadas "
+            "ALTER COLUMN resumen TYPE VARCHAR USING resumen::text, "
+            "ALTER COLUMN comercial_email TYPE VARCHAR, "
+            "ALTER COLUMN cliente_nombre TYPE VARCHAR"
+        )
+    elif dialect == 'mssql':
+        op.drop_constraint('ck_solicitudes_archivadas_resumen_json', 'solicitudes_archivadas', type_='check')
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN resumen VARCHAR(max) NOT NULL")
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN comercial_email VARCHAR(max) NOT NULL")
+        op.execute("ALTER TABLE solicitudes_archivadas ALTER COLUMN cliente_nombre VARCHAR(max) NOT NULL")
+    else:
+        with op.batch_alter_table('solicitudes_archivadas') as batch:
+            batch.alter_column('resumen', type_=sa.String(), existing_nullable=False)
+            batch.alter_column('comercial_email', type_=sa.String(), existing_nullable=False)
+            batch.alter_column('cliente_nombre', type_=sa.String(), existing_nullable=False)
+
+    with op.batch_alter_table('solicitudes_archivadas') as batch:
+        batch.drop_column('archivado_en')
+        batch.drop_column('estado')
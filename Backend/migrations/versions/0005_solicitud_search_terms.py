@@ -0,0 +1,138 @@
+"""Inverted index table for /api/solicitudes/search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+* solicitud_terminos holds one normalised term per (solicitud, term) with
+  its field weight; rows are deleted together with the solicitud.
+* The (termino, solicitud_id, peso) index serves prefix LIKE lookups. On
+  PostgreSQL it uses varchar_pattern_ops so LIKE 'abc%' can use it under any
+  collation.
+* Existing solicitudes are indexed in batches with a frozen copy of the
+  tokenizer and field weights (services.busqueda_service.terminos_solicitud
+  as of this revision), so replaying the migration always builds the same
+  index whatever the application code looks like later.
+
+"""
+import json
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# ── Frozen copy of the tokenizer and field weights ───────────
+# Do not import application code here: the backfill must keep producing
+# the terms this revision shipped with.
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+STOP_WORDS = frozenset({
+    "de", "del", "la", "las", "el", "los", "y", "e", "en",
+    "sl", "slu", "sa", "sau", "sll", "scp", "cb", "sc", "sociedad", "limitada", "anonima",
+})
+
+# datos_cliente keys (form, then demo data) -> weight
+FIELD_WEIGHTS = {
+    ("cif_nif",): 4,
+    ("nombre",): 3,
+    ("correo",): 3,
+    ("nombreContacto", "nombre_contacto"): 2,
+    ("poblacion",): 1,
+}
+
+TERM_LENGTH = 64
+
+
+def _normalize(text) -> str:
+    if text is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    unaccented = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALPHANUMERIC.sub(" ", unaccented.lower()).strip()
+
+
+def _tokenize(text) -> list:
+    return [t for t in _normalize(text).split() if len(t) > 1 and t not in STOP_WORDS]
+
+
+def _terms(datos_cliente: dict) -> dict:
+    """term -> weight of its best field."""
+    terms = {}
+    datos_cliente = datos_cliente or {}
+    for keys, weight in FIELD_WEIGHTS.items():
+        value = next((datos_cliente[k] for k in keys if datos_cliente.get(k)), None)
+        if not value:
+            continue
+        words = _tokenize(value)
+        if keys == ("cif_nif",):
+            words.append(_normalize(value).replace(" ", "").lower())
+        for word in words:
+            word = word[:TERM_LENGTH]
+            if word and terms.get(word, 0) < weight:
+                terms[word] = weight
+    return terms
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    solicitudes = sa.table(
+        'solicitudes', sa.column('id'), sa.column('datos_cliente', sa.JSON())
+    )
+    terminos = sa.table(
+        'solicitud_terminos', sa.column('solicitud_id'), sa.column('termino'), sa.column('peso')
+    )
+    ultimo = None
+    while True:
+        query = sa.select(solicitudes.c.id, solicitudes.c.datos_cliente).order_by(solicitudes.c.id)
+        if ultimo is not None:
+            query = query.where(solicitudes.c.id > ultimo)
+        rows = bind.execute(query.limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        values = []
+        for row in rows:
+            datos = row.datos_cliente
+            if isinstance(datos, str):
+                datos = json.loads(datos)
+            values.extend(
+                {'solicitud_id': row.id, 'termino': termino, 'peso': peso}
+                for termino, peso in _terms(datos).items()
+            )
+        if values:
+            bind.execute(terminos.insert(), values)
+        ultimo = rows[-1].id
+
+
+def upgrade() -> None:
+    op.create_table(
+        'solicitud_terminos',
+        sa.Column(
+            'solicitud_id', UUID(as_uuid=True),
+            sa.ForeignKey('solicitudes.id', ondelete='CASCADE'), primary_key=True,
+        ),
+        sa.Column('termino', sa.String(64), primary_key=True),
+        sa.Column('peso', sa.SmallInteger(), nullable=False),
+    )
+    op.create_index(
+        'ix_solicitud_terminos_termino', 'solicitud_terminos',
+        ['termino', 'solicitud_id', 'peso'],
+        postgresql_ops={'termino': 'varchar_pattern_ops'},
+    )
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index('ix_solicitud_terminos_termino', table_name='solicitud_terminos')
+    op.drop_table('solicitud_terminos')
@@ -0,0 +1,83 @@
+"""Normalised, indexed CIF/NIF for the duplicate check on creation
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+* solicitudes.cif_nif_normalizado holds the CIF/NIF uppercased and without
+  separators ("b-98.765.432" -> "B98765432"), indexed so creating a
+  solicitud can look up an existing one for the same client with one seek.
+* Existing rows are backfilled in batches with a frozen copy of the
+  normaliser (normalizacion.normalizar_cif as of this revision), so
+  replaying the migration always writes the same keys.
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Frozen copy of the CIF/NIF normaliser; do not import application code here.
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def _normalize_cif(cif_nif) -> str:
+    """Uppercase, unaccented, without separators (b-98.765.432 -> B98765432)."""
+    if cif_nif is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(cif_nif))
+    unaccented = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALPHANUMERIC.sub("", unaccented.lower()).upper()
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    solicitudes = sa.table(
+        'solicitudes', sa.column('id'), sa.column('cif_nif'), sa.column('cif_nif_normalizado')
+    )
+    update = (
+        solicitudes.update()
+        .where(solicitudes.c.id == sa.bindparam('b_id'))
+        .values(cif_nif_normalizado=sa.bindparam('b_cif'))
+    )
+    ultimo = None
+    while True:
+        query = (
+            sa.select(solicitudes.c.id, solicitudes.c.cif_nif)
+            .where(solicitudes.c.cif_nif.isnot(None))
+            .order_by(solicitudes.c.id)
+        )
+        if ultimo is not None:
+            query = query.where(solicitudes.c.id > ultimo)
+        rows = bind.execute(query.limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        bind.execute(
+            update,
+            [{'b_id': row.id, 'b_cif': _normalize_cif(row.cif_nif)[:32] or None} for row in rows],
+        )
+        ultimo = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('solicitudes', sa.Column('cif_nif_normalizado', sa.String(32), nullable=True))
+    op.create_index(
+        'ix_solicitudes_cif_nif_normalizado', 'solicitudes', ['cif_nif_normalizado']
+    )
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index('ix_solicitudes_cif_nif_normalizado', table_name='solicitudes')
+    with op.batch_alter_table('solicitudes') as batch:
+        batch.drop_column('cif_nif_normalizado')
@@ -0,0 +1,113 @@
+"""Blocking keys for fuzzy duplicate-client detection
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+* solicitud_bloques holds the blocking keys of each solicitud: postal code
+  plus the first letters of each significant word of the client name
+  ("46001:elec"). Names are only compared within a block, never across
+  the whole table.
+* The (clave, solicitud_id) primary key doubles as the lookup index; rows
+  are deleted together with the solicitud.
+* Existing solicitudes are keyed in batches with a frozen copy of the
+  blocking-key logic (services.duplicados_service.claves_solicitud as of
+  this revision), so replaying the migration always writes the same keys.
+
+"""
+import json
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# ── Frozen copy of the blocking keys ─────────────────────────
+# Do not import application code here: the backfill must keep producing
+# the keys this revision shipped with.
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+STOP_WORDS = frozenset({
+    "de", "del", "la", "las", "el", "los", "y", "e", "en",
+    "sl", "slu", "sa", "sau", "sll", "scp", "cb", "sc", "sociedad", "limitada", "anonima",
+})
+
+# Letters of each name word in a key, and the clave column length
+PREFIX_LENGTH = 4
+KEY_LENGTH = 24
+
+
+def _normalize(text) -> str:
+    if text is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    unaccented = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALPHANUMERIC.sub(" ", unaccented.lower()).strip()
+
+
+def _keys(datos_cliente: dict) -> set:
+    """Blocking keys ("46001:elec") from the client name and postal code."""
+    datos_cliente = datos_cliente or {}
+    postal_code = datos_cliente.get("codigoPostal") or datos_cliente.get("codigo_postal")
+    cp = "".join(c for c in _normalize(postal_code) if c.isdigit())
+    if not cp:
+        return set()
+    words = [
+        t for t in _normalize(datos_cliente.get("nombre")).split()
+        if len(t) > 1 and t not in STOP_WORDS
+    ]
+    return {f"{cp}:{word[:PREFIX_LENGTH]}"[:KEY_LENGTH] for word in words}
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    solicitudes = sa.table(
+        'solicitudes', sa.column('id'), sa.column('datos_cliente', sa.JSON())
+    )
+    bloques = sa.table('solicitud_bloques', sa.column('clave'), sa.column('solicitud_id'))
+    ultimo = None
+    while True:
+        query = sa.select(solicitudes.c.id, solicitudes.c.datos_cliente).order_by(solicitudes.c.id)
+        if ultimo is not None:
+            query = query.where(solicitudes.c.id > ultimo)
+        rows = bind.execute(query.limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        values = []
+        for row in rows:
+            datos = row.datos_cliente
+            if isinstance(datos, str):
+                datos = json.loads(datos)
+            values.extend(
+                {'clave': clave, 'solicitud_id': row.id} for clave in _keys(datos)
+            )
+        if values:
+            bind.execute(bloques.insert(), values)
+        ultimo = rows[-1].id
+
+
+def upgrade() -> None:
+    op.create_table(
+        'solicitud_bloques',
+        sa.Column('clave', sa.String(24), primary_key=True),
+        sa.Column(
+            'solicitud_id', UUID(as_uuid=True),
+            sa.ForeignKey('solicitudes.id', ondelete='CASCADE'), primary_key=True,
+        ),
+    )
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_table('solicitud_bloques')
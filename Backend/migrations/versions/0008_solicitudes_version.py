@@ -0,0 +1,35 @@
+"""Version counter for compare-and-set approvals
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+* solicitudes.version starts at 1 and is incremented by every approval or
+  rejection. The transition UPDATE is conditioned on the version it read,
+  so two users acting on the same solicitud cannot both succeed.
+* The server default fills existing rows; no backfill is needed.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'solicitudes',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('solicitudes') as batch:
+        # SQL Server keeps the server default as a constraint on the column
+        batch.drop_column('version', mssql_drop_default=True)
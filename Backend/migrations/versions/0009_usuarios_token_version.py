@@ -0,0 +1,36 @@
+"""Token version for revoking access tokens
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+
+* usuarios.token_version is copied into every access token ("tv" claim).
+  Incrementing it (password change, role change, deactivation) makes the
+  tokens issued before unusable, while requests can trust the other
+  claims without loading the user.
+* The server default fills existing rows; no backfill is needed.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'usuarios',
+        sa.Column('token_version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('usuarios') as batch:
+        # SQL Server keeps the server default as a constraint on the column
+        batch.drop_column('token_version', mssql_drop_default=True)
@@ -0,0 +1,54 @@
+"""Rotating refresh tokens
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+
+* refresh_tokens holds one row per refresh token issued by /token and
+  /token/refresh. Only the SHA-256 of the token is stored; /token/refresh
+  looks it up through the unique index on token_hash, with no bcrypt.
+* familia groups the tokens rotated from one login, so reusing an old
+  token (or logging out) revokes all of them.
+* token_version is the user's version at issue time; bumping it revokes
+  refresh tokens as well as access tokens. Rows are deleted with the user.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('token_hash', sa.String(64), nullable=False),
+        sa.Column('familia', UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            'user_id', UUID(as_uuid=True),
+            sa.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False,
+        ),
+        sa.Column('token_version', sa.Integer(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('expira_en', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('usado_en', sa.DateTime(timezone=True)),
+        sa.Column('revocado_en', sa.DateTime(timezone=True)),
+    )
+    op.create_index('ix_refresh_tokens_token_hash', 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index('ix_refresh_tokens_familia', 'refresh_tokens', ['familia'])
+    op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_refresh_tokens_user_id', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_familia', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_token_hash', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
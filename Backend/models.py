@@ -1,9 +1,12 @@
 # models.py
-from sqlalchemy import Column, String, Boolean, DateTime, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, DateTime, Enum, JSON, Index, ForeignKey, SmallInteger, Integer
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import validates, relationship
 from sqlalchemy.sql import func
 import uuid
 from database import Base
+from normalizacion import normalizar_cif
 from enum import Enum as PyEnum
 
 class UserRole(PyEnum):
@@ -19,32 +22,141 @@ class EstadoSolicitud(PyEnum):
     COMPLETADO = "COMPLETADO"
     RECHAZADO = "RECHAZADO"
 
+# Estado de la cola que atiende cada rol aprobador
+ESTADO_PENDIENTE_POR_ROL = {
+    "director": EstadoSolicitud.PENDIENTE_DIRECTOR,
+    "pedidos": EstadoSolicitud.PENDIENTE_PEDIDOS,
+    "admin": EstadoSolicitud.PENDIENTE_ADMIN,
+}
+
+# Documento JSON nativo: JSONB en PostgreSQL y NVARCHAR(max) en SQL Server
+# (la migración 0002 añade la restricción ISJSON). MutableDict registra los
+# cambios in situ (p. ej. solicitud.notas['director'] = ...).
+JSONDocument = MutableDict.as_mutable(JSON().with_variant(JSONB(), "postgresql"))
+
+# Columnas indexadas extraídas de datos_cliente -> (claves del JSON, longitud).
+# Las solicitudes del formulario usan camelCase y los datos de demo snake_case.
+CAMPOS_CLIENTE_EXTRAIDOS = {
+    "cliente_nombre": (("nombre",), 255),
+    "cif_nif": (("cif_nif",), 32),
+    "tipo_carga": (("tipoCarga", "tipo_carga"), 16),
+    "metodo_pago": (("metodoPago", "metodo_pago"), 32),
+}
+
+
+def extraer_campos_cliente(datos_cliente: dict) -> dict:
+    """Valores de las columnas extraídas para un documento datos_cliente."""
+    campos = {}
+    for columna, (claves, longitud) in CAMPOS_CLIENTE_EXTRAIDOS.items():
+        valor = next((datos_cliente[k] for k in claves if datos_cliente.get(k) not in (None, "")), None)
+        campos[columna] = str(valor).strip()[:longitud] if valor is not None else None
+    # Clave de la comprobación de duplicados: "b-98.765.432" -> "B98765432"
+    campos["cif_nif_normalizado"] = normalizar_cif(campos["cif_nif"])[:32] or None
+    return campos
+
+
 class Solicitud(Base):
     __tablename__ = "solicitudes"
+    __table_args__ = (
+        # Colas por estado y listados por comercial, más recientes primero
+        # (paginación por cursor sobre creado_en, id)
+        Index("ix_solicitudes_estado_creado_en", "estado", "creado_en", "id"),
+        Index("ix_solicitudes_comercial_id_creado_en", "comercial_id", "creado_en", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     comercial_id = Column(UUID(as_uuid=True), nullable=False)
-    datos_cliente = Column(String, nullable=False)
+    datos_cliente = Column(JSONDocument, nullable=False)
     estado = Column(Enum(EstadoSolicitud), nullable=False)
     aprobado_director = Column(Boolean, default=False)
     aprobado_pedidos = Column(Boolean, default=False)
     aprobado_admin = Column(Boolean, default=False)
-    notas = Column(String, default="{}")
+    notas = Column(JSONDocument, default=dict)
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
     actualizado_en = Column(DateTime(timezone=True), onupdate=func.now())
+    # Se incrementa en cada transición de estado (compare-and-set en
+    # services.aprobacion_service)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Copias indexadas de campos de datos_cliente para filtrar en SQL
+    cliente_nombre = Column(String(255), index=True)
+    cif_nif = Column(String(32), index=True)
+    tipo_carga = Column(String(16), index=True)
+    metodo_pago = Column(String(32), index=True)
+    cif_nif_normalizado = Column(String(32), index=True)
+
+    # Índice de búsqueda; se rellena al crear (services.busqueda_service) y
+    # la base de datos lo borra en cascada con la solicitud.
+    terminos = relationship(
+        "SolicitudTermino", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql"
+    )
+    # Claves de bloqueo para la detección de duplicados (services.duplicados_service)
+    bloques = relationship(
+        "SolicitudBloque", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql"
+    )
+
+    @validates("datos_cliente")
+    def _sincronizar_campos_cliente(self, key, datos_cliente):
+        """Mantiene las columnas extraídas al asignar datos_cliente."""
+        for columna, valor in extraer_campos_cliente(datos_cliente or {}).items():
+            setattr(self, columna, valor)
+        return datos_cliente
+
+
+class SolicitudTermino(Base):
+    """Índice invertido para /api/solicitudes/search: un término por fila."""
+    __tablename__ = "solicitud_terminos"
+    __table_args__ = (
+        # Búsqueda por prefijo (termino LIKE 'abc%'); en PostgreSQL requiere
+        # varchar_pattern_ops salvo con collation "C"
+        Index(
+            "ix_solicitud_terminos_termino", "termino", "solicitud_id", "peso",
+            postgresql_ops={"termino": "varchar_pattern_ops"},
+        ),
+    )
+
+    solicitud_id = Column(
+        UUID(as_uuid=True), ForeignKey("solicitudes.id", ondelete="CASCADE"), primary_key=True
+    )
+    termino = Column(String(64), primary_key=True)
+    peso = Column(SmallInteger, nullable=False, default=1)
+
+
+class SolicitudBloque(Base):
+    """
+    Clave de bloqueo (código postal + inicio de una palabra del nombre) de
+    una solicitud: los posibles duplicados se buscan solo entre las
+    solicitudes que comparten alguna clave.
+    """
+    __tablename__ = "solicitud_bloques"
+
+    # La clave primaria (clave, solicitud_id) es también el índice de búsqueda
+    clave = Column(String(24), primary_key=True)
+    solicitud_id = Column(
+        UUID(as_uuid=True), ForeignKey("solicitudes.id", ondelete="CASCADE"), primary_key=True
+    )
+
 
 class SolicitudArchivada(Base):
     __tablename__ = "solicitudes_archivadas"
+    __table_args__ = (
+        # Listados de archivadas por comercial y globales, más recientes primero
+        Index("ix_solicitudes_archivadas_comercial_email_fecha", "comercial_email", "fecha_creacion", "id"),
+        Index("ix_solicitudes_archivadas_fecha_creacion", "fecha_creacion", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    solicitud_original_id = Column(UUID(as_uuid=True), nullable=False)
-    resumen = Column(String, nullable=False)
+    solicitud_original_id = Column(UUID(as_uuid=True), nullable=False, unique=True, index=True)
+    # Documento completo de la solicitud original: datos_cliente, notas y aprobaciones
+    resumen = Column(JSONDocument, nullable=False)
+    estado = Column(String(20))
     fecha_creacion = Column(DateTime(timezone=True), nullable=False)
     fecha_aprobacion_director = Column(DateTime(timezone=True))
     fecha_aprobacion_pedidos = Column(DateTime(timezone=True))
     fecha_aprobacion_admin = Column(DateTime(timezone=True))
-    comercial_email = Column(String, nullable=False)
-    cliente_nombre = Column(String, nullable=False)
+    comercial_email = Column(String(255), nullable=False)
+    cliente_nombre = Column(String(255), nullable=False)
+    archivado_en = Column(DateTime(timezone=True), server_default=func.now())
 
 class User(Base):
     __tablename__ = "usuarios"
@@ -57,4 +169,31 @@ class User(Base):
     activo = Column(Boolean, default=True)
     ultimo_acceso = Column(DateTime(timezone=True))
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
-    is_temporary_password = Column(Boolean, default=False)  # Nuevo campo para contraseñas temporales
\ No newline at end of file
+    is_temporary_password = Column(Boolean, default=False)  # Nuevo campo para contraseñas temporales
+    # Va en el claim "tv" del JWT; al incrementarlo (cambio de contraseña,
+    # rol o desactivación) se revocan los tokens emitidos antes
+    token_version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class RefreshToken(Base):
+    """
+    Refresh token rotatorio. Solo se guarda el SHA-256 del valor: el token
+    es aleatorio (256 bits), así que basta un hash rápido y la búsqueda es
+    por índice único, sin bcrypt. Cada uso lo marca como usado y emite otro
+    de la misma familia; reutilizar uno ya usado revoca la familia entera.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    familia = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # token_version del usuario al emitirlo: si cambia (contraseña, rol,
+    # desactivación) el refresh token deja de valer, igual que el de acceso
+    token_version = Column(Integer, nullable=False)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now())
+    expira_en = Column(DateTime(timezone=True), nullable=False)
+    usado_en = Column(DateTime(timezone=True))
+    revocado_en = Column(DateTime(timezone=True))
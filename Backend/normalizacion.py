@@ -0,0 +1,49 @@
+"""
+Normalización de texto para búsqueda y detección de duplicados.
+
+Todo se reduce a minúsculas ASCII sin acentos, de modo que
+"Electrodomésticos Martínez S.L." y "ELECTRODOMESTICOS MARTINEZ SL" producen
+los mismos términos.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+# Palabras que no aportan al buscar ni al comparar nombres de empresa
+PALABRAS_VACIAS = frozenset({
+    "de", "del", "la", "las", "el", "los", "y", "e", "en",
+    "sl", "slu", "sa", "sau", "sll", "scp", "cb", "sc", "sociedad", "limitada", "anonima",
+})
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas, sin acentos y con los separadores reducidos a un espacio."""
+    if texto is None:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", str(texto))
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_acentos.lower()).strip()
+
+
+def tokenizar(texto, quitar_vacias: bool = True) -> List[str]:
+    """
+    Palabras normalizadas de ``texto``. Por defecto descarta las palabras
+    vacías y las letras sueltas (las de "S.L." o "S.A.").
+    """
+    tokens = normalizar_texto(texto).split()
+    if quitar_vacias:
+        tokens = [t for t in tokens if len(t) > 1 and t not in PALABRAS_VACIAS]
+    return tokens
+
+
+def normalizar_cif(cif_nif) -> str:
+    """CIF/NIF en mayúsculas y sin espacios, guiones ni puntos (B-98.765.432 -> B98765432)."""
+    return normalizar_texto(cif_nif).replace(" ", "").upper()
+
+
+def normalizar_codigo_postal(codigo_postal) -> str:
+    """Solo los dígitos del código postal ("46 001" -> "46001")."""
+    return "".join(c for c in normalizar_texto(codigo_postal) if c.isdigit())
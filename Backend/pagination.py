@@ -0,0 +1,77 @@
+"""
+Keyset (cursor) pagination.
+
+Lists are ordered newest first by ``(created, id)`` and each page continues
+strictly after the last row of the previous one, so the database seeks
+straight into the composite index instead of skipping ``OFFSET`` rows and
+page latency does not grow with the table. The cursor is an opaque,
+URL-safe token holding the last row's timestamp and id.
+
+Endpoints keep returning a plain JSON array; the cursor for the next page is
+sent in the ``X-Next-Cursor`` header (absent on the last page) and, when
+requested, the total in ``X-Total-Count``.
+"""
+
+import base64
+import os
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(created: datetime, row_id: UUID) -> str:
+    raw = f"{created.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Parse a cursor produced by ``encode_cursor``; 400 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created), UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+
+
+def keyset_page(statement, created_column, id_column, limit: int, cursor: Optional[str]):
+    """
+    Restrict ``statement`` to the page after ``cursor``, newest first.
+
+    One extra row is fetched so ``split_page`` can tell whether another page
+    exists without a separate query.
+    """
+    if cursor:
+        created, row_id = decode_cursor(cursor)
+        statement = statement.where(
+            or_(
+                created_column < created,
+                and_(created_column == created, id_column < row_id),
+            )
+        )
+    return statement.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, created_attr: str = "creado_en", id_attr: str = "id"):
+    """Return ``(page_rows, next_cursor)``; ``next_cursor`` is None on the last page."""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    last = page[-1]
+    return page, encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str], total: Optional[int] = None) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
@@ -2,6 +2,7 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, Dict, List
 from datetime import datetime
+from uuid import UUID
 from enum import Enum
 
 class TipoCarga(str, Enum):
@@ -54,10 +55,62 @@ class SolicitudResponse(BaseModel):
     aprobado_pedidos: bool
     aprobado_admin: bool
     notas: Optional[Dict[str, str]] = {}
+    # Solo al crear: id de otra solicitud vigente con el mismo CIF/NIF y
+    # solicitudes del mismo código postal con un nombre parecido
+    duplicado_de: Optional[str] = None
+    posibles_duplicados: Optional[List[dict]] = None
 
     class Config:
         from_attributes = True
 
+class AprobacionLote(BaseModel):
+    """Misma decisión para varias solicitudes de la cola del usuario"""
+    ids: List[UUID]
+    aprobar: bool = False
+    marcas: Optional[List[str]] = None  # director
+    tarifa: Optional[str] = None  # director
+    termino_pago: Optional[str] = None  # admin
+    notas: Optional[str] = ''
+
+class ResultadoAprobacion(BaseModel):
+    id: str
+    status_code: int
+    estado: Optional[str] = None
+    version: Optional[int] = None
+    mensaje: str
+
+class AprobacionLoteResponse(BaseModel):
+    procesadas: int
+    resultados: List[ResultadoAprobacion]
+
+class SolicitudArchivadaResponse(BaseModel):
+    id: str
+    solicitud_original_id: str
+    estado: Optional[str] = None
+    cliente_nombre: str
+    comercial_email: str
+    fecha_creacion: datetime
+    fecha_aprobacion_admin: Optional[datetime] = None
+    archivado_en: Optional[datetime] = None
+    resumen: dict
+
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_orm(cls, obj):
+        return cls(
+            id=str(obj.id),
+            solicitud_original_id=str(obj.solicitud_original_id),
+            estado=obj.estado,
+            cliente_nombre=obj.cliente_nombre,
+            comercial_email=obj.comercial_email,
+            fecha_creacion=obj.fecha_creacion,
+            fecha_aprobacion_admin=obj.fecha_aprobacion_admin,
+            archivado_en=obj.archivado_en,
+            resumen=obj.resumen or {}
+        )
+
 # Nuevos esquemas para usuarios
 class UserCreate(BaseModel):
     email: EmailStr
@@ -100,4 +153,7 @@ class UserResponse(BaseModel):
 
 class PasswordChange(BaseModel):
     current_password: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
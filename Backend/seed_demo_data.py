@@ -1,6 +1,9 @@
 """
 Script simplificado para crear datos de ejemplo en la base de datos.
-Esta versión usa json.dumps para convertir los diccionarios a cadenas JSON.
+Los documentos JSON se envían con json.dumps y las columnas indexadas
+(cliente_nombre, cif_nif, ...) se rellenan con extraer_campos_cliente, y los
+términos de búsqueda y las claves de duplicados con terminos_solicitud y
+claves_solicitud.
 """
 
 import asyncio
@@ -17,6 +20,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from auth.auth_handler import AuthHandler
 from database import init_db, AsyncSessionLocal
+from models import extraer_campos_cliente
+from services.busqueda_service import terminos_solicitud
+from services.duplicados_service import claves_solicitud
 
 
 def get_demo_password() -> str:
@@ -221,16 +227,35 @@ def crear_archivos_sepa():
         else:
             print(f"Archivo SEPA {i} ya existe")
 
+async def indexar_solicitud(db, solicitud_id, datos_cliente):
+    """Insertar los términos de búsqueda y las claves de duplicados de una solicitud"""
+    terminos = terminos_solicitud(datos_cliente)
+    if terminos:
+        await db.execute(
+            text("INSERT INTO solicitud_terminos (solicitud_id, termino, peso) VALUES (:solicitud_id, :termino, :peso)"),
+            [
+                {"solicitud_id": solicitud_id, "termino": termino, "peso": peso}
+                for termino, peso in terminos.items()
+            ]
+        )
+    claves = claves_solicitud(datos_cliente)
+    if claves:
+        await db.execute(
+            text("INSERT INTO solicitud_bloques (clave, solicitud_id) VALUES (:clave, :solicitud_id)"),
+            [{"clave": clave, "solicitud_id": solicitud_id} for clave in claves]
+        )
+
 async def crear_solicitudes(db, comercial_id):
     """Crear solicitudes de ejemplo"""
     # Solicitud 1: Completada
     solicitud_id1 = uuid.uuid4()
     await db.execute(
-        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en) VALUES (:id, :comercial_id, :datos_cliente, 'COMPLETADO', true, true, true, :notas, :creado_en, :actualizado_en)"),
+        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en, cliente_nombre, cif_nif, tipo_carga, metodo_pago, cif_nif_normalizado) VALUES (:id, :comercial_id, :datos_cliente, 'COMPLETADO', true, true, true, :notas, :creado_en, :actualizado_en, :cliente_nombre, :cif_nif, :tipo_carga, :metodo_pago, :cif_nif_normalizado)"),
         {
             "id": solicitud_id1,
             "comercial_id": comercial_id,
             "datos_cliente": json.dumps(CLIENTES_EJEMPLO[0]),
+            **extraer_campos_cliente(CLIENTES_EJEMPLO[0]),
             "notas": json.dumps({
                 "director": "Cliente con buena trayectoria. Aprobado.",
                 "pedidos": "Stock disponible para sus productos habituales.",
@@ -240,16 +265,18 @@ async def crear_solicitudes(db, comercial_id):
             "actualizado_en": datetime.utcnow() - timedelta(days=1)
         }
     )
+    await indexar_solicitud(db, solicitud_id1, CLIENTES_EJEMPLO[0])
     print("Solicitud 1 (COMPLETADO) creada")
     
     # Solicitud 2: Pendiente de admin
     solicitud_id2 = uuid.uuid4()
     await db.execute(
-        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_ADMIN', true, true, false, :notas, :creado_en, :actualizado_en)"),
+        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en, cliente_nombre, cif_nif, tipo_carga, metodo_pago, cif_nif_normalizado) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_ADMIN', true, true, false, :notas, :creado_en, :actualizado_en, :cliente_nombre, :cif_nif, :tipo_carga, :metodo_pago, :cif_nif_normalizado)"),
         {
             "id": solicitud_id2,
             "comercial_id": comercial_id,
             "datos_cliente": json.dumps(CLIENTES_EJEMPLO[1]),
+            **extraer_campos_cliente(CLIENTES_EJEMPLO[1]),
             "notas": json.dumps({
                 "director": "Cliente recomendado por distribuidor. Aprobado con margen comercial estándar.",
                 "pedidos": "Configurado en sistema. Pendiente de primera entrega."
@@ -258,16 +285,18 @@ async def crear_solicitudes(db, comercial_id):
             "actualizado_en": datetime.utcnow() - timedelta(days=2)
         }
     )
+    await indexar_solicitud(db, solicitud_id2, CLIENTES_EJEMPLO[1])
     print("Solicitud 2 (PENDIENTE_ADMIN) creada")
     
     # Solicitud 3: Pendiente de pedidos
     solicitud_id3 = uuid.uuid4()
     await db.execute(
-        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_PEDIDOS', true, false, false, :notas, :creado_en, :actualizado_en)"),
+        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en, cliente_nombre, cif_nif, tipo_carga, metodo_pago, cif_nif_normalizado) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_PEDIDOS', true, false, false, :notas, :creado_en, :actualizado_en, :cliente_nombre, :cif_nif, :tipo_carga, :metodo_pago, :cif_nif_normalizado)"),
         {
             "id": solicitud_id3,
             "comercial_id": comercial_id,
             "datos_cliente": json.dumps(CLIENTES_EJEMPLO[2]),
+            **extraer_campos_cliente(CLIENTES_EJEMPLO[2]),
             "notas": json.dumps({
                 "director": "Cliente con potencial en la zona. Aprobado con seguimiento trimestral."
             }),
@@ -275,31 +304,35 @@ async def crear_solicitudes(db, comercial_id):
             "actualizado_en": datetime.utcnow() - timedelta(days=1)
         }
     )
+    await indexar_solicitud(db, solicitud_id3, CLIENTES_EJEMPLO[2])
     print("Solicitud 3 (PENDIENTE_PEDIDOS) creada")
     
     # Solicitud 4: Pendiente de director
     solicitud_id4 = uuid.uuid4()
     await db.execute(
-        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_DIRECTOR', false, false, false, :notas, :creado_en, :actualizado_en)"),
+        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en, cliente_nombre, cif_nif, tipo_carga, metodo_pago, cif_nif_normalizado) VALUES (:id, :comercial_id, :datos_cliente, 'PENDIENTE_DIRECTOR', false, false, false, :notas, :creado_en, :actualizado_en, :cliente_nombre, :cif_nif, :tipo_carga, :metodo_pago, :cif_nif_normalizado)"),
         {
             "id": solicitud_id4,
             "comercial_id": comercial_id,
             "datos_cliente": json.dumps(CLIENTES_EJEMPLO[3]),
+            **extraer_campos_cliente(CLIENTES_EJEMPLO[3]),
             "notas": json.dumps({}),
             "creado_en": datetime.utcnow() - timedelta(days=1),
             "actualizado_en": datetime.utcnow() - timedelta(days=1)
         }
     )
+    await indexar_solicitud(db, solicitud_id4, CLIENTES_EJEMPLO[3])
     print("Solicitud 4 (PENDIENTE_DIRECTOR) creada")
     
     # Solicitud 5: Rechazada
     solicitud_id5 = uuid.uuid4()
     await db.execute(
-        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en) VALUES (:id, :comercial_id, :datos_cliente, 'RECHAZADO', false, false, false, :notas, :creado_en, :actualizado_en)"),
+        text("INSERT INTO solicitudes (id, comercial_id, datos_cliente, estado, aprobado_director, aprobado_pedidos, aprobado_admin, notas, creado_en, actualizado_en, cliente_nombre, cif_nif, tipo_carga, metodo_pago, cif_nif_normalizado) VALUES (:id, :comercial_id, :datos_cliente, 'RECHAZADO', false, false, false, :notas, :creado_en, :actualizado_en, :cliente_nombre, :cif_nif, :tipo_carga, :metodo_pago, :cif_nif_normalizado)"),
         {
             "id": solicitud_id5,
             "comercial_id": comercial_id,
             "datos_cliente": json.dumps(CLIENTES_EJEMPLO[4]),
+            **extraer_campos_cliente(CLIENTES_EJEMPLO[4]),
             "notas": json.dumps({
                 "director": "Cliente con histórico de impagos. Solicitar garantías adicionales."
             }),
@@ -307,6 +340,7 @@ async def crear_solicitudes(db, comercial_id):
             "actualizado_en": datetime.utcnow() - timedelta(days=4)
         }
     )
+    await indexar_solicitud(db, solicitud_id5, CLIENTES_EJEMPLO[4])
     print("Solicitud 5 (RECHAZADO) creada")
 
 async def main():
@@ -0,0 +1,279 @@
+"""
+Aprobación y rechazo de solicitudes.
+
+Cada transición es un compare-and-set: se lee la solicitud (estado, versión
+y los documentos JSON a completar) y se escribe con un único
+UPDATE ... WHERE id = :id AND estado = :esperado AND version = :version
+RETURNING, que incrementa la versión. Si otro usuario la ha cambiado entre
+medias el UPDATE no afecta a ninguna fila y se responde 409, en lugar de
+sobrescribir su decisión. Los documentos se completan en Python porque la
+sintaxis para modificar JSON en SQL difiere entre PostgreSQL y SQL Server;
+por eso cada transición son dos viajes a la base de datos (SELECT y UPDATE)
+y no uno.
+
+Por lotes (aprobar_rechazar_lote) se hace lo mismo con una sola lectura y
+un solo UPDATE para todas las solicitudes: los documentos y la versión
+leída de cada una van en un CASE por id, y RETURNING indica cuáles ha
+escrito. El resultado es por solicitud (200, 404 o 409).
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from models import Solicitud, EstadoSolicitud, ESTADO_PENDIENTE_POR_ROL
+from services.resumen_service import registrar_transicion
+
+# Estado al que pasa una solicitud aprobada por cada rol
+SIGUIENTE_ESTADO_POR_ROL = {
+    "director": EstadoSolicitud.PENDIENTE_PEDIDOS,
+    "pedidos": EstadoSolicitud.PENDIENTE_ADMIN,
+    "admin": EstadoSolicitud.COMPLETADO,
+}
+
+# Solicitudes por petición de aprobar-lote; también acota los parámetros
+# del UPDATE (SQL Server admite 2100 por sentencia)
+APPROVAL_BATCH_MAX_ITEMS = int(os.getenv("APPROVAL_BATCH_MAX_ITEMS", "100"))
+
+# Columnas que cada solicitud del lote escribe con su propio valor
+COLUMNAS_POR_SOLICITUD = ("notas", "datos_cliente")
+
+conflictos = metrics.Counter()
+
+metrics.register("aprobaciones", lambda: {"conflictos": conflictos.value})
+
+
+def validar_datos_aprobacion(rol: str, datos: dict) -> None:
+    """
+    Comprueba, sin acceder a la base de datos, que el rol puede aprobar y
+    que la petición trae los datos que necesita.
+
+    Raises:
+        HTTPException: 403 si el rol no aprueba solicitudes, 400 si faltan datos
+    """
+    if rol not in ESTADO_PENDIENTE_POR_ROL:
+        raise HTTPException(
+            status_code=403,
+            detail=f"El rol {rol} no puede aprobar ni rechazar solicitudes"
+        )
+    if not datos.get('aprobar', False):
+        return
+    if rol == 'director' and (not datos.get('marcas') or not datos.get('tarifa')):
+        raise HTTPException(
+            status_code=400,
+            detail="Se requieren marcas y tarifa para aprobar la solicitud"
+        )
+    if rol == 'admin' and not datos.get('termino_pago'):
+        raise HTTPException(
+            status_code=400,
+            detail="Se requiere término de pago para aprobar la solicitud"
+        )
+
+
+def valores_transicion(rol: str, datos: dict, datos_cliente: dict, notas: dict) -> dict:
+    """Columnas a escribir al aprobar o rechazar, a partir de los documentos actuales."""
+    datos_cliente = dict(datos_cliente or {})
+    notas = dict(notas or {})
+    notas[rol] = datos.get('notas', '')
+    valores = {"notas": notas, "actualizado_en": datetime.utcnow()}
+
+    if not datos.get('aprobar', False):
+        valores["estado"] = EstadoSolicitud.RECHAZADO
+        return valores
+
+    if rol == 'director':
+        datos_cliente['marcas_aprobadas'] = datos.get('marcas', [])
+        datos_cliente['tarifa_aprobada'] = datos.get('tarifa', '')
+        valores["datos_cliente"] = datos_cliente
+    elif rol == 'admin':
+        datos_cliente['termino_pago'] = datos.get('termino_pago', '')
+        valores["datos_cliente"] = datos_cliente
+    valores[f"aprobado_{rol}"] = True
+    valores["estado"] = SIGUIENTE_ESTADO_POR_ROL[rol]
+    return valores
+
+
+def error_conflicto(estado_actual: Optional[EstadoSolicitud], rol: str) -> HTTPException:
+    """409 para una solicitud que ya no está en la cola del rol."""
+    conflictos.inc()
+    if estado_actual is None:
+        detalle = "La solicitud ha dejado de existir"
+    else:
+        detalle = (
+            f"Esta solicitud no está pendiente para el rol {rol} "
+            f"(estado actual: {estado_actual.value})"
+        )
+    return HTTPException(status_code=409, detail=detalle)
+
+
+async def aprobar_rechazar(db: AsyncSession, solicitud_id: UUID, rol: str, datos: dict):
+    """
+    Aprueba o rechaza una solicitud pendiente para el rol y confirma el cambio.
+
+    Raises:
+        HTTPException: 403/400 (ver validar_datos_aprobacion), 404 si no
+            existe, 409 si no está pendiente para el rol o la ha cambiado
+            otro usuario a la vez
+
+    Returns:
+        Fila (id, estado, version, actualizado_en) escrita por el UPDATE
+    """
+    validar_datos_aprobacion(rol, datos)
+    esperado = ESTADO_PENDIENTE_POR_ROL[rol]
+
+    result = await db.execute(
+        select(
+            Solicitud.comercial_id, Solicitud.estado, Solicitud.version,
+            Solicitud.datos_cliente, Solicitud.notas,
+        ).where(Solicitud.id == solicitud_id)
+    )
+    actual = result.first()
+    if actual is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Solicitud no encontrada"
+        )
+    if actual.estado != esperado:
+        raise error_conflicto(actual.estado, rol)
+
+    valores = valores_transicion(rol, datos, actual.datos_cliente, actual.notas)
+    result = await db.execute(
+        update(Solicitud)
+        .where(
+            Solicitud.id == solicitud_id,
+            Solicitud.estado == esperado,
+            Solicitud.version == actual.version,
+        )
+        .values(**valores, version=Solicitud.version + 1)
+        .returning(Solicitud.id, Solicitud.estado, Solicitud.version, Solicitud.actualizado_en)
+        .execution_options(synchronize_session=False)
+    )
+    nueva = result.first()
+    if nueva is None:
+        await db.rollback()
+        raise error_conflicto(await _estado_actual(db, solicitud_id), rol)
+    await db.commit()
+    registrar_transicion(actual.comercial_id, esperado, nueva.estado)
+    return nueva
+
+
+async def _estado_actual(db: AsyncSession, solicitud_id: UUID) -> Optional[EstadoSolicitud]:
+    result = await db.execute(select(Solicitud.estado).where(Solicitud.id == solicitud_id))
+    return result.scalar_one_or_none()
+
+
+def _resultado(solicitud_id, status_code: int, mensaje: str, estado=None, version=None) -> dict:
+    return {
+        "id": str(solicitud_id),
+        "status_code": status_code,
+        "estado": estado.value if estado is not None else None,
+        "version": version,
+        "mensaje": mensaje,
+    }
+
+
+def _por_solicitud(columna, valores: dict):
+    """CASE id WHEN ... THEN ... END con el valor de cada solicitud."""
+    return case(
+        {solicitud_id: literal(valor, type_=columna.type) for solicitud_id, valor in valores.items()},
+        value=Solicitud.id,
+    )
+
+
+async def aprobar_rechazar_lote(
+    db: AsyncSession, solicitud_ids: List[UUID], rol: str, datos: dict
+) -> List[dict]:
+    """
+    Aprueba o rechaza varias solicitudes con la misma decisión en una
+    transacción: una lectura, un UPDATE y un commit.
+
+    Raises:
+        HTTPException: 403/400 (ver validar_datos_aprobacion) o 400 si el
+            lote supera APPROVAL_BATCH_MAX_ITEMS
+
+    Returns:
+        Un resultado por id, en el orden recibido: status_code 200 si se
+        ha procesado, 404 si no existe y 409 si no estaba pendiente para el
+        rol o la ha procesado otro usuario a la vez
+    """
+    validar_datos_aprobacion(rol, datos)
+    solicitud_ids = list(dict.fromkeys(solicitud_ids))
+    if not solicitud_ids or len(solicitud_ids) > APPROVAL_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote debe tener entre 1 y {APPROVAL_BATCH_MAX_ITEMS} solicitudes"
+        )
+    esperado = ESTADO_PENDIENTE_POR_ROL[rol]
+
+    result = await db.execute(
+        select(
+            Solicitud.id, Solicitud.comercial_id, Solicitud.estado, Solicitud.version,
+            Solicitud.datos_cliente, Solicitud.notas,
+        ).where(Solicitud.id.in_(solicitud_ids))
+    )
+    actuales = {fila.id: fila for fila in result.all()}
+
+    resultados = {}
+    pendientes = []
+    for solicitud_id in solicitud_ids:
+        fila = actuales.get(solicitud_id)
+        if fila is None:
+            resultados[solicitud_id] = _resultado(solicitud_id, 404, "Solicitud no encontrada")
+        elif fila.estado != esperado:
+            resultados[solicitud_id] = _resultado(
+                solicitud_id, 409, error_conflicto(fila.estado, rol).detail, fila.estado, fila.version
+            )
+        else:
+            pendientes.append(fila)
+
+    if pendientes:
+        valores = {
+            fila.id: valores_transicion(rol, datos, fila.datos_cliente, fila.notas)
+            for fila in pendientes
+        }
+        comunes = {
+            columna: valor for columna, valor in valores[pendientes[0].id].items()
+            if columna not in COLUMNAS_POR_SOLICITUD
+        }
+        for columna in COLUMNAS_POR_SOLICITUD:
+            if columna in valores[pendientes[0].id]:
+                comunes[columna] = _por_solicitud(
+                    getattr(Solicitud, columna),
+                    {solicitud_id: v[columna] for solicitud_id, v in valores.items()},
+                )
+        result = await db.execute(
+            update(Solicitud)
+            .where(
+                Solicitud.id.in_(list(valores)),
+                Solicitud.estado == esperado,
+                Solicitud.version == _por_solicitud(
+                    Solicitud.version, {fila.id: fila.version for fila in pendientes}
+                ),
+            )
+            .values(**comunes, version=Solicitud.version + 1)
+            .returning(Solicitud.id, Solicitud.estado, Solicitud.version)
+            .execution_options(synchronize_session=False)
+        )
+        escritas = {fila.id: fila for fila in result.all()}
+        await db.commit()
+
+        for fila in pendientes:
+            nueva = escritas.get(fila.id)
+            if nueva is None:
+                conflictos.inc()
+                resultados[fila.id] = _resultado(
+                    fila.id, 409, "La solicitud ha sido procesada por otro usuario a la vez"
+                )
+            else:
+                registrar_transicion(fila.comercial_id, esperado, nueva.estado)
+                resultados[fila.id] = _resultado(
+                    fila.id, 200, "Solicitud procesada correctamente", nueva.estado, nueva.version
+                )
+
+    return [resultados[solicitud_id] for solicitud_id in solicitud_ids]
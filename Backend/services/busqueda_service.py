@@ -0,0 +1,233 @@
+"""
+Búsqueda de solicitudes por cliente (nombre, CIF/NIF, población, contacto o
+correo).
+
+Cada solicitud guarda sus términos normalizados en solicitud_terminos, un
+índice invertido dentro de la propia base de datos. Buscar es recorrer el
+índice B-tree de ``termino`` por prefijo (``LIKE 'abc%'``) para la palabra
+más selectiva de la consulta y comprobar las demás por clave primaria, así
+que el coste depende de las coincidencias y no del número de solicitudes.
+El resultado exige todas las palabras y se ordena por relevancia: suma de
+los pesos de los campos coincidentes, con bonificación si la palabra
+coincide entera.
+"""
+
+import os
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, case, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import Solicitud, SolicitudTermino
+from normalizacion import normalizar_cif, tokenizar
+
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+# Coincidencias de la palabra más selectiva que se llegan a puntuar. Solo
+# limita consultas muy genéricas ("sl madrid"), que devuelven entonces los
+# mejores de entre esas coincidencias (siempre las mismas: las primeras por
+# término e id) en lugar de recorrer toda la tabla.
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+
+# Peso de cada campo de datos_cliente en la relevancia (claves del formulario
+# y, si difieren, de los datos de demo)
+PESOS_CAMPOS = {
+    ("cif_nif",): 4,
+    ("nombre",): 3,
+    ("correo",): 3,
+    ("nombreContacto", "nombre_contacto"): 2,
+    ("poblacion",): 1,
+}
+# Bonificación cuando la palabra buscada coincide con el término completo
+BONIFICACION_EXACTA = 2
+# Por debajo de esta longitud solo se busca la palabra exacta: un prefijo de
+# una o dos letras recorrería buena parte del índice
+LONGITUD_MINIMA_PREFIJO = 3
+MAX_PALABRAS_CONSULTA = 5
+# Tope al contar coincidencias para elegir la palabra más selectiva
+MUESTRA_FRECUENCIA = 1000
+LONGITUD_TERMINO = SolicitudTermino.termino.type.length
+
+
+def terminos_solicitud(datos_cliente: dict) -> Dict[str, int]:
+    """Términos de búsqueda de una solicitud con el peso de su mejor campo."""
+    terminos: Dict[str, int] = {}
+    datos_cliente = datos_cliente or {}
+    for claves, peso in PESOS_CAMPOS.items():
+        valor = next((datos_cliente[k] for k in claves if datos_cliente.get(k)), None)
+        if not valor:
+            continue
+        palabras = tokenizar(valor)
+        if claves == ("cif_nif",):
+            # También el CIF completo, para encontrar "B-98.765.432" con "b98765"
+            palabras.append(normalizar_cif(valor).lower())
+        for palabra in palabras:
+            palabra = palabra[:LONGITUD_TERMINO]
+            if palabra and terminos.get(palabra, 0) < peso:
+                terminos[palabra] = peso
+    return terminos
+
+
+def indexar(solicitud: Solicitud) -> None:
+    """Sustituye los términos de la solicitud por los de su datos_cliente actual."""
+    solicitud.terminos = [
+        SolicitudTermino(termino=termino, peso=peso)
+        for termino, peso in terminos_solicitud(solicitud.datos_cliente).items()
+    ]
+
+
+def palabras_consulta(q: str) -> List[str]:
+    """Palabras distintas de la consulta, en orden y como máximo MAX_PALABRAS_CONSULTA."""
+    palabras = [palabra[:LONGITUD_TERMINO] for palabra in tokenizar(q)]
+    return list(dict.fromkeys(palabras))[:MAX_PALABRAS_CONSULTA]
+
+
+def cif_consulta(q: str) -> Optional[str]:
+    """
+    La consulta entera sin separadores si puede ser un CIF/NIF: "B-98.765.432"
+    se trocea en palabras sueltas, pero se busca también como "b98765432".
+    """
+    cif = normalizar_cif(q).lower()[:LONGITUD_TERMINO]
+    if len(cif) >= LONGITUD_MINIMA_PREFIJO and any(c.isdigit() for c in cif):
+        return cif
+    return None
+
+
+def _escapar_like(palabra: str) -> str:
+    # tokenizar() solo deja [a-z0-9], pero no está de más
+    return palabra.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _coincide(termino, palabra: str):
+    """Condición sobre ``termino`` para una palabra de la consulta."""
+    if len(palabra) >= LONGITUD_MINIMA_PREFIJO:
+        return termino.like(_escapar_like(palabra) + "%", escape="\\")
+    return termino == palabra
+
+
+def _puntuacion(alias, palabra: str):
+    return func.max(alias.peso + case((alias.termino == palabra, BONIFICACION_EXACTA), else_=0))
+
+
+def _coincidencias(palabra: str, comercial_id: Optional[UUID], nombre: str):
+    """
+    Términos que coinciden con ``palabra``, como mucho SEARCH_MAX_CANDIDATES,
+    en el orden del índice (termino, solicitud_id): el tope siempre deja
+    fuera las mismas. Con ``comercial_id`` solo cuentan las solicitudes de
+    ese comercial, antes del tope.
+    """
+    query = select(SolicitudTermino).where(_coincide(SolicitudTermino.termino, palabra))
+    if comercial_id is not None:
+        query = query.join(Solicitud, Solicitud.id == SolicitudTermino.solicitud_id).where(
+            Solicitud.comercial_id == comercial_id
+        )
+    return (
+        query.order_by(SolicitudTermino.termino, SolicitudTermino.solicitud_id)
+        .limit(SEARCH_MAX_CANDIDATES)
+        .subquery(nombre)
+    )
+
+
+def consulta_frecuencias(palabras: List[str]):
+    """
+    Número de términos que coinciden con cada palabra, contando como máximo
+    MUESTRA_FRECUENCIA: basta para saber qué palabra es más selectiva sin
+    recorrer entera la de una palabra común.
+    """
+    return select(*(
+        select(func.count())
+        .select_from(
+            select(SolicitudTermino.solicitud_id)
+            .where(_coincide(SolicitudTermino.termino, palabra))
+            .limit(MUESTRA_FRECUENCIA)
+            .subquery()
+        )
+        .scalar_subquery()
+        .label(f"f{i}")
+        for i, palabra in enumerate(palabras)
+    ))
+
+
+def consulta_busqueda(
+    palabras: List[str],
+    cif: Optional[str] = None,
+    limite: int = SEARCH_MAX_RESULTS,
+    comercial_id: Optional[UUID] = None,
+):
+    """
+    SELECT de las solicitudes que contienen todas las ``palabras`` (por
+    prefijo) o cuyo CIF/NIF empieza por ``cif``, ordenadas por relevancia y
+    después por fecha.
+
+    Las palabras se cruzan con un JOIN de solicitud_terminos consigo misma:
+    se recorren las coincidencias de la primera palabra (como mucho
+    SEARCH_MAX_CANDIDATES) y las demás se comprueban por la clave primaria
+    (solicitud_id, termino), así que la primera debe ser la más selectiva
+    (ver buscar). El filtro por ``comercial_id`` se aplica al recorrer las
+    coincidencias, no al final: un comercial no se queda sin resultados
+    porque las primeras SEARCH_MAX_CANDIDATES fueran de otros.
+    """
+    candidatos = []
+    if palabras:
+        primero = _coincidencias(palabras[0], comercial_id, "t0")
+        alias = [aliased(SolicitudTermino, name=f"t{i}") for i in range(1, len(palabras))]
+        todas = select(
+            primero.c.solicitud_id.label("solicitud_id"),
+            sum(
+                (_puntuacion(a, p) for a, p in zip(alias, palabras[1:])),
+                _puntuacion(primero.c, palabras[0]),
+            ).label("puntuacion"),
+        )
+        for a, palabra in zip(alias, palabras[1:]):
+            todas = todas.join(
+                a, and_(a.solicitud_id == primero.c.solicitud_id, _coincide(a.termino, palabra))
+            )
+        candidatos.append(todas.group_by(primero.c.solicitud_id))
+    if cif:
+        coincidencias_cif = _coincidencias(cif, comercial_id, "cif")
+        candidatos.append(
+            select(
+                coincidencias_cif.c.solicitud_id.label("solicitud_id"),
+                _puntuacion(coincidencias_cif.c, cif).label("puntuacion"),
+            ).group_by(coincidencias_cif.c.solicitud_id)
+        )
+    union = union_all(*candidatos).subquery("candidatos")
+    ranking = (
+        select(union.c.solicitud_id, func.max(union.c.puntuacion).label("puntuacion"))
+        .group_by(union.c.solicitud_id)
+        .subquery("ranking")
+    )
+
+    return (
+        select(Solicitud)
+        .join(ranking, ranking.c.solicitud_id == Solicitud.id)
+        .order_by(ranking.c.puntuacion.desc(), Solicitud.creado_en.desc(), Solicitud.id.desc())
+        .limit(limite)
+    )
+
+
+async def buscar(
+    db: AsyncSession,
+    q: str,
+    limite: int = SEARCH_MAX_RESULTS,
+    comercial_id: Optional[UUID] = None,
+) -> List[Solicitud]:
+    """
+    Solicitudes que coinciden con ``q``, de más a menos relevante. Con
+    varias palabras, primero se consulta cuál es la más selectiva para
+    empezar por ella.
+    """
+    palabras = palabras_consulta(q)
+    cif = cif_consulta(q)
+    if cif in palabras:
+        cif = None
+    if not palabras and not cif:
+        return []
+
+    if len(palabras) > 1:
+        frecuencias = (await db.execute(consulta_frecuencias(palabras))).one()
+        palabras = [p for _, p in sorted(zip(frecuencias, palabras), key=lambda par: par[0])]
+
+    result = await db.execute(consulta_busqueda(palabras, cif, limite, comercial_id))
+    return list(result.scalars().all())
@@ -0,0 +1,265 @@
+"""
+Detección de clientes duplicados.
+
+Exactos: el CIF/NIF se compara normalizado (columna indexada
+cif_nif_normalizado), así que la comprobación es una búsqueda en el índice y
+no depende del número de solicitudes. Cuentan las solicitudes pendientes y
+completadas; una rechazada no impide volver a solicitar el alta.
+
+DUPLICATE_CIF_MODE decide qué hacer con un duplicado exacto:
+  * rechazar: 409 con el id de la solicitud existente (por defecto).
+  * avisar: se crea igualmente y la respuesta lo indica en duplicado_de.
+
+Aproximados: mismo código postal y nombre parecido ("Electrodomésticos
+Martínez S.L." y "ELECTRODOMESTICOS MARTINEZ SL"). Cada solicitud tiene
+claves de bloqueo (código postal + cuatro primeras letras de cada palabra
+del nombre) en solicitud_bloques, y el nombre solo se compara con las
+solicitudes que comparten alguna clave: un bloque crece con las
+solicitudes del mismo código postal y nombre parecido, no con la tabla.
+Al crear solo se avisa (posibles_duplicados); el informe por lotes
+(informe_duplicados.py) recorre los bloques con más de una solicitud.
+"""
+
+import json
+import os
+from difflib import SequenceMatcher
+from typing import AsyncIterator, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import stream_partitions
+from models import Solicitud, SolicitudBloque, EstadoSolicitud
+from normalizacion import normalizar_cif, normalizar_codigo_postal, tokenizar
+
+DUPLICATE_CIF_MODE = os.getenv("DUPLICATE_CIF_MODE", "rechazar").strip().lower()
+
+if DUPLICATE_CIF_MODE not in ("rechazar", "avisar"):
+    raise ValueError("DUPLICATE_CIF_MODE must be 'rechazar' or 'avisar'")
+
+# Similitud de nombres (0-1) a partir de la cual se considera posible duplicado
+DUPLICATE_NAME_THRESHOLD = float(os.getenv("DUPLICATE_NAME_THRESHOLD", "0.85"))
+# Solicitudes de un mismo bloque que se llegan a comparar al crear
+DUPLICATE_MAX_CANDIDATES = int(os.getenv("DUPLICATE_MAX_CANDIDATES", "200"))
+
+# Letras de cada palabra del nombre que forman la clave de bloqueo
+LONGITUD_PREFIJO_BLOQUE = 4
+LONGITUD_CLAVE = SolicitudBloque.clave.type.length
+
+
+async def buscar_duplicado_cif(db: AsyncSession, cif_nif: str):
+    """Solicitud vigente (id, estado) más reciente con el mismo CIF/NIF, o None."""
+    clave = normalizar_cif(cif_nif)[:32]
+    if not clave:
+        return None
+    result = await db.execute(
+        select(Solicitud.id, Solicitud.estado)
+        .where(
+            Solicitud.cif_nif_normalizado == clave,
+            Solicitud.estado != EstadoSolicitud.RECHAZADO,
+        )
+        .order_by(Solicitud.creado_en.desc())
+        .limit(1)
+    )
+    return result.first()
+
+
+async def comprobar_cif_duplicado(db: AsyncSession, cif_nif: str) -> Optional[str]:
+    """
+    Aplica DUPLICATE_CIF_MODE antes de crear una solicitud.
+
+    Raises:
+        HTTPException: 409 si ya existe una solicitud vigente para el CIF/NIF
+            y el modo es "rechazar"
+
+    Returns:
+        El id de la solicitud existente en modo "avisar", o None si no hay
+        duplicado
+    """
+    existente = await buscar_duplicado_cif(db, cif_nif)
+    if existente is None:
+        return None
+    if DUPLICATE_CIF_MODE == "rechazar":
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "mensaje": "Ya existe una solicitud para este CIF/NIF",
+                "solicitud_existente_id": str(existente.id),
+                "estado": existente.estado.value,
+            }
+        )
+    return str(existente.id)
+
+
+def claves_bloqueo(nombre, codigo_postal) -> Set[str]:
+    """Claves "46001:elec" del nombre y código postal de un cliente."""
+    cp = normalizar_codigo_postal(codigo_postal)
+    if not cp:
+        return set()
+    return {
+        f"{cp}:{palabra[:LONGITUD_PREFIJO_BLOQUE]}"[:LONGITUD_CLAVE]
+        for palabra in tokenizar(nombre)
+    }
+
+
+def claves_solicitud(datos_cliente: dict) -> Set[str]:
+    """Claves de bloqueo de un documento datos_cliente (formulario o datos de demo)."""
+    datos_cliente = datos_cliente or {}
+    codigo_postal = datos_cliente.get("codigoPostal") or datos_cliente.get("codigo_postal")
+    return claves_bloqueo(datos_cliente.get("nombre"), codigo_postal)
+
+
+def indexar_bloques(solicitud: Solicitud) -> None:
+    """Sustituye las claves de bloqueo por las de su datos_cliente actual."""
+    solicitud.bloques = [
+        SolicitudBloque(clave=clave) for clave in claves_solicitud(solicitud.datos_cliente)
+    ]
+
+
+def nombre_comparable(nombre) -> str:
+    """Palabras significativas del nombre, ordenadas: el orden no cuenta."""
+    return " ".join(sorted(tokenizar(nombre)))
+
+
+def similitud(nombre_a, nombre_b) -> float:
+    """Similitud (0-1) de dos nombres de cliente ya pasados por nombre_comparable."""
+    if not nombre_a or not nombre_b:
+        return 0.0
+    if nombre_a == nombre_b:
+        return 1.0
+    return SequenceMatcher(None, nombre_a, nombre_b).ratio()
+
+
+async def buscar_posibles_duplicados(
+    db: AsyncSession,
+    nombre: str,
+    codigo_postal: str,
+    umbral: float = DUPLICATE_NAME_THRESHOLD,
+) -> List[dict]:
+    """
+    Solicitudes vigentes con el mismo código postal y un nombre parecido,
+    de más a menos parecida. Solo se compara con las que comparten alguna
+    clave de bloqueo (como mucho DUPLICATE_MAX_CANDIDATES).
+    """
+    claves = claves_bloqueo(nombre, codigo_postal)
+    if not claves:
+        return []
+    candidatos = (
+        select(SolicitudBloque.solicitud_id)
+        .where(SolicitudBloque.clave.in_(sorted(claves)))
+        .distinct()
+        .limit(DUPLICATE_MAX_CANDIDATES)
+        .subquery()
+    )
+    result = await db.execute(
+        select(Solicitud.id, Solicitud.cliente_nombre, Solicitud.estado)
+        .join(candidatos, candidatos.c.solicitud_id == Solicitud.id)
+        .where(Solicitud.estado != EstadoSolicitud.RECHAZADO)
+    )
+    comparable = nombre_comparable(nombre)
+    posibles = []
+    for fila in result.all():
+        valor = similitud(comparable, nombre_comparable(fila.cliente_nombre))
+        if valor >= umbral:
+            posibles.append({
+                "id": str(fila.id),
+                "nombre": fila.cliente_nombre,
+                "estado": fila.estado.value,
+                "similitud": round(valor, 3),
+            })
+    posibles.sort(key=lambda posible: posible["similitud"], reverse=True)
+    return posibles
+
+
+def consulta_bloques_repetidos():
+    """Miembros de los bloques con más de una solicitud vigente, agrupados por clave."""
+    repetidas = (
+        select(SolicitudBloque.clave)
+        .group_by(SolicitudBloque.clave)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    return (
+        select(
+            SolicitudBloque.clave,
+            Solicitud.id,
+            Solicitud.cliente_nombre,
+            Solicitud.cif_nif_normalizado,
+            Solicitud.estado,
+        )
+        .join(repetidas, repetidas.c.clave == SolicitudBloque.clave)
+        .join(Solicitud, Solicitud.id == SolicitudBloque.solicitud_id)
+        .where(Solicitud.estado != EstadoSolicitud.RECHAZADO)
+        .order_by(SolicitudBloque.clave, Solicitud.id)
+    )
+
+
+def _pares_del_bloque(clave: str, miembros: List, umbral: float) -> List[dict]:
+    """
+    Pares parecidos de un bloque. Un par que comparte varias claves se
+    informa solo en el bloque de la menor de ellas: las claves se recalculan
+    a partir del nombre y del código postal de la propia clave, así que no
+    hace falta recordar los pares de otros bloques.
+    """
+    pares = []
+    if len(miembros) < 2:
+        return pares
+    codigo_postal = clave.split(":", 1)[0]
+    comparables = [nombre_comparable(m.cliente_nombre) for m in miembros]
+    claves = [claves_bloqueo(m.cliente_nombre, codigo_postal) for m in miembros]
+    for i, a in enumerate(miembros):
+        for j in range(i + 1, len(miembros)):
+            b = miembros[j]
+            compartidas = claves[i] & claves[j]
+            if compartidas and min(compartidas) != clave:
+                continue
+            valor = similitud(comparables[i], comparables[j])
+            if valor >= umbral:
+                pares.append({
+                    "solicitud_a": str(a.id),
+                    "nombre_a": a.cliente_nombre,
+                    "solicitud_b": str(b.id),
+                    "nombre_b": b.cliente_nombre,
+                    "similitud": round(valor, 3),
+                    "mismo_cif": bool(a.cif_nif_normalizado)
+                    and a.cif_nif_normalizado == b.cif_nif_normalizado,
+                })
+    return pares
+
+
+async def informe_duplicados(
+    umbral: float = DUPLICATE_NAME_THRESHOLD,
+    tamano_lote: int = 1000,
+) -> AsyncIterator[dict]:
+    """
+    Pares de solicitudes vigentes que parecen el mismo cliente. Recorre en
+    streaming los bloques con más de una solicitud y compara solo dentro
+    de cada bloque; en memoria solo está el bloque actual, y cada par se
+    informa una vez aunque compartan varias claves.
+    """
+    clave_actual, miembros = None, []
+    async for filas in stream_partitions(consulta_bloques_repetidos(), tamano_lote):
+        for fila in filas:
+            if fila.clave != clave_actual:
+                for par in _pares_del_bloque(clave_actual, miembros, umbral):
+                    yield par
+                clave_actual, miembros = fila.clave, []
+            miembros.append(fila)
+    for par in _pares_del_bloque(clave_actual, miembros, umbral):
+        yield par
+
+
+async def exportar_informe_duplicados(
+    umbral: float = DUPLICATE_NAME_THRESHOLD,
+    pares_por_trozo: int = 500,
+) -> AsyncIterator[str]:
+    """informe_duplicados en NDJSON, agrupando pares_por_trozo líneas por trozo."""
+    pares = []
+    async for par in informe_duplicados(umbral):
+        pares.append(json.dumps(par, ensure_ascii=False) + "\n")
+        if len(pares) >= pares_por_trozo:
+            yield "".join(pares)
+            pares = []
+    if pares:
+        yield "".join(pares)
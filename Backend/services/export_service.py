@@ -0,0 +1,123 @@
+"""
+Exportación de solicitudes en CSV o NDJSON.
+
+Las filas se leen con un cursor del lado del servidor en bloques de
+EXPORT_CHUNK_SIZE (database.stream_partitions) y cada bloque se serializa y
+se envía antes de leer el siguiente, así que la memoria usada no depende del
+número de solicitudes exportadas.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from database import stream_partitions
+from models import Solicitud, EstadoSolicitud, User
+from schemas import SolicitudCreate
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# datos_cliente se aplana en columnas fijas: los campos del formulario y los
+# añadidos durante la aprobación. Las claves desconocidas no se exportan.
+CAMPOS_CLIENTE = [campo for campo in SolicitudCreate.model_fields if campo != "documentos"]
+CAMPOS_APROBACION = ["marcas_aprobadas", "tarifa_aprobada", "termino_pago"]
+ROLES_NOTAS = ["director", "pedidos", "admin"]
+
+COLUMNAS = (
+    ["id", "estado", "comercial_email", "creado_en", "actualizado_en",
+     "aprobado_director", "aprobado_pedidos", "aprobado_admin"]
+    + CAMPOS_CLIENTE
+    + ["documentos"]
+    + CAMPOS_APROBACION
+    + [f"notas_{rol}" for rol in ROLES_NOTAS]
+)
+
+
+def consulta_exportacion(
+    estado: Optional[EstadoSolicitud] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    comercial_email: Optional[str] = None,
+):
+    """Solo las columnas necesarias, en orden de creación."""
+    query = (
+        select(
+            Solicitud.id,
+            Solicitud.estado,
+            User.email.label("comercial_email"),
+            Solicitud.creado_en,
+            Solicitud.actualizado_en,
+            Solicitud.aprobado_director,
+            Solicitud.aprobado_pedidos,
+            Solicitud.aprobado_admin,
+            Solicitud.datos_cliente,
+            Solicitud.notas,
+        )
+        .outerjoin(User, User.id == Solicitud.comercial_id)
+        .order_by(Solicitud.creado_en, Solicitud.id)
+    )
+    if estado is not None:
+        query = query.where(Solicitud.estado == estado)
+    if desde is not None:
+        query = query.where(Solicitud.creado_en >= desde)
+    if hasta is not None:
+        query = query.where(Solicitud.creado_en < hasta)
+    if comercial_email:
+        query = query.where(User.email == comercial_email)
+    return query
+
+
+def _valor_plano(valor):
+    if isinstance(valor, list):
+        return "|".join(str(v) for v in valor)
+    if isinstance(valor, dict):
+        return json.dumps(valor, ensure_ascii=False) if valor else None
+    return valor
+
+
+def aplanar(fila) -> dict:
+    """Convierte una fila en un diccionario con las columnas de COLUMNAS."""
+    datos = fila.datos_cliente or {}
+    notas = fila.notas or {}
+    registro = {
+        "id": str(fila.id),
+        "estado": fila.estado.value,
+        "comercial_email": fila.comercial_email,
+        "creado_en": fila.creado_en.isoformat() if fila.creado_en else None,
+        "actualizado_en": fila.actualizado_en.isoformat() if fila.actualizado_en else None,
+        "aprobado_director": bool(fila.aprobado_director),
+        "aprobado_pedidos": bool(fila.aprobado_pedidos),
+        "aprobado_admin": bool(fila.aprobado_admin),
+    }
+    for campo in CAMPOS_CLIENTE + ["documentos"] + CAMPOS_APROBACION:
+        registro[campo] = _valor_plano(datos.get(campo))
+    for rol in ROLES_NOTAS:
+        registro[f"notas_{rol}"] = notas.get(rol)
+    return registro
+
+
+async def exportar_csv(query, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    # BOM para que Excel detecte UTF-8 (acentos en nombres y direcciones)
+    buffer.write("\ufeff")
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNAS, extrasaction="ignore")
+    writer.writeheader()
+    async for filas in stream_partitions(query, chunk_size):
+        writer.writerows(aplanar(fila) for fila in filas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def exportar_ndjson(query, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[str]:
+    async for filas in stream_partitions(query, chunk_size):
+        yield "".join(
+            json.dumps(aplanar(fila), ensure_ascii=False) + "\n" for fila in filas
+        )
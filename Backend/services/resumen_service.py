@@ -0,0 +1,149 @@
+"""
+Resumen de solicitudes para el dashboard.
+
+Los conteos se calculan en la base de datos con un único GROUP BY estado.
+Opcionalmente (RESUMEN_CACHE_TTL_SECONDS > 0) se guardan en memoria por
+comercial y globales; cada transición de estado ajusta los conteos ya
+guardados en este worker, y el TTL acota el desfase respecto a los cambios
+hechos por otros workers.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from models import Solicitud, EstadoSolicitud, ESTADO_PENDIENTE_POR_ROL
+
+RESUMEN_CACHE_TTL_SECONDS = float(os.getenv("RESUMEN_CACHE_TTL_SECONDS", "0"))
+
+ESTADOS_PENDIENTES = (
+    EstadoSolicitud.PENDIENTE_DIRECTOR,
+    EstadoSolicitud.PENDIENTE_PEDIDOS,
+    EstadoSolicitud.PENDIENTE_ADMIN,
+)
+
+Conteos = Dict[EstadoSolicitud, int]
+
+
+class ContadoresCache:
+    """Conteos por estado con TTL; clave = id del comercial o GLOBAL."""
+
+    GLOBAL = "global"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entradas: Dict[object, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = metrics.Counter()
+        self.misses = metrics.Counter()
+
+    @property
+    def activa(self) -> bool:
+        return self.ttl > 0
+
+    def obtener(self, clave) -> Optional[Conteos]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                self._entradas.pop(clave, None)
+                self.misses.inc()
+                return None
+            self.hits.inc()
+            return dict(entrada[1])
+
+    def guardar(self, clave, conteos: Conteos) -> None:
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl, dict(conteos))
+
+    def aplicar_transicion(
+        self,
+        comercial_id: UUID,
+        anterior: Optional[EstadoSolicitud],
+        nuevo: Optional[EstadoSolicitud],
+    ) -> None:
+        """Ajusta los conteos guardados tras crear, mover o eliminar una solicitud."""
+        with self._lock:
+            for clave in (comercial_id, self.GLOBAL):
+                entrada = self._entradas.get(clave)
+                if entrada is None:
+                    continue
+                conteos = entrada[1]
+                if anterior is not None:
+                    conteos[anterior] = max(0, conteos.get(anterior, 0) - 1)
+                if nuevo is not None:
+                    conteos[nuevo] = conteos.get(nuevo, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+contadores_cache = ContadoresCache(RESUMEN_CACHE_TTL_SECONDS)
+
+metrics.register("resumen_cache", lambda: {
+    "enabled": contadores_cache.activa,
+    "entries": len(contadores_cache._entradas),
+    "hits": contadores_cache.hits.value,
+    "misses": contadores_cache.misses.value,
+})
+
+
+def registrar_transicion(
+    comercial_id: UUID,
+    anterior: Optional[EstadoSolicitud],
+    nuevo: Optional[EstadoSolicitud],
+) -> None:
+    """Llamar tras confirmar (commit) un cambio de estado de una solicitud."""
+    if contadores_cache.activa:
+        contadores_cache.aplicar_transicion(comercial_id, anterior, nuevo)
+
+
+async def contar_por_estado(db: AsyncSession, comercial_id: Optional[UUID] = None) -> Conteos:
+    """Conteo de solicitudes por estado, de un comercial o de todas."""
+    clave = comercial_id if comercial_id is not None else ContadoresCache.GLOBAL
+    if contadores_cache.activa:
+        conteos = contadores_cache.obtener(clave)
+        if conteos is not None:
+            return conteos
+
+    query = select(Solicitud.estado, func.count()).group_by(Solicitud.estado)
+    if comercial_id is not None:
+        query = query.where(Solicitud.comercial_id == comercial_id)
+    result = await db.execute(query)
+    conteos = {estado: total for estado, total in result.all()}
+
+    if contadores_cache.activa:
+        contadores_cache.guardar(clave, conteos)
+    return conteos
+
+
+def resumen_desde_conteos(conteos: Conteos) -> dict:
+    return {
+        "pendientes": sum(conteos.get(estado, 0) for estado in ESTADOS_PENDIENTES),
+        "completadas": conteos.get(EstadoSolicitud.COMPLETADO, 0),
+        "rechazadas": conteos.get(EstadoSolicitud.RECHAZADO, 0),
+    }
+
+
+async def obtener_resumen(db: AsyncSession, comercial_id: UUID, rol: str) -> dict:
+    """
+    Resumen de las solicitudes propias y, para director/pedidos/admin, de la
+    cola global: conteo por estado y pendientes del propio rol.
+    """
+    resumen = resumen_desde_conteos(await contar_por_estado(db, comercial_id))
+
+    estado_rol = ESTADO_PENDIENTE_POR_ROL.get(rol)
+    if estado_rol is not None:
+        globales = await contar_por_estado(db)
+        resumen["pendientes_rol"] = globales.get(estado_rol, 0)
+        resumen["global"] = {
+            **resumen_desde_conteos(globales),
+            "por_estado": {estado.value: globales.get(estado, 0) for estado in EstadoSolicitud},
+        }
+    return resumen
@@ -1,81 +1,189 @@
-from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List
 from uuid import UUID
-from datetime import datetime
-from models import Solicitud, SolicitudArchivada
+
 from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Solicitud, SolicitudArchivada, EstadoSolicitud, User
+from services.resumen_service import registrar_transicion
+
+logger = logging.getLogger(__name__)
+
+# Antigüedad (desde la última modificación) a partir de la cual se archiva
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Solicitudes movidas por transacción
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Lotes que puede pedir una petición HTTP (sin límite solo desde
+# archivar_solicitudes.py, pensado para cron)
+ARCHIVE_MAX_BATCHES_PER_REQUEST = 50
+
+ESTADOS_FINALES = (EstadoSolicitud.COMPLETADO, EstadoSolicitud.RECHAZADO)
+
 
 class SolicitudService:
-    def __init__(self, db = AsyncSession):
+    def __init__(self, db: AsyncSession):
         self.db = db
-    
-    async def archivar_solicitud(self, solicitud_id = UUID):
+
+    @staticmethod
+    def _archivada_desde(solicitud: Solicitud, comercial_email: str) -> SolicitudArchivada:
+        """Construye el registro archivado conservando el documento completo."""
+        datos_cliente = dict(solicitud.datos_cliente or {})
+        notas = dict(solicitud.notas or {})
+        completada = solicitud.estado == EstadoSolicitud.COMPLETADO
+        return SolicitudArchivada(
+            solicitud_original_id=solicitud.id,
+            resumen={
+                'cliente': {
+                    'nombre': solicitud.cliente_nombre,
+                    'cif_nif': solicitud.cif_nif,
+                    'tipo_carga': solicitud.tipo_carga,
+                    'metodo_pago': solicitud.metodo_pago,
+                },
+                'proceso': {
+                    'director': notas.get('director'),
+                    'pedidos': notas.get('pedidos'),
+                    'admin': notas.get('admin'),
+                    'aprobado_director': bool(solicitud.aprobado_director),
+                    'aprobado_pedidos': bool(solicitud.aprobado_pedidos),
+                    'aprobado_admin': bool(solicitud.aprobado_admin),
+                },
+                'comercial_id': str(solicitud.comercial_id),
+                'datos_cliente': datos_cliente,
+                'notas': notas,
+            },
+            estado=solicitud.estado.value,
+            fecha_creacion=solicitud.creado_en,
+            # Solo se registra la fecha de la última transición: en una
+            # solicitud completada es la aprobación de administración.
+            fecha_aprobacion_admin=solicitud.actualizado_en if completada else None,
+            comercial_email=comercial_email or '',
+            cliente_nombre=solicitud.cliente_nombre or '',
+        )
+
+    async def _archivar(self, filas: List) -> int:
+        """Inserta las archivadas y borra las originales en la transacción actual."""
+        self.db.add_all([self._archivada_desde(solicitud, email) for solicitud, email in filas])
+        # Se capturan antes del commit, que expira los objetos cargados
+        transiciones = [(solicitud.comercial_id, solicitud.estado) for solicitud, _ in filas]
+        await self.db.execute(
+            delete(Solicitud)
+            .where(Solicitud.id.in_([solicitud.id for solicitud, _ in filas]))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        for comercial_id, estado in transiciones:
+            registrar_transicion(comercial_id, estado, None)
+        return len(filas)
+
+    async def archivar_solicitud(self, solicitud_id: UUID) -> SolicitudArchivada:
         """
-        Archiva una solicitud completada y la elimina de la tabla activa.
-        
+        Archiva una solicitud finalizada y la elimina de la tabla activa.
+
         Args:
             solicitud_id: UUID de la solicitud a archivar
-            
+
         Raises:
-            HTTPException: Si la solicitud no existe o no está lista para archivar
-            
+            HTTPException: Si la solicitud no existe o no está finalizada
+
         Returns:
             SolicitudArchivada: El registro archivado de la solicitud
         """
         try:
-            # Buscamos la solicitud original
-            solicitud = await self.db.get(Solicitud, solicitud_id)
+            result = await self.db.execute(
+                select(Solicitud, User.email)
+                .outerjoin(User, User.id == Solicitud.comercial_id)
+                .where(Solicitud.id == solicitud_id)
+            )
+            fila = result.first()
 
-            # Verificamos que la solicitud existe y está lista para archivar
-            if not solicitud:
+            if not fila:
                 raise HTTPException(
-                    status_code = 404,
-                    detail = f'solicitud no encontrada'
+                    status_code=404,
+                    detail='Solicitud no encontrada'
                 )
-            
-            if not all([
-                solicitud.aprobado_director,
-                solicitud.aprobado_pedidos,
-                solicitud.aprobado_admin,
-            ]):
+
+            if fila[0].estado not in ESTADOS_FINALES:
                 raise HTTPException(
-                    status_code = 400,
-                    detail = f'La solicitud no está lista para archivar'
+                    status_code=400,
+                    detail='La solicitud no está lista para archivar'
                 )
-            
-           # Creamos el registro archivado con el campo metodo_pago y fechas corregidas
-            solicitud_archivada = SolicitudArchivada(
-                solicitud_original_id = solicitud.id,
-                resumen = {
-                    'cliente': {
-                        'nombre': solicitud.datos_cliente.get('nombre'),
-                        'cif_nif': solicitud.datos_cliente.get('cif_nif'),
-                        'tipo_carga': solicitud.datos_cliente.get('tipo_carga'),
-                        'metodo_pago': solicitud.datos_cliente.get('metodo_pago'),
-                    },
-                    'proceso': {
-                        'director': solicitud.notas.get('director'),
-                        'pedidos': solicitud.notas.get('pedidos'),
-                        'admin': solicitud.notas.get('admin'),
-                    }
-                },
-                fecha_creacion = solicitud.creado_en,
-                fecha_aprobacion_director = solicitud.fecha_aprobacion.get('director') if solicitud.fecha_aprobacion else None,
-                fecha_aprobacion_pedidos = solicitud.fecha_aprobacion.get('pedidos') if solicitud.fecha_aprobacion else None,
-                fecha_aprobacion_admin = solicitud.fecha_aprobacion.get('admin') if solicitud.fecha_aprobacion else None,
-                comercial_email = solicitud.comercial.email,
-                cliente_nombre = solicitud.datos_cliente.get('nombre')    
-            )
 
-            # Guardamos el archivo y eliminamos la solicitud original
-            self.db.add(solicitud_archivada)
+            solicitud = fila[0]
+            comercial_id, estado = solicitud.comercial_id, solicitud.estado
+            archivada = self._archivada_desde(*fila)
+            self.db.add(archivada)
             await self.db.delete(solicitud)
             await self.db.commit()
+            await self.db.refresh(archivada)
+            registrar_transicion(comercial_id, estado, None)
+            return archivada
 
-            return solicitud_archivada
-
+        except HTTPException:
+            await self.db.rollback()
+            raise
         except Exception as e:
             await self.db.rollback()
+            logger.error(f"Error al archivar la solicitud {solicitud_id}: {e}")
             raise HTTPException(
-                status_code = 500,
-                detail = f'Error al archivar la solicitud: {str(e)}'
-            )
\ No newline at end of file
+                status_code=500,
+                detail='Error al archivar la solicitud'
+            )
+
+    async def archivar_lote(
+        self,
+        antiguedad_dias: int = ARCHIVE_AFTER_DAYS,
+        tamano_lote: int = ARCHIVE_BATCH_SIZE,
+        max_lotes: int = 0,
+    ) -> int:
+        """
+        Mueve a solicitudes_archivadas las solicitudes COMPLETADO/RECHAZADO
+        cuya última modificación es anterior a ``antiguedad_dias``.
+
+        Cada lote de ``tamano_lote`` filas se copia y se borra en su propia
+        transacción, de modo que los bloqueos y el log de transacciones se
+        mantienen acotados. Las filas se bloquean con FOR UPDATE SKIP LOCKED
+        (en SQL Server, WITH (UPDLOCK, READPAST, ROWLOCK)) hasta el commit del
+        lote, para que varios archivadores no se pisen. ``max_lotes``
+        limita el trabajo de una ejecución (0 = sin límite).
+
+        Returns:
+            Número de solicitudes archivadas
+        """
+        limite = datetime.now(timezone.utc) - timedelta(days=antiguedad_dias)
+        total = 0
+        lotes = 0
+        while not max_lotes or lotes < max_lotes:
+            result = await self.db.execute(
+                select(Solicitud, User.email)
+                .outerjoin(User, User.id == Solicitud.comercial_id)
+                .where(
+                    Solicitud.estado.in_(ESTADOS_FINALES),
+                    or_(
+                        Solicitud.actualizado_en < limite,
+                        and_(Solicitud.actualizado_en.is_(None), Solicitud.creado_en < limite),
+                    ),
+                )
+                .order_by(Solicitud.creado_en, Solicitud.id)
+                .limit(tamano_lote)
+                .with_for_update(of=Solicitud, skip_locked=True)
+                # El dialecto mssql ignora with_for_update: el equivalente es una pista de tabla
+                .with_hint(Solicitud, "WITH (UPDLOCK, READPAST, ROWLOCK)", "mssql")
+            )
+            filas = result.all()
+            if not filas:
+                await self.db.rollback()
+                break
+            try:
+                total += await self._archivar(filas)
+            except Exception:
+                await self.db.rollback()
+                raise
+            lotes += 1
+            logger.info("Lote de archivado %d: %d solicitudes", lotes, len(filas))
+            if len(filas) < tamano_lote:
+                break
+        return total
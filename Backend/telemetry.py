@@ -0,0 +1,25 @@
+"""
+Optional Application Insights log export.
+
+The opencensus exporter is imported only when
+``APPLICATIONINSIGHTS_CONNECTION_STRING`` is set, so workers that do not use
+Application Insights never pay for loading it.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def configure_telemetry() -> bool:
+    """Attach the Azure log handler if configured; return True when enabled."""
+    connection_string = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING", "").strip()
+    if not connection_string:
+        return False
+
+    from opencensus.ext.azure.log_exporter import AzureLogHandler
+
+    logging.getLogger().addHandler(AzureLogHandler(connection_string=connection_string))
+    logger.info("Application Insights log export enabled")
+    return True
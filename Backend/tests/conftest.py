@@ -0,0 +1,27 @@
+"""
+Shared fixtures: a throwaway SQLite database (aiosqlite) per test, with the
+schema created from the models. DATABASE_URL is never used, so the tests
+can run anywhere.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Base  # noqa: E402
+import models  # noqa: E402,F401  (registers the tables on Base.metadata)
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
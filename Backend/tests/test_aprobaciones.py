@@ -0,0 +1,99 @@
+"""
+Concurrent approvals (services.aprobacion_service): the compare-and-set
+UPDATE must let exactly one of several racing transitions through. Same
+races as benchmark_aprobaciones.py, on a throwaway database.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+from models import Solicitud, EstadoSolicitud
+from services.aprobacion_service import aprobar_rechazar, aprobar_rechazar_lote
+
+APROBACION_DIRECTOR = {"aprobar": True, "marcas": ["TEST"], "tarifa": "T1", "notas": "test"}
+
+PARALELAS = 10
+
+
+async def crear_solicitudes(session_factory, cantidad: int) -> list:
+    ids = [uuid.uuid4() for _ in range(cantidad)]
+    async with session_factory() as session:
+        await session.execute(insert(Solicitud), [{
+            "id": solicitud_id,
+            "comercial_id": uuid.uuid4(),
+            "datos_cliente": {"nombre": "Aprobaciones concurrentes SL"},
+            "estado": EstadoSolicitud.PENDIENTE_DIRECTOR,
+            "notas": {},
+        } for solicitud_id in ids])
+        await session.commit()
+    return ids
+
+
+async def estado_final(session_factory, solicitud_id):
+    async with session_factory() as session:
+        return (await session.execute(
+            select(Solicitud.estado, Solicitud.version, Solicitud.datos_cliente)
+            .where(Solicitud.id == solicitud_id)
+        )).first()
+
+
+@pytest.mark.asyncio
+async def test_aprobaciones_simultaneas_solo_una_gana(session_factory):
+    solicitud_id, = await crear_solicitudes(session_factory, 1)
+    inicio = asyncio.Event()
+
+    async def aprobar():
+        async with session_factory() as session:
+            await inicio.wait()
+            try:
+                await aprobar_rechazar(session, solicitud_id, "director", dict(APROBACION_DIRECTOR))
+                return 200
+            except HTTPException as exc:
+                return exc.status_code
+
+    tareas = [asyncio.create_task(aprobar()) for _ in range(PARALELAS)]
+    await asyncio.sleep(0.05)
+    inicio.set()
+    codigos = await asyncio.gather(*tareas)
+
+    assert sorted(codigos) == [200] + [409] * (PARALELAS - 1)
+    final = await estado_final(session_factory, solicitud_id)
+    assert final.estado == EstadoSolicitud.PENDIENTE_PEDIDOS
+    assert final.version == 2
+    assert final.datos_cliente["tarifa_aprobada"] == "T1"
+
+
+@pytest.mark.asyncio
+async def test_lotes_simultaneos_aprueban_cada_solicitud_una_vez(session_factory):
+    ids = await crear_solicitudes(session_factory, 20)
+    inicio = asyncio.Event()
+
+    async def aprobar_lote():
+        async with session_factory() as session:
+            await inicio.wait()
+            return await aprobar_rechazar_lote(session, ids, "director", dict(APROBACION_DIRECTOR))
+
+    tareas = [asyncio.create_task(aprobar_lote()) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    inicio.set()
+    primero, segundo = await asyncio.gather(*tareas)
+
+    for a, b in zip(primero, segundo):
+        assert a["id"] == b["id"]
+        assert sorted((a["status_code"], b["status_code"])) == [200, 409]
+    for solicitud_id in ids:
+        final = await estado_final(session_factory, solicitud_id)
+        assert final.estado == EstadoSolicitud.PENDIENTE_PEDIDOS
+        assert final.version == 2
+
+
+@pytest.mark.asyncio
+async def test_solicitud_inexistente_da_404(session_factory):
+    async with session_factory() as session:
+        with pytest.raises(HTTPException) as exc:
+            await aprobar_rechazar(session, uuid.uuid4(), "director", dict(APROBACION_DIRECTOR))
+    assert exc.value.status_code == 404
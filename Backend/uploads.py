@@ -0,0 +1,176 @@
+"""
+Document uploads with bounded size and memory.
+
+* ``UploadSizeLimitMiddleware`` (pure ASGI) rejects multipart requests
+  larger than ``UPLOAD_MAX_BYTES`` (plus a small allowance for the other
+  form fields) with 413 before the body is parsed: upfront from
+  ``Content-Length``, and otherwise with a running count of the bytes
+  received, which also covers chunked requests.
+* ``guardar_documento`` copies an ``UploadFile`` to ``UPLOAD_DIR`` in
+  ``UPLOAD_CHUNK_SIZE`` chunks, with file I/O in the thread pool so the
+  event loop never blocks on disk. The extension and the magic bytes of the
+  first chunk must match a PDF or Word document. A running byte counter
+  applies the size limit again per file. A partial file is deleted when
+  the copy fails.
+
+Starlette's form parser spools each file to a temporary file past 1 MB, so
+an upload never holds more than that plus one chunk in memory.
+"""
+
+import logging
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("uploads/documents")
+UPLOAD_URL_PREFIX = "/uploads/documents"
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# Room for the multipart boundaries and the other form fields of a request
+# (crear_solicitud sends the client data together with the file)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Allowed extensions and the signatures their content must start with
+FIRMAS_DOCUMENTO = {
+    "pdf": (b"%PDF-",),
+    "doc": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),  # OLE2 (Word 97-2003)
+    "docx": (b"PK\x03\x04",),  # ZIP (Office Open XML)
+}
+
+rechazadas_tamano = metrics.Counter()
+rechazadas_tipo = metrics.Counter()
+subidas = metrics.Counter()
+bytes_subidos = metrics.Counter()
+
+metrics.register("uploads", lambda: {
+    "max_bytes": UPLOAD_MAX_BYTES,
+    "stored": subidas.value,
+    "stored_bytes": bytes_subidos.value,
+    "rejected_size": rechazadas_tamano.value,
+    "rejected_type": rechazadas_tipo.value,
+})
+
+
+class UploadTooLargeError(HTTPException):
+    """Upload over UPLOAD_MAX_BYTES (413)."""
+
+    def __init__(self):
+        rechazadas_tamano.inc()
+        super().__init__(
+            status_code=413,
+            detail=f"El archivo supera el tamaño máximo permitido ({UPLOAD_MAX_BYTES // (1024 * 1024)} MB)",
+        )
+
+
+def error_tipo_no_permitido() -> HTTPException:
+    rechazadas_tipo.inc()
+    return HTTPException(
+        status_code=400,
+        detail="Tipo de archivo no permitido. Solo se permiten PDF y documentos Word."
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized multipart bodies before they are parsed."""
+
+    def __init__(self, app, max_body_bytes: int = UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    @staticmethod
+    def _header(scope, name: bytes) -> bytes:
+        for key, value in scope.get("headers", ()):
+            if key == name:
+                return value
+        return b""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._header(scope, b"content-type").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = self._header(scope, b"content-length")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            error = UploadTooLargeError()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise UploadTooLargeError()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLargeError as error:
+            # Raised while reading the body outside FastAPI's body parsing
+            if response_started:
+                raise
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+
+
+async def guardar_documento(upload: UploadFile) -> str:
+    """
+    Guarda un documento subido (PDF o Word) en UPLOAD_DIR por trozos.
+
+    Raises:
+        HTTPException: 400 si la extensión o el contenido no son de un
+            documento permitido, 413 si supera UPLOAD_MAX_BYTES
+
+    Returns:
+        URL pública del archivo guardado
+    """
+    extension = (upload.filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in FIRMAS_DOCUMENTO:
+        raise error_tipo_no_permitido()
+
+    primer_trozo = await upload.read(UPLOAD_CHUNK_SIZE)
+    if not primer_trozo.startswith(FIRMAS_DOCUMENTO[extension]):
+        raise error_tipo_no_permitido()
+
+    file_name = f"{uuid.uuid4()}.{extension}"
+    file_path = UPLOAD_DIR / file_name
+    buffer = await run_in_threadpool(open, file_path, "wb")
+    total = 0
+    try:
+        trozo = primer_trozo
+        while trozo:
+            total += len(trozo)
+            if total > UPLOAD_MAX_BYTES:
+                raise UploadTooLargeError()
+            await run_in_threadpool(buffer.write, trozo)
+            trozo = await upload.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(file_path.unlink, True)
+        raise
+    await run_in_threadpool(buffer.close)
+
+    subidas.inc()
+    bytes_subidos.inc(total)
+    logger.info(f"Documento guardado: {file_name} ({total} bytes)")
+    return f"{UPLOAD_URL_PREFIX}/{file_name}"
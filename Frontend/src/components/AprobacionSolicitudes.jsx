@@ -19,6 +19,7 @@ import { Label } from './ui/label';
 import { Checkbox } from './ui/checkbox';
 import { Badge } from './ui/badge';
 import { API_BASE_URL } from '../config';
+import { clienteAPI } from '../services/api';
 import { getUserRole } from '../utils/auth';
 
 // Selector de marcas
@@ -229,22 +230,11 @@ const AprobacionSolicitudes = () => {
         }
 
         try {
-            const response = await fetch(
-                `${API_BASE_URL}/api/solicitudes/pendientes/${userRole}`,
-                {
-                    headers: {
-                        'Authorization': `Bearer ${localStorage.getItem('token')}`
-                    }
-                }
-            );
-            if (!response.ok) {
-                const errorText = await response.text();
-                throw new Error(`Error al cargar solicitudes pendientes: ${errorText}`);
-            }
-            const data = await response.json();
-            setSolicitudes(data || []);
+            const response = await clienteAPI.obtenerSolicitudesPendientes(userRole);
+            setSolicitudes(response.data || []);
         } catch (error) {
-            setError(error.message);
+            const detalle = error.response?.data?.detail || error.message;
+            setError(`Error al cargar solicitudes pendientes: ${detalle}`);
         } finally {
             setLoading(false);
         }
@@ -306,18 +296,15 @@ const AprobacionSolicitudes = () => {
                 datosAprobacion.termino_pago = selectedTerminoPago;
             }
 
-            const response = await fetch(`${API_BASE_URL}/api/solicitudes/${selectedSolicitud}/aprobar`, {
-                method: 'PUT',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                },
-                body: JSON.stringify(datosAprobacion)
-            });
-
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.detail || 'Error al procesar la solicitud');
+            try {
+                await clienteAPI.aprobarRechazarSolicitud(selectedSolicitud, datosAprobacion);
+            } catch (error) {
+                if (error.response?.status === 409) {
+                    // Otro usuario la ha procesado antes: se recarga la cola
+                    await fetchSolicitudes();
+                    setDialogOpen(false);
+                }
+                throw new Error(error.response?.data?.detail || 'Error al procesar la solicitud');
             }
 
             await fetchSolicitudes();
@@ -1,7 +1,6 @@
 import React, { useState } from 'react';
 import { clienteAPI } from '../services/api';
 import { useNavigate } from 'react-router-dom';
-import { API_BASE_URL } from '../config';
 
 const ClienteForm = () => {
     const [formData, setFormData] = useState({
@@ -103,25 +102,39 @@ const ClienteForm = () => {
         }
     
         try {
-            // Usamos fetch directamente para tener más control
-            const response = await fetch(`${API_BASE_URL}/api/solicitudes/`, {
-                method: 'POST',
-                headers: {
-                    // No añadir 'Content-Type' - el navegador lo hará automáticamente con el límite correcto
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                },
-                body: formDataToSend
-            });
-    
-            // Si hay error, intentamos obtener el mensaje
-            if (!response.ok) {
-                const errorData = await response.json().catch(() => ({}));
-                throw new Error(errorData.detail || `Error ${response.status}: ${response.statusText}`);
+            let nuevaSolicitud;
+            try {
+                // axiosInstance quita el Content-Type con FormData para que se
+                // envíe con el límite correcto, y renueva el token si caduca
+                const response = await clienteAPI.crearSolicitud(formDataToSend);
+                nuevaSolicitud = response.data;
+            } catch (error) {
+                if (!error.response) {
+                    throw error;
+                }
+                const errorData = error.response.data || {};
+                // 409: ya hay una solicitud vigente para el CIF/NIF
+                if (errorData.detail && errorData.detail.solicitud_existente_id) {
+                    throw new Error(
+                        `${errorData.detail.mensaje} (solicitud ${errorData.detail.solicitud_existente_id}, ${errorData.detail.estado})`
+                    );
+                }
+                throw new Error(errorData.detail || `Error ${error.response.status}: ${error.response.statusText}`);
             }
-
-            await response.json();
             
-            alert('Solicitud creada con éxito');
+            const avisos = [];
+            if (nuevaSolicitud.duplicado_de) {
+                avisos.push(`ya existía una solicitud para este CIF/NIF (${nuevaSolicitud.duplicado_de})`);
+            }
+            if (nuevaSolicitud.posibles_duplicados && nuevaSolicitud.posibles_duplicados.length > 0) {
+                const nombres = nuevaSolicitud.posibles_duplicados.map((d) => d.nombre).join(', ');
+                avisos.push(`hay clientes parecidos en el mismo código postal: ${nombres}`);
+            }
+            if (avisos.length > 0) {
+                alert(`Solicitud creada con éxito. Aviso: ${avisos.join('; ')}`);
+            } else {
+                alert('Solicitud creada con éxito');
+            }
             navigate('/dashboard');
         } catch (err) {
             setError(err.message || 'Error al crear la solicitud');
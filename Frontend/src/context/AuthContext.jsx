@@ -49,6 +49,7 @@ export const AuthProvider = ({ children }) => {
             }
 
             localStorage.setItem('token', data.access_token);
+            localStorage.setItem('refresh_token', data.refresh_token);
 
             const normalizedRole = getUserRole({
                 rol: data.user_rol,
@@ -76,7 +77,17 @@ export const AuthProvider = ({ children }) => {
     }, []);
 
     const logout = useCallback(() => {
+        // Revocar el refresh token en el servidor; no hace falta esperar
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (refreshToken) {
+            fetch(`${API_BASE_URL}/token/revoke`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            }).catch(() => {});
+        }
         localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
         localStorage.removeItem('user');
         setUser(null);
     }, []);
@@ -5,7 +5,7 @@ import Layout from '../components/Layout';
 import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Loader2, Plus, ClipboardList, CheckSquare, Users, List } from 'lucide-react';
-import { API_BASE_URL } from '../config';
+import { clienteAPI } from '../services/api';
 import { getUserRole } from '../utils/auth';
 
 const Dashboard = () => {
@@ -24,30 +24,11 @@ const Dashboard = () => {
         const fetchResumen = async () => {
             try {
                 // Para obtener el resumen general
-                const response = await fetch(`${API_BASE_URL}/api/solicitudes/resumen`, {
-                    headers: {
-                        'Authorization': `Bearer ${localStorage.getItem('token')}`
-                    }
-                });
-                if (!response.ok) throw new Error('Error al cargar resumen');
-                const data = await response.json();
+                const { data } = await clienteAPI.obtenerResumenSolicitudes();
                 setResumen(data);
                 
-                // Para obtener el conteo específico de solicitudes pendientes según el rol
-                if (userRole === 'director' || userRole === 'pedidos' || userRole === 'admin') {
-                    const pendientesResponse = await fetch(
-                        `${API_BASE_URL}/api/solicitudes/pendientes/${userRole}`,
-                        {
-                            headers: {
-                                'Authorization': `Bearer ${localStorage.getItem('token')}`
-                            }
-                        }
-                    );
-                    if (pendientesResponse.ok) {
-                        const pendientesData = await pendientesResponse.json();
-                        setSolicitudesPendientes(pendientesData.length);
-                    }
-                }
+                // El resumen incluye los pendientes de la cola del rol (director, pedidos, admin)
+                setSolicitudesPendientes(data.pendientes_rol ?? 0);
             } catch (error) {
                 setSolicitudesPendientes(0);
             } finally {
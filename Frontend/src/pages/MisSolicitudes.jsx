@@ -4,7 +4,7 @@ import { useAuth } from '../context/AuthContext';
 import SolicitudesTable from '../components/SolicitudesTable';
 import { Loader2 } from 'lucide-react';
 import { Alert, AlertDescription } from '../components/ui/alert';
-import { API_BASE_URL } from '../config';
+import { clienteAPI } from '../services/api';
 import { getUserRole } from '../utils/auth';
 
 const MisSolicitudes = () => {
@@ -17,25 +17,10 @@ const MisSolicitudes = () => {
     useEffect(() => {
         const fetchSolicitudes = async () => {
             try {
-                if (userRole === 'director') {
-                    const pendientesData = await fetch(`${API_BASE_URL}/api/solicitudes/pendientes/director`, {
-                        headers: {
-                            'Authorization': `Bearer ${localStorage.getItem('token')}`
-                        }
-                    });
-                    if (!pendientesData.ok) throw new Error('Error al cargar solicitudes pendientes');
-                    const data = await pendientesData.json();
-                    setSolicitudes(data);
-                } else {
-                    const response = await fetch(`${API_BASE_URL}/api/solicitudes/usuario/${encodeURIComponent(user.email)}`, {
-                        headers: {
-                            'Authorization': `Bearer ${localStorage.getItem('token')}`
-                        }
-                    });
-                    if (!response.ok) throw new Error('Error al cargar las solicitudes del usuario');
-                    const data = await response.json();
-                    setSolicitudes(data);
-                }
+                const response = userRole === 'director'
+                    ? await clienteAPI.obtenerSolicitudesPendientes('director')
+                    : await clienteAPI.obtenerSolicitudesUsuario(user.email);
+                setSolicitudes(response.data);
             } catch (error) {
                 setError('Error al cargar las solicitudes. Verifica tu conexión o contacta al administrador.');
             } finally {
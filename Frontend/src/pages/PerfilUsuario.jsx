@@ -87,7 +87,12 @@ const PerfilUsuario = () => {
         setIsLoading(true);
         setError(null);
         try {
-            await clienteAPI.changePassword(passwordForm);
+            const { data } = await clienteAPI.changePassword(passwordForm);
+            // El cambio revoca los tokens anteriores: guardar los nuevos
+            if (data.access_token) {
+                localStorage.setItem('token', data.access_token);
+                localStorage.setItem('refresh_token', data.refresh_token);
+            }
             alert('Contraseña cambiada con éxito');
             setPasswordForm({
                 current_password: '',
@@ -1,5 +1,19 @@
 // src/services/api.js
 import axiosInstance from '../utils/axiosConfig';
+// Los listados de solicitudes van paginados por cursor: se piden páginas
+// siguiendo la cabecera X-Next-Cursor hasta la última y se devuelven todas
+// juntas, con la misma forma ({ data }) que una respuesta de axios.
+const obtenerTodasLasPaginas = async (url) => {
+    const elementos = [];
+    let cursor = null;
+    do {
+        const response = await axiosInstance.get(url, { params: cursor ? { cursor } : {} });
+        elementos.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return { data: elementos };
+};
+
 // Funciñon de login del usuario
 const clienteAPI = {
     login: async (email, password) => {
@@ -16,9 +30,9 @@ const clienteAPI = {
     },
     
     crearSolicitud: (data) => axiosInstance.post('/api/solicitudes/', data),
-    obtenerSolicitudesPendientes: (rol) => axiosInstance.get(`/api/solicitudes/pendientes/${rol}`),
+    obtenerSolicitudesPendientes: (rol) => obtenerTodasLasPaginas(`/api/solicitudes/pendientes/${rol}`),
     obtenerResumenSolicitudes: () => axiosInstance.get('/api/solicitudes/resumen'),
-    obtenerSolicitudesUsuario: (email) => axiosInstance.get(`/api/solicitudes/usuario/${email}`),
+    obtenerSolicitudesUsuario: (email) => obtenerTodasLasPaginas(`/api/solicitudes/usuario/${encodeURIComponent(email)}`),
     aprobarRechazarSolicitud: (solicitudId, data) => axiosInstance.put(`/api/solicitudes/${solicitudId}/aprobar`, data),
     uploadDocumento: (file) => {
         const formData = new FormData();
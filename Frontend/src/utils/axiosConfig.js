@@ -28,18 +28,66 @@ axiosInstance.interceptors.request.use(
     }
 );
 
+const cerrarSesion = () => {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('user');
+
+    if (window.location.pathname !== '/login') {
+        window.location.href = '/login';
+    }
+};
+
+// Renovación del token con el refresh token (sin volver a pedir la
+// contraseña). Una sola petición en curso: las que fallen a la vez con 401
+// esperan a la misma renovación y se reintentan con el token nuevo.
+let renovacionEnCurso = null;
+
+const renovarToken = () => {
+    if (!renovacionEnCurso) {
+        const refreshToken = localStorage.getItem('refresh_token');
+        renovacionEnCurso = (refreshToken
+            ? axios.post(`${API_BASE_URL}/token/refresh`, { refresh_token: refreshToken })
+            : Promise.reject(new Error('Sin refresh token'))
+        )
+            .then(({ data }) => {
+                localStorage.setItem('token', data.access_token);
+                localStorage.setItem('refresh_token', data.refresh_token);
+                return data.access_token;
+            })
+            .finally(() => {
+                renovacionEnCurso = null;
+            });
+    }
+    return renovacionEnCurso;
+};
+
+const esPeticionDeToken = (config) => /\/token(\/|$)/.test(config.url || '');
+
 // Mejorar el interceptor de respuesta para más detalle en los errores
 axiosInstance.interceptors.response.use(
     response => response,
-    error => {
-        if (error.response) {
-            if (error.response.status === 401) {
-                localStorage.removeItem('token');
-                localStorage.removeItem('user');
-
-                if (window.location.pathname !== '/login') {
-                    window.location.href = '/login';
-                }
+    async error => {
+        const config = error.config;
+        if (error.response && error.response.status === 401 && config) {
+            if (config._reintentada || esPeticionDeToken(config)) {
+                cerrarSesion();
+                return Promise.reject(error);
+            }
+            config._reintentada = true;
+
+            // Otra pestaña ya ha renovado el token: reintentar con el suyo
+            const tokenActual = localStorage.getItem('token');
+            const tokenUsado = (config.headers['Authorization'] || '').replace('Bearer ', '');
+            try {
+                const token = tokenActual && tokenActual !== tokenUsado
+                    ? tokenActual
+                    : await renovarToken();
+                config.headers['Authorization'] = `Bearer ${token}`;
+                return axiosInstance(config);
+            } catch (refreshError) {
+                cerrarSesion();
+                return Promise.reject(error);
             }
         }
 